@@ -1,8 +1,5 @@
 from __future__ import annotations
 
-import os
-import shutil
-import tempfile
 from uuid import UUID
 from typing import Annotated
 
@@ -12,6 +9,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.models.dtoModels.AnalysisDTO import AnalyzeVideoResponse
 from app.services.VideoAnalysisService import VideoAnalysisService
+from app.services.model_registry import get_model_registry
+from app.services.analysis_cache import get_analysis_cache
 from app.infrastructure.repositories.AnalysisResultRepository import AnalysisResultRepository
 from app.infrastructure.db.session import fastapi_get_db
 
@@ -19,7 +18,7 @@ router = APIRouter(prefix="/analysis", tags=["analysis"])
 
 
 def get_video_service() -> VideoAnalysisService:
-    return VideoAnalysisService()
+    return VideoAnalysisService(models=get_model_registry())
 
 
 @router.post("/video", response_model=AnalyzeVideoResponse)
@@ -32,18 +31,28 @@ async def analyze_video(
 ):
     """Анализ видео с детекцией лиц, эмоций и внимания"""
     analysis_repo = AnalysisResultRepository(session)
-    
-    # Save UploadFile to temp path for OpenCV
-    with tempfile.TemporaryDirectory() as td:
-        tmp_path = os.path.join(td, file.filename or "upload.mp4")
-        with open(tmp_path, "wb") as out:
-            shutil.copyfileobj(file.file, out)
-        
+
+    # Видео сохраняется один раз (потоково) и анализируется прямо из artifacts/videos;
+    # после анализа файл не нужен — метрики уже в metrics_dir
+    stored = await service.store_upload(file)
+    try:
         return await service.analyze_video(
-            upload_tmp_path=tmp_path,
+            video_path=str(stored.path),
             lecture_id=lecture_id,
             sample_sec=sample_sec,
             session=session,
             analysis_repo=analysis_repo,
+            video_sha256=stored.sha256,
         )
+    finally:
+        stored.path.unlink(missing_ok=True)
+
+
+@router.get("/cache")
+async def analysis_cache_stats():
+    """Статистика кэша результатов анализа (hits/misses по всем процессам, размер на диске)."""
+    cache = get_analysis_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
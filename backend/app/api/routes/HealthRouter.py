@@ -1,8 +1,16 @@
 # app/api/routes/HealthRouter.py
 from fastapi import APIRouter
 
+from app.services.model_registry import get_model_registry
+
 router = APIRouter()
 
 @router.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@router.get("/health/models")
+async def models_health():
+    """Состояние реестра моделей: время загрузки, память, занятость пула."""
+    return get_model_registry().stats()
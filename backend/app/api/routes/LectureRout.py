@@ -1,23 +1,33 @@
+import json
 from typing import Annotated, Optional
 from uuid import UUID
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, Form, File, UploadFile, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, Form, File, UploadFile, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.infrastructure.db.session import fastapi_get_db as get_async_session
 from app.services.VideoAnalysisService import VideoAnalysisService
+from app.services.model_registry import get_model_registry
 from app.services.AuthorizationService import get_current_user_service
 from app.models.dtoModels.LectureDTO import (
     LectureCreateResponseDTO,
     LectureShortDTO,
     LectureWithAnalysisDTO,
     AnalysisResultDTO,
+    AnalysisJobDTO,
 )
 from app.models.dtoModels.UserDTO import UserOutDTO
+from app.models.dtoModels.MetricsDTO import MetricsTimeSeriesDTO
+from app.services.MetricsService import MetricsService
+from app.models.dbModels.LectureEntity import LectureStatusEnum
+from app.models.dbModels.AnalysisJobEntity import AnalysisJobStatusEnum
 from app.infrastructure.repositories.LectureRepository import LectureRepository
 from app.infrastructure.repositories.AnalysisResultRepository import AnalysisResultRepository
+from app.infrastructure.repositories.AnalysisJobRepository import AnalysisJobRepository
 
 router = APIRouter(prefix="/lectures", tags=["lectures"])
 
@@ -26,7 +36,7 @@ def _build_video_url(lecture_id: UUID) -> str:
     return f"/lectures/{lecture_id}/video"
 
 def get_video_analysis_service() -> VideoAnalysisService:
-    return VideoAnalysisService()
+    return VideoAnalysisService(models=get_model_registry())
 
 @router.post("/upload")
 async def upload_lecture(
@@ -41,7 +51,8 @@ async def upload_lecture(
     if not file.content_type or not file.content_type.startswith("video/"):
         raise HTTPException(status_code=400, detail="Файл должен быть видео")
 
-    lecture = await service.create_lecture_and_run_analysis(
+    # анализ выполняется воркером в фоне, лекция возвращается сразу в статусе pending
+    lecture = await service.create_lecture_and_enqueue_analysis(
         session=session,
         owner_id=current_user.id,
         title=title,
@@ -112,6 +123,45 @@ async def get_lecture_analysis(
     lecture_repo = LectureRepository(session)
     analysis_repo = AnalysisResultRepository(session)
 
+    lecture = await lecture_repo.get_by_id(lecture_id)
+    if lecture is None or lecture.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Лекция не найдена")
+
+    analysis = await analysis_repo.get_by_lecture_id(lecture_id)
+    if analysis is not None:
+        return AnalysisResultDTO.model_validate(analysis)
+
+    # итогового результата ещё нет — отдаём промежуточную сводку запущенной задачи
+    job = await AnalysisJobRepository(session).get_latest_by_lecture_id(lecture_id)
+    if job is None or job.status != AnalysisJobStatusEnum.running or not job.partial_summary_json:
+        raise HTTPException(status_code=404, detail="Результат анализа пока не готов")
+
+    summary = json.loads(job.partial_summary_json)
+    return AnalysisResultDTO(
+        lecture_id=lecture_id,
+        avg_engagement=summary["avg_engagement"],
+        avg_attention=summary["avg_attention"],
+        score=summary["score"],
+        summary_json=job.partial_summary_json,
+        created_at=job.started_at or job.created_at,
+        partial=True,
+        processed_until_sec=job.processed_until_sec,
+    )
+
+
+@router.get("/{lecture_id}/metrics", response_model=MetricsTimeSeriesDTO)
+async def get_lecture_metrics(
+    lecture_id: UUID,
+    current_user: Annotated[UserOutDTO, Depends(get_current_user_service)],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    from_sec: Annotated[Optional[float], Query(alias="from", ge=0.0)] = None,
+    to_sec: Annotated[Optional[float], Query(alias="to", ge=0.0)] = None,
+    resolution: Annotated[int, Query(ge=1, le=5000, description="Max number of points")] = 500,
+):
+    """Временной ряд вовлечённости/внимания, прореженный на сервере до resolution точек."""
+    lecture_repo = LectureRepository(session)
+    analysis_repo = AnalysisResultRepository(session)
+
     lecture = await lecture_repo.get_by_id(lecture_id)
     if lecture is None or lecture.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Лекция не найдена")
@@ -119,8 +169,69 @@ async def get_lecture_analysis(
     analysis = await analysis_repo.get_by_lecture_id(lecture_id)
     if analysis is None:
         raise HTTPException(status_code=404, detail="Результат анализа пока не готов")
+    if not Path(analysis.metrics_path).exists():
+        raise HTTPException(status_code=404, detail="Metrics file missing on server")
+    if from_sec is not None and to_sec is not None and from_sec > to_sec:
+        raise HTTPException(status_code=400, detail="'from' must not exceed 'to'")
+
+    return await asyncio.to_thread(
+        MetricsService().get_time_series,
+        lecture_id=lecture_id,
+        metrics_path=analysis.metrics_path,
+        from_sec=from_sec,
+        to_sec=to_sec,
+        resolution=resolution,
+    )
+
+
+@router.get("/{lecture_id}/job", response_model=AnalysisJobDTO)
+async def get_lecture_job(
+    lecture_id: UUID,
+    current_user: Annotated[UserOutDTO, Depends(get_current_user_service)],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+):
+    lecture_repo = LectureRepository(session)
+    job_repo = AnalysisJobRepository(session)
+
+    lecture = await lecture_repo.get_by_id(lecture_id)
+    if lecture is None or lecture.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Лекция не найдена")
+
+    job = await job_repo.get_latest_by_lecture_id(lecture_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача анализа не найдена")
+
+    return AnalysisJobDTO.model_validate(job)
+
+
+@router.post("/{lecture_id}/cancel", response_model=AnalysisJobDTO)
+async def cancel_lecture_analysis(
+    lecture_id: UUID,
+    current_user: Annotated[UserOutDTO, Depends(get_current_user_service)],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+):
+    lecture_repo = LectureRepository(session)
+    job_repo = AnalysisJobRepository(session)
+
+    lecture = await lecture_repo.get_by_id(lecture_id)
+    if lecture is None or lecture.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Лекция не найдена")
+
+    job = await job_repo.get_latest_by_lecture_id(lecture_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача анализа не найдена")
+
+    job = await job_repo.request_cancel(job.id)
+    if job.status == AnalysisJobStatusEnum.cancelled:
+        # задача ещё не стартовала — воркер её не увидит, лекцию закрываем сразу
+        await lecture_repo.update_status(
+            lecture_id=lecture_id,
+            status=LectureStatusEnum.error,
+            error_message="Анализ отменён",
+        )
+    await session.commit()
 
-    return AnalysisResultDTO.model_validate(analysis)
+    return AnalysisJobDTO.model_validate(job)
 
 
 @router.get("/{lecture_id}/video")
@@ -0,0 +1,208 @@
+# app/cli.py
+"""
+Офлайн-анализ записей лекций без API и очереди задач (например, ночной бэкфилл архива).
+
+Видео из каталога анализируются параллельно в пуле процессов (у каждого свой реестр
+моделей), метрики по кадрам пишутся в metrics_dir так же, как у задач из очереди.
+С --owner-id результаты пакетно вставляются в БД: лекция (status=done) + AnalysisResult.
+
+    python -m app.cli analyze /data/lectures --workers 4
+    python -m app.cli analyze /data/lectures --recursive --owner-id <uuid> --report backfill.json
+
+В конце печатается пропускная способность: минуты видео за минуту реального времени.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from uuid import UUID
+
+from app.config import settings
+from app.infrastructure.logger import logger
+
+VIDEO_SUFFIXES = (".mp4", ".mkv", ".avi", ".mov", ".webm")
+
+# Сервис анализа процесса пула (создаётся в _init_worker)
+_service = None
+
+
+def find_videos(root: Path, recursive: bool) -> list[Path]:
+    pattern = "**/*" if recursive else "*"
+    return sorted(p for p in root.glob(pattern) if p.is_file() and p.suffix.lower() in VIDEO_SUFFIXES)
+
+
+def _video_duration_sec(path: str) -> float:
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        return max(0.0, cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps)
+    finally:
+        cap.release()
+
+
+def _init_worker() -> None:
+    global _service
+    from app.services.VideoAnalysisService import VideoAnalysisService, limit_worker_threads
+
+    limit_worker_threads()
+    # видео и так раздаются по процессам пула: свой пул сегментов в каждом занял бы ядра ещё раз
+    _service = VideoAnalysisService(execution_mode="sequential")
+
+
+def _analyze_in_worker(video_path: str, lecture_id: UUID, sample_sec: float) -> dict:
+    started = time.perf_counter()
+    summary, metrics_path = _service.analyze_file(video_path, lecture_id, sample_sec)
+    return {
+        "video_path": video_path,
+        "lecture_id": str(lecture_id),
+        "duration_sec": _video_duration_sec(video_path),
+        "elapsed_sec": time.perf_counter() - started,
+        "metrics_path": metrics_path,
+        "avg_engagement": summary.avg_engagement,
+        "avg_attention": summary.avg_attention,
+        "score": summary.score,
+        "summary_json": summary.model_dump_json(),
+    }
+
+
+def analyze_directory(
+    videos: list[Path], *, workers: int, sample_sec: float
+) -> tuple[list[dict], list[tuple[str, str]], float]:
+    """(результаты, [(видео, ошибка)], секунды реального времени)."""
+    results: list[dict] = []
+    failed: list[tuple[str, str]] = []
+    started = time.perf_counter()
+    # spawn: как и у воркеров очереди, модели и MediaPipe не наследуются от родителя
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(_analyze_in_worker, str(path), uuid.uuid4(), sample_sec): path for path in videos
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                row = future.result()
+            except Exception as exc:
+                logger.exception("Offline analysis of {} failed", path)
+                failed.append((str(path), str(exc)))
+                continue
+            results.append(row)
+            speed = row["duration_sec"] / row["elapsed_sec"] if row["elapsed_sec"] else 0.0
+            print(
+                f"[{done}/{len(videos)}] {path.name}: {row['duration_sec'] / 60:.1f} min video "
+                f"in {row['elapsed_sec']:.1f}s (x{speed:.1f} realtime), score {row['score']:.3f}",
+                flush=True,
+            )
+    return results, failed, time.perf_counter() - started
+
+
+async def insert_results(results: list[dict], owner_id: UUID, subject: str | None) -> None:
+    """Одна транзакция: лекции, затем их AnalysisResult."""
+    from app.infrastructure.db.session import async_session_maker
+    from app.infrastructure.init_db import init_db
+    from app.infrastructure.repositories.AnalysisResultRepository import AnalysisResultRepository
+    from app.infrastructure.repositories.LectureRepository import LectureRepository
+    from app.models.dbModels.LectureEntity import LectureStatusEnum
+
+    await init_db()
+    async with async_session_maker() as session:
+        await LectureRepository(session).create_many(
+            [
+                {
+                    "id": UUID(row["lecture_id"]),
+                    "owner_id": owner_id,
+                    "title": Path(row["video_path"]).stem[:200],
+                    "subject": subject,
+                    "status": LectureStatusEnum.done,
+                    "progress": 100,
+                    # исходник остаётся в архиве: API раздаёт по video_url только загруженные через него видео
+                    "video_tmp_path": None,
+                }
+                for row in results
+            ]
+        )
+        await AnalysisResultRepository(session).create_many(
+            [
+                {
+                    "lecture_id": UUID(row["lecture_id"]),
+                    "avg_engagement": row["avg_engagement"],
+                    "avg_attention": row["avg_attention"],
+                    "score": row["score"],
+                    "metrics_path": row["metrics_path"],
+                    "summary_json": row["summary_json"],
+                }
+                for row in results
+            ]
+        )
+        await session.commit()
+
+
+def _analyze_command(args: argparse.Namespace) -> int:
+    root = Path(args.directory)
+    if not root.is_dir():
+        print(f"Not a directory: {root}", file=sys.stderr)
+        return 2
+    videos = find_videos(root, args.recursive)
+    if not videos:
+        print(f"No videos ({', '.join(VIDEO_SUFFIXES)}) under {root}", file=sys.stderr)
+        return 2
+    workers = max(1, min(args.workers, len(videos)))
+    print(f"Analyzing {len(videos)} video(s) with {workers} process(es), sample_sec={args.sample_sec}", flush=True)
+
+    results, failed, wall_sec = analyze_directory(videos, workers=workers, sample_sec=args.sample_sec)
+
+    video_min = sum(row["duration_sec"] for row in results) / 60
+    wall_min = wall_sec / 60
+    print(
+        f"Done: {len(results)} ok, {len(failed)} failed; {video_min:.1f} video-min in {wall_min:.1f} wall-min "
+        f"-> {video_min / wall_min if wall_min else 0.0:.2f} video-min per wall-min"
+    )
+    for path, error in failed:
+        print(f"  FAILED {path}: {error}")
+
+    if args.owner_id and results:
+        asyncio.run(insert_results(results, UUID(args.owner_id), args.subject))
+        print(f"Inserted {len(results)} lecture(s) with analysis results for owner {args.owner_id}")
+
+    if args.report:
+        report = {
+            "videos": len(videos),
+            "failed": [{"video_path": path, "error": error} for path, error in failed],
+            "video_minutes": round(video_min, 3),
+            "wall_minutes": round(wall_min, 3),
+            "video_min_per_wall_min": round(video_min / wall_min, 3) if wall_min else 0.0,
+            "results": [{k: v for k, v in row.items() if k != "summary_json"} for row in results],
+        }
+        Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 1 if failed else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline lecture analysis")
+    commands = ap.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="analyze all videos in a directory")
+    analyze.add_argument("directory")
+    analyze.add_argument("--workers", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    analyze.add_argument("--sample-sec", type=float, default=settings.FRAME_SAMPLE_SEC)
+    analyze.add_argument("--recursive", action="store_true")
+    analyze.add_argument("--owner-id", help="insert lectures + analysis results for this user")
+    analyze.add_argument("--subject", help="subject of the inserted lectures")
+    analyze.add_argument("--report", help="write per-video results and throughput as JSON")
+    args = ap.parse_args()
+
+    if args.command == "analyze":
+        sys.exit(_analyze_command(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,47 @@ from pydantic import BaseModel
 
 
 DEFAULT_EMOTION_MODEL_PATH = "app/ml_models/emotion_minix.pt"
+DEFAULT_EMOTION_ONNX_PATH = "app/ml_models/emotion_minix.onnx"
+DEFAULT_EMOTION_ONNX_INT8_PATH = "app/ml_models/emotion_minix.int8.onnx"
 
 
 class Settings(BaseModel):
     # Path to emotion Torch checkpoint. You can override via ENV.
     EMOTION_MODEL_PATH: str = DEFAULT_EMOTION_MODEL_PATH
+    # Path to the exported ONNX graph (used when EMOTION_BACKEND == "onnx")
+    EMOTION_ONNX_PATH: str = DEFAULT_EMOTION_ONNX_PATH
+    # Path to the statically quantized graph (scripts/quantize_emotion_minix_onnx.py)
+    EMOTION_ONNX_INT8_PATH: str = DEFAULT_EMOTION_ONNX_INT8_PATH
+
+    # Emotion inference backend: "torch" | "onnx"
+    EMOTION_BACKEND: str = "torch"
+    # Emotion model precision: "fp32" | "int8" (int8 requires the onnx backend)
+    EMOTION_PRECISION: str = "fp32"
+    # Inference threads (0 = library default); inter-op threads apply to ONNX Runtime only
+    EMOTION_INTRA_OP_THREADS: int = 0
+    EMOTION_INTER_OP_THREADS: int = 0
+    # ONNX Runtime graph optimizations: disable | basic | extended | all
+    ONNX_GRAPH_OPTIMIZATION: str = "all"
+    # Faces are classified in batches accumulated over several sampled frames
+    EMOTION_BATCH_SIZE: int = 16
+    EMOTION_BATCH_MAX_FRAMES: int = 8
+    # Reuse a tracked face's emotions while its preprocessed crop barely changes:
+    # mean abs difference of 12x12 block means on the [-1, 1] scale (0 = always run the model)
+    EMOTION_REUSE_THRESHOLD: float = 0.0
+    # At most this many reuses in a row before the model is run again for the face
+    EMOTION_REUSE_MAX_STALENESS: int = 5
+
+    # Skip analysis of sampled frames that barely differ from the last analyzed one and repeat
+    # its metrics: mean abs difference of 64x36 grayscale thumbnails on the [0, 1] scale (0 = off)
+    SCENE_GATE_THRESHOLD: float = 0.0
+    # A full analysis is forced at least this often (seconds of video) even on a static scene
+    SCENE_GATE_MAX_SKIP_SEC: float = 10.0
 
     # Frame sampling period in seconds (N seconds between processed frames)
     FRAME_SAMPLE_SEC: float = 1.0
     MIN_SAMPLES_PER_VIDEO: int = 120
+    # How skipped frames are passed over: "grab" | "seek" | "auto" (measured per video)
+    FRAME_SAMPLING_MODE: str = "auto"
 
     # Attention thresholds (degrees)
     ATTENTION_YAW_OK: float = 30.0  # |yaw| <= this -> attentive
@@ -25,6 +57,20 @@ class Settings(BaseModel):
     FACE_DETECT_MIN_CONF: float = 0.35
     FACE_PAD_RATIO: float = 0.2
     FACE_MIN_SIZE: int = 40
+    # Detection and FaceMesh run on a copy downscaled to this long edge (0 = full resolution);
+    # face boxes are mapped back and emotion crops are still taken from the full-resolution frame
+    FACE_DETECT_LONG_EDGE: int = 1920
+    # Pick the detection scale from FACE_MIN_SIZE: the smallest face stays >= 24 px after downscaling
+    FACE_DETECT_AUTO_SCALE: bool = False
+    # Tiled detection for wide shots with small faces: N x N overlapping tiles detected in threads,
+    # merged with NMS, then FaceMesh per face crop (1 = whole frame at once)
+    FACE_DETECT_TILES: int = 1
+    FACE_DETECT_TILE_OVERLAP: float = 0.2
+    # Face tracking: full detection every N sampled frames (and whenever a track is lost);
+    # in between FaceMesh runs only around tracked faces. 1 = full detection on every frame
+    FACE_DETECT_EVERY_N: int = 1
+    # IoU above which a detection continues an existing track
+    FACE_TRACK_IOU: float = 0.3
 
     # Engagement heuristics
     POSITIVE_ENGAGEMENT_THRESHOLD: float = 0.55
@@ -33,27 +79,112 @@ class Settings(BaseModel):
     WEIGHT_ATTENTION: float = 0.6
     WEIGHT_AFFECT: float = 0.4
 
+    # Uploads are streamed to disk in chunks of this size; larger uploads are rejected with 413 (0 = no limit)
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 4 * 1024 ** 3
+
     # Where to save metrics JSON files
     METRICS_DIR: str = "data/metrics"
+    # Per-frame metrics storage: "columnar" (.npy per column + meta.json, memory-mapped) | "json" | "both"
+    METRICS_FORMAT: str = "columnar"
+    # Content-addressed cache of analysis results under METRICS_DIR/cache (LRU, bounded by size)
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_MAX_BYTES: int = 1024 ** 3
+
+    # Model registry: number of pooled AttentionEstimator instances (MediaPipe graphs are not re-entrant)
+    ATTENTION_POOL_SIZE: int = 2
+    # Load and run models once at startup so the first upload does not pay for it
+    MODEL_WARMUP: bool = True
+
+    # Background analysis jobs: worker processes started with the API (0 = run `python -m app.worker` separately)
+    ANALYSIS_WORKERS: int = 1
+    # How often an idle worker polls the queue
+    ANALYSIS_POLL_INTERVAL_SEC: float = 2.0
+    # Minimum interval between progress/heartbeat updates from the frame loop
+    ANALYSIS_PROGRESS_INTERVAL_SEC: float = 2.0
+    # Minimum interval between provisional summary updates of a running job (0 = off)
+    ANALYSIS_PARTIAL_INTERVAL_SEC: float = 15.0
+    # A running job without heartbeat for this long is considered orphaned and re-queued
+    ANALYSIS_JOB_STALE_SEC: float = 300.0
+    ANALYSIS_JOB_MAX_ATTEMPTS: int = 3
+
+    # How one video is analyzed: "sequential" | "segments" (time segments in a process pool)
+    # | "pipeline" (decode, detection and emotion classification overlap on separate threads).
+    # "segments" analyzes in one pass while SCENE_GATE_* or EMOTION_REUSE_* is enabled
+    ANALYSIS_EXECUTION_MODE: str = "sequential"
+    # Items buffered between pipeline stages; a full queue blocks the previous stage
+    ANALYSIS_PIPELINE_QUEUE_SIZE: int = 4
+    # Segment pool size of each analyzing process (0 = CPU cores / number of analysis workers)
+    ANALYSIS_SEGMENT_WORKERS: int = 0
+    # Videos with fewer sampled frames per worker are analyzed sequentially
+    ANALYSIS_SEGMENT_MIN_SAMPLES: int = 30
+    # Preceding full detections fed to the face tracker before a segment starts (matches sequential
+    # results; raised to the tracker's max_misses + 1 so tracks lost just before the boundary survive)
+    ANALYSIS_SEGMENT_WARMUP_SAMPLES: int = 2
 
     pass
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() not in ("0", "false", "no", "off", "")
+
+
 def _load() -> Settings:
     return Settings(
         EMOTION_MODEL_PATH=os.getenv("APP_EMOTION_MODEL_PATH", DEFAULT_EMOTION_MODEL_PATH),
+        EMOTION_ONNX_PATH=os.getenv("APP_EMOTION_ONNX_PATH", DEFAULT_EMOTION_ONNX_PATH),
+        EMOTION_ONNX_INT8_PATH=os.getenv("APP_EMOTION_ONNX_INT8_PATH", DEFAULT_EMOTION_ONNX_INT8_PATH),
+        EMOTION_BACKEND=os.getenv("APP_EMOTION_BACKEND", "torch").lower(),
+        EMOTION_PRECISION=os.getenv("APP_EMOTION_PRECISION", "fp32").lower(),
+        EMOTION_INTRA_OP_THREADS=int(os.getenv("APP_EMOTION_INTRA_OP_THREADS", 0)),
+        EMOTION_INTER_OP_THREADS=int(os.getenv("APP_EMOTION_INTER_OP_THREADS", 0)),
+        ONNX_GRAPH_OPTIMIZATION=os.getenv("APP_ONNX_GRAPH_OPTIMIZATION", "all"),
+        EMOTION_BATCH_SIZE=int(os.getenv("APP_EMOTION_BATCH_SIZE", 16)),
+        EMOTION_BATCH_MAX_FRAMES=int(os.getenv("APP_EMOTION_BATCH_MAX_FRAMES", 8)),
+        EMOTION_REUSE_THRESHOLD=float(os.getenv("APP_EMOTION_REUSE_THRESHOLD", 0.0)),
+        EMOTION_REUSE_MAX_STALENESS=int(os.getenv("APP_EMOTION_REUSE_MAX_STALENESS", 5)),
+        SCENE_GATE_THRESHOLD=float(os.getenv("APP_SCENE_GATE_THRESHOLD", 0.0)),
+        SCENE_GATE_MAX_SKIP_SEC=float(os.getenv("APP_SCENE_GATE_MAX_SKIP_SEC", 10.0)),
         FRAME_SAMPLE_SEC=float(os.getenv("APP_FRAME_SAMPLE_SEC", 1.0)),
         MIN_SAMPLES_PER_VIDEO=int(os.getenv("APP_MIN_SAMPLES_PER_VIDEO", 120)),
+        FRAME_SAMPLING_MODE=os.getenv("APP_FRAME_SAMPLING_MODE", "auto").lower(),
         ATTENTION_YAW_OK=float(os.getenv("APP_ATTENTION_YAW_OK", 30.0)),
         ATTENTION_PITCH_OK=float(os.getenv("APP_ATTENTION_PITCH_OK", 20.0)),
         FACE_DETECT_MAX_FACES=int(os.getenv("APP_FACE_DETECT_MAX_FACES", 32)),
         FACE_DETECT_MIN_CONF=float(os.getenv("APP_FACE_DETECT_MIN_CONF", 0.35)),
         FACE_PAD_RATIO=float(os.getenv("APP_FACE_PAD_RATIO", 0.2)),
         FACE_MIN_SIZE=int(os.getenv("APP_FACE_MIN_SIZE", 40)),
+        FACE_DETECT_LONG_EDGE=int(os.getenv("APP_FACE_DETECT_LONG_EDGE", 1920)),
+        FACE_DETECT_AUTO_SCALE=_env_bool("APP_FACE_DETECT_AUTO_SCALE", False),
+        FACE_DETECT_TILES=int(os.getenv("APP_FACE_DETECT_TILES", 1)),
+        FACE_DETECT_TILE_OVERLAP=float(os.getenv("APP_FACE_DETECT_TILE_OVERLAP", 0.2)),
+        FACE_DETECT_EVERY_N=int(os.getenv("APP_FACE_DETECT_EVERY_N", 1)),
+        FACE_TRACK_IOU=float(os.getenv("APP_FACE_TRACK_IOU", 0.3)),
         POSITIVE_ENGAGEMENT_THRESHOLD=float(os.getenv("APP_POSITIVE_ENGAGEMENT_THRESHOLD", 0.55)),
         WEIGHT_ATTENTION=float(os.getenv("APP_WEIGHT_ATTENTION", 0.6)),
         WEIGHT_AFFECT=float(os.getenv("APP_WEIGHT_AFFECT", 0.4)),
+        UPLOAD_CHUNK_SIZE=int(os.getenv("APP_UPLOAD_CHUNK_SIZE", 1024 * 1024)),
+        UPLOAD_MAX_BYTES=int(os.getenv("APP_UPLOAD_MAX_BYTES", 4 * 1024 ** 3)),
         METRICS_DIR=os.getenv("APP_METRICS_DIR", "data/metrics"),
+        METRICS_FORMAT=os.getenv("APP_METRICS_FORMAT", "columnar").lower(),
+        ANALYSIS_CACHE_ENABLED=_env_bool("APP_ANALYSIS_CACHE_ENABLED", True),
+        ANALYSIS_CACHE_MAX_BYTES=int(os.getenv("APP_ANALYSIS_CACHE_MAX_BYTES", 1024 ** 3)),
+        ATTENTION_POOL_SIZE=int(os.getenv("APP_ATTENTION_POOL_SIZE", 2)),
+        MODEL_WARMUP=_env_bool("APP_MODEL_WARMUP", True),
+        ANALYSIS_WORKERS=int(os.getenv("APP_ANALYSIS_WORKERS", 1)),
+        ANALYSIS_POLL_INTERVAL_SEC=float(os.getenv("APP_ANALYSIS_POLL_INTERVAL_SEC", 2.0)),
+        ANALYSIS_PROGRESS_INTERVAL_SEC=float(os.getenv("APP_ANALYSIS_PROGRESS_INTERVAL_SEC", 2.0)),
+        ANALYSIS_PARTIAL_INTERVAL_SEC=float(os.getenv("APP_ANALYSIS_PARTIAL_INTERVAL_SEC", 15.0)),
+        ANALYSIS_JOB_STALE_SEC=float(os.getenv("APP_ANALYSIS_JOB_STALE_SEC", 300.0)),
+        ANALYSIS_JOB_MAX_ATTEMPTS=int(os.getenv("APP_ANALYSIS_JOB_MAX_ATTEMPTS", 3)),
+        ANALYSIS_EXECUTION_MODE=os.getenv("APP_ANALYSIS_EXECUTION_MODE", "sequential").lower(),
+        ANALYSIS_SEGMENT_WORKERS=int(os.getenv("APP_ANALYSIS_SEGMENT_WORKERS", 0)),
+        ANALYSIS_SEGMENT_MIN_SAMPLES=int(os.getenv("APP_ANALYSIS_SEGMENT_MIN_SAMPLES", 30)),
+        ANALYSIS_SEGMENT_WARMUP_SAMPLES=int(os.getenv("APP_ANALYSIS_SEGMENT_WARMUP_SAMPLES", 2)),
+        ANALYSIS_PIPELINE_QUEUE_SIZE=int(os.getenv("APP_ANALYSIS_PIPELINE_QUEUE_SIZE", 4)),
     )
 
 
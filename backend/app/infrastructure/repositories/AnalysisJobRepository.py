@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.dbModels.AnalysisJobEntity import AnalysisJobEntity, AnalysisJobStatusEnum
+
+
+FINISHED_JOB_STATUSES = (
+    AnalysisJobStatusEnum.done,
+    AnalysisJobStatusEnum.error,
+    AnalysisJobStatusEnum.cancelled,
+)
+
+
+class AnalysisJobRepository:
+    """Очередь задач анализа поверх таблицы analysis_jobs. Коммит делает вызывающий код."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def enqueue(
+        self,
+        *,
+        lecture_id: UUID,
+        video_path: str,
+        sample_sec: float,
+        video_sha256: str | None = None,
+    ) -> AnalysisJobEntity:
+        job = AnalysisJobEntity(
+            lecture_id=lecture_id,
+            video_path=video_path,
+            video_sha256=video_sha256,
+            sample_sec=sample_sec,
+            status=AnalysisJobStatusEnum.queued,
+            progress=0,
+            attempts=0,
+            cancel_requested=False,
+        )
+        self.session.add(job)
+        await self.session.flush()
+        return job
+
+    async def get_by_id(self, job_id: UUID) -> AnalysisJobEntity | None:
+        stmt = select(AnalysisJobEntity).where(AnalysisJobEntity.id == job_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_latest_by_lecture_id(self, lecture_id: UUID) -> AnalysisJobEntity | None:
+        stmt = (
+            select(AnalysisJobEntity)
+            .where(AnalysisJobEntity.lecture_id == lecture_id)
+            .order_by(AnalysisJobEntity.created_at.desc())
+            .limit(1)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def claim_next(self, *, worker_id: str, stale_after_sec: float) -> AnalysisJobEntity | None:
+        """
+        Атомарно забирает следующую задачу: queued, либо running с протухшим heartbeat
+        (воркер упал или процесс перезапустили). FOR UPDATE SKIP LOCKED не даёт
+        двум воркерам взять одну и ту же задачу.
+        """
+        stale_before = func.now() - timedelta(seconds=stale_after_sec)
+        stmt = (
+            select(AnalysisJobEntity)
+            .where(
+                or_(
+                    AnalysisJobEntity.status == AnalysisJobStatusEnum.queued,
+                    and_(
+                        AnalysisJobEntity.status == AnalysisJobStatusEnum.running,
+                        AnalysisJobEntity.heartbeat_at < stale_before,
+                    ),
+                )
+            )
+            .order_by(AnalysisJobEntity.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(stmt)
+        job = result.scalar_one_or_none()
+        if job is None:
+            return None
+
+        job.status = AnalysisJobStatusEnum.running
+        job.worker_id = worker_id
+        job.attempts = (job.attempts or 0) + 1
+        job.progress = 0
+        job.partial_summary_json = None
+        job.processed_until_sec = None
+        job.started_at = func.now()
+        job.heartbeat_at = func.now()
+        await self.session.flush()
+        await self.session.refresh(job)
+        return job
+
+    async def update_progress(self, job_id: UUID, *, progress: int) -> bool:
+        """Обновляет прогресс и heartbeat. Возвращает True, если задачу попросили отменить."""
+        stmt = (
+            update(AnalysisJobEntity)
+            .where(AnalysisJobEntity.id == job_id)
+            .values(progress=progress, heartbeat_at=func.now())
+            .returning(AnalysisJobEntity.cancel_requested)
+        )
+        result = await self.session.execute(stmt)
+        return bool(result.scalar_one_or_none())
+
+    async def update_partial(self, job_id: UUID, *, summary_json: str, processed_until_sec: float) -> None:
+        """Сохраняет промежуточную сводку запущенной задачи."""
+        stmt = (
+            update(AnalysisJobEntity)
+            .where(AnalysisJobEntity.id == job_id)
+            .values(partial_summary_json=summary_json, processed_until_sec=processed_until_sec)
+        )
+        await self.session.execute(stmt)
+
+    async def finish(
+        self,
+        job_id: UUID,
+        *,
+        status: str,
+        error_message: str | None = None,
+    ) -> None:
+        values: dict = {"status": status, "finished_at": func.now(), "heartbeat_at": func.now()}
+        if status == AnalysisJobStatusEnum.done:
+            values["progress"] = 100
+        if error_message is not None:
+            values["error_message"] = error_message
+
+        stmt = update(AnalysisJobEntity).where(AnalysisJobEntity.id == job_id).values(**values)
+        await self.session.execute(stmt)
+
+    async def request_cancel(self, job_id: UUID) -> AnalysisJobEntity | None:
+        """
+        Ставит флаг отмены. Задача в очереди отменяется сразу,
+        запущенную останавливает воркер при следующем отчёте о прогрессе.
+        """
+        stmt = select(AnalysisJobEntity).where(AnalysisJobEntity.id == job_id).with_for_update()
+        result = await self.session.execute(stmt)
+        job = result.scalar_one_or_none()
+        if job is None or job.status in FINISHED_JOB_STATUSES:
+            return job
+
+        job.cancel_requested = True
+        if job.status == AnalysisJobStatusEnum.queued:
+            job.status = AnalysisJobStatusEnum.cancelled
+            job.finished_at = func.now()
+        await self.session.flush()
+        await self.session.refresh(job)
+        return job
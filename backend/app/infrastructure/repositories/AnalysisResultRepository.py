@@ -35,6 +35,13 @@ class AnalysisResultRepository:
         await self.session.flush()
         return entity
 
+    async def create_many(self, results: Sequence[dict]) -> list[AnalysisResultEntity]:
+        """Пакетная вставка результатов; ключи — аргументы create."""
+        entities = [AnalysisResultEntity(**fields) for fields in results]
+        self.session.add_all(entities)
+        await self.session.flush()
+        return entities
+
     async def get_by_lecture_id(self, lecture_id: UUID) -> AnalysisResultEntity | None:
         stmt = select(AnalysisResultEntity).where(AnalysisResultEntity.lecture_id == lecture_id)
         result = await self.session.execute(stmt)
@@ -33,6 +33,13 @@ class LectureRepository:
         await self.session.flush()  # чтобы получить lecture.id
         return lecture
 
+    async def create_many(self, lectures: Sequence[dict]) -> list[LectureEntity]:
+        """Пакетная вставка лекций (офлайн-обработка архива); ключи — поля LectureEntity."""
+        entities = [LectureEntity(**fields) for fields in lectures]
+        self.session.add_all(entities)
+        await self.session.flush()
+        return entities
+
     async def get_by_id(self, lecture_id: UUID) -> LectureEntity | None:
         stmt = select(LectureEntity).where(LectureEntity.id == lecture_id)
         result = await self.session.execute(stmt)
@@ -1,5 +1,7 @@
 # app/main.py
 
+import asyncio
+
 from fastapi import FastAPI, APIRouter, Request, HTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,6 +11,10 @@ from app.infrastructure.logger import logger
 from app.infrastructure.exception_handler import global_exception_handler
 from app.infrastructure.init_db import init_db
 from app.api.main import api_router
+from app.config import settings as app_settings
+from app.services.model_registry import get_model_registry, shutdown_model_registry
+from app.services.VideoAnalysisService import shutdown_segment_pool
+from app.worker import start_worker_pool, stop_worker_pool
 
 # Собираем все наши маршруты
 main_router = APIRouter()
@@ -51,10 +57,25 @@ async def log_requests(request: Request, call_next):
 
 
 
-# При старте инициализируем БД
+# При старте инициализируем БД и прогреваем модели
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    if app_settings.MODEL_WARMUP:
+        registry = get_model_registry()
+        await asyncio.to_thread(registry.warm_up)
+        logger.info("Models warmed up: {}", registry.stats()["loads"])
+    # Фоновые воркеры анализа (очередь в БД, см. app.worker)
+    app.state.analysis_workers = []
+    if app_settings.ANALYSIS_WORKERS > 0:
+        app.state.analysis_workers = start_worker_pool(app_settings.ANALYSIS_WORKERS)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await asyncio.to_thread(stop_worker_pool, getattr(app.state, "analysis_workers", []))
+    shutdown_segment_pool()
+    shutdown_model_registry()
 
 # Точка входа, если запускаем напрямую
 if __name__ == "__main__":
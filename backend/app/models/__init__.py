@@ -3,6 +3,7 @@
 from app.models.dbModels.UserEntity import UserEntity, UserRoleEnum
 from app.models.dbModels.LectureEntity import LectureEntity, LectureStatusEnum
 from app.models.dbModels.AnalysisResultEntity import AnalysisResultEntity
+from app.models.dbModels.AnalysisJobEntity import AnalysisJobEntity, AnalysisJobStatusEnum
 from app.models.dbModels.RefreshTokenRepository import RefreshTokensEntity
 
 __all__ = [
@@ -11,5 +12,7 @@ __all__ = [
     "LectureEntity",
     "LectureStatusEnum",
     "AnalysisResultEntity",
+    "AnalysisJobEntity",
+    "AnalysisJobStatusEnum",
     "RefreshTokensEntity",
 ]
@@ -0,0 +1,74 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Float,
+    Boolean,
+    Text,
+    ForeignKey,
+    DateTime,
+    Enum,
+)
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from app.models.dbModels.Entity import EntityDB
+
+
+class AnalysisJobStatusEnum(str):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    error = "error"
+    cancelled = "cancelled"
+
+
+class AnalysisJobEntity(EntityDB):
+    """Задача анализа лекции в очереди (очередь живёт в БД и переживает рестарты)."""
+
+    __tablename__ = "analysis_jobs"
+
+    id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    lecture_id = Column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("lectures.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    video_path = Column(Text, nullable=False)
+    # sha256 содержимого видео (ключ кэша результатов); считается при загрузке
+    video_sha256 = Column(String(64), nullable=True)
+    sample_sec = Column(Float, nullable=False)
+
+    status = Column(
+        Enum(
+            AnalysisJobStatusEnum.queued,
+            AnalysisJobStatusEnum.running,
+            AnalysisJobStatusEnum.done,
+            AnalysisJobStatusEnum.error,
+            AnalysisJobStatusEnum.cancelled,
+            name="analysis_job_status_enum",
+        ),
+        nullable=False,
+        default=AnalysisJobStatusEnum.queued,
+        index=True,
+    )
+    progress = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    worker_id = Column(String(100), nullable=True)
+    error_message = Column(Text, nullable=True)
+
+    # промежуточная сводка (AnalysisSummary в JSON) по кадрам до processed_until_sec, пока задача идёт
+    partial_summary_json = Column(Text, nullable=True)
+    processed_until_sec = Column(Float, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # обновляется при каждом отчёте о прогрессе; «протухший» running означает упавший воркер
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -22,6 +22,7 @@ class FaceMetrics(BaseModel):
     top_emotion: FaceEmotion | None = None
     emotions: Dict[str, float] = Field(default_factory=dict)
     looking_target: str | None = None  # "screen/left/right/up/down"
+    track_id: int | None = None  # one person across frames of the video
 
 
 class FrameMetrics(BaseModel):
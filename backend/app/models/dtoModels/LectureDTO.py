@@ -24,9 +24,12 @@ class AnalysisResultDTO(BaseModel):
     avg_engagement: float = Field(..., ge=0.0, le=1.0)
     avg_attention: float = Field(..., ge=0.0, le=1.0)
     score: float = Field(..., ge=0.0, le=1.0)
-    metrics_path: str
+    metrics_path: str | None = None
     summary_json: str | None = None
     created_at: datetime
+    # partial=True — промежуточная сводка запущенной задачи по кадрам до processed_until_sec
+    partial: bool = False
+    processed_until_sec: float | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -52,3 +55,20 @@ class LectureDetailDTO(LectureShortDTO):
 
 class LectureWithAnalysisDTO(LectureDetailDTO):
     pass
+
+
+class AnalysisJobDTO(BaseModel):
+    id: UUID
+    lecture_id: UUID
+    status: str
+    progress: int
+    attempts: int
+    cancel_requested: bool
+    error_message: str | None = None
+    processed_until_sec: float | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    heartbeat_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -14,8 +14,18 @@ class MetricsPointDTO(BaseModel):
     yaw_mean: float
     pitch_mean: float
     roll_mean: float
+    # Разброс внутри интервала, если точка агрегирует несколько кадров
+    engagement_ratio_min: float | None = None
+    engagement_ratio_max: float | None = None
+    attention_ratio_min: float | None = None
+    attention_ratio_max: float | None = None
+    frames: int = 1
 
 
 class MetricsTimeSeriesDTO(BaseModel):
     lecture_id: UUID
     points: List[MetricsPointDTO]
+    from_sec: float | None = None
+    to_sec: float | None = None
+    frames_total: int = 0
+    downsampled: bool = False
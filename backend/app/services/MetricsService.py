@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from uuid import UUID
+
+import numpy as np
+
+from app.models.dtoModels.MetricsDTO import MetricsPointDTO, MetricsTimeSeriesDTO
+from app.services.metrics_store import ColumnarMetrics
+
+
+POSITIVE_EMOTIONS = ("happy", "surprise")
+
+# Поля точки, которые усредняются по кадрам внутри интервала
+_MEAN_FIELDS = (
+    "n_faces_total",
+    "n_faces_analyzed",
+    "engagement_ratio",
+    "engagement_posprob_mean",
+    "attention_ratio",
+    "yaw_mean",
+    "pitch_mean",
+    "roll_mean",
+)
+
+
+class MetricsService:
+    """
+    Временной ряд метрик лекции для графиков: читает сохранённые метрики по кадрам
+    (колоночный формат или старый JSON), режет по времени и прореживает на сервере
+    до заданного числа точек (среднее + min/max по интервалам).
+    """
+
+    def get_time_series(
+        self,
+        *,
+        lecture_id: UUID,
+        metrics_path: str,
+        from_sec: float | None = None,
+        to_sec: float | None = None,
+        resolution: int = 500,
+    ) -> MetricsTimeSeriesDTO:
+        series = self.load_series(metrics_path, from_sec, to_sec)
+        frames_total = len(series["ts"])
+        downsampled = frames_total > resolution
+        points = self._downsample(series, resolution) if downsampled else self._raw_points(series)
+
+        return MetricsTimeSeriesDTO(
+            lecture_id=lecture_id,
+            points=points,
+            from_sec=from_sec,
+            to_sec=to_sec,
+            frames_total=frames_total,
+            downsampled=downsampled,
+        )
+
+    # ========== Чтение ==========
+
+    def load_series(
+        self, metrics_path: str, from_sec: float | None = None, to_sec: float | None = None
+    ) -> dict[str, np.ndarray]:
+        """Покадровые колонки временного ряда за интервал [from_sec, to_sec]."""
+        if ColumnarMetrics.is_columnar(metrics_path):
+            return self._series_from_columnar(ColumnarMetrics(metrics_path), from_sec, to_sec)
+        return self._series_from_json(Path(metrics_path), from_sec, to_sec)
+
+    def _series_from_columnar(
+        self, metrics: ColumnarMetrics, from_sec: float | None, to_sec: float | None
+    ) -> dict[str, np.ndarray]:
+        frames = metrics.frames(from_sec, to_sec)
+        faces = metrics.faces(from_sec, to_sec)
+        n_frames = len(frames["ts_sec"])
+        frame_index = faces["frame_index"]
+
+        positive = [metrics.emotion_labels.index(label) for label in POSITIVE_EMOTIONS if label in metrics.emotion_labels]
+        emotions = np.asarray(faces["emotions"], dtype=np.float64)
+        posprob = np.nan_to_num(emotions[:, positive]).sum(axis=1) if positive else np.zeros(len(frame_index))
+        # лица, для которых классификатор не отработал, имеют вероятность 0 (см. _FALLBACK_EMOTION)
+        analyzed = np.asarray(faces["top_prob"], dtype=np.float64) > 0
+
+        return {
+            "ts": np.asarray(frames["ts_sec"], dtype=np.float64),
+            "n_faces_total": np.asarray(frames["face_count"], dtype=np.float64),
+            "n_faces_analyzed": np.bincount(frame_index, weights=analyzed, minlength=n_frames),
+            "engagement_ratio": np.asarray(frames["engagement_ratio"], dtype=np.float64),
+            "engagement_posprob_mean": self._per_frame_mean(frame_index, posprob, n_frames, mask=analyzed),
+            "attention_ratio": np.asarray(frames["attention_ratio"], dtype=np.float64),
+            "yaw_mean": self._per_frame_mean(frame_index, faces["yaw_deg"], n_frames),
+            "pitch_mean": self._per_frame_mean(frame_index, faces["pitch_deg"], n_frames),
+            "roll_mean": self._per_frame_mean(frame_index, faces["roll_deg"], n_frames),
+        }
+
+    def _series_from_json(
+        self, path: Path, from_sec: float | None, to_sec: float | None
+    ) -> dict[str, np.ndarray]:
+        # метрики, сохранённые до перехода на колоночный формат
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+
+        rows = []
+        for frame in payload.get("frames", []):
+            ts = frame["ts_sec"]
+            if (from_sec is not None and ts < from_sec) or (to_sec is not None and ts > to_sec):
+                continue
+            faces = frame.get("faces", [])
+            analyzed = [face for face in faces if (face.get("top_emotion") or {}).get("prob", 0.0) > 0]
+
+            def mean(values) -> float:
+                values = [v for v in values if v is not None]
+                return float(np.mean(values)) if values else 0.0
+
+            rows.append(
+                (
+                    ts,
+                    frame.get("face_count", len(faces)),
+                    len(analyzed),
+                    frame.get("engagement_ratio", 0.0),
+                    mean(sum(face["emotions"].get(label, 0.0) for label in POSITIVE_EMOTIONS) for face in analyzed),
+                    frame.get("attention_ratio", 0.0),
+                    mean(face.get("yaw_deg") for face in faces),
+                    mean(face.get("pitch_deg") for face in faces),
+                    mean(face.get("roll_deg") for face in faces),
+                )
+            )
+
+        columns = np.array(rows, dtype=np.float64).reshape(-1, 1 + len(_MEAN_FIELDS))
+        return {"ts": columns[:, 0], **{name: columns[:, i + 1] for i, name in enumerate(_MEAN_FIELDS)}}
+
+    @staticmethod
+    def _per_frame_mean(
+        frame_index: np.ndarray, values: np.ndarray, n_frames: int, mask: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Среднее по лицам каждого кадра без NaN (0, если лиц нет)."""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if mask is not None:
+            valid &= mask
+        sums = np.bincount(frame_index[valid], weights=values[valid], minlength=n_frames)
+        counts = np.bincount(frame_index[valid], minlength=n_frames)
+        return np.divide(sums, counts, out=np.zeros(n_frames), where=counts > 0)
+
+    # ========== Прореживание ==========
+
+    @staticmethod
+    def _raw_points(series: dict[str, np.ndarray]) -> list[MetricsPointDTO]:
+        return [
+            MetricsPointDTO(
+                timestamp_sec=float(series["ts"][i]),
+                n_faces_total=int(series["n_faces_total"][i]),
+                n_faces_analyzed=int(series["n_faces_analyzed"][i]),
+                engagement_ratio=float(series["engagement_ratio"][i]),
+                engagement_posprob_mean=float(series["engagement_posprob_mean"][i]),
+                attention_ratio=float(series["attention_ratio"][i]),
+                yaw_mean=float(series["yaw_mean"][i]),
+                pitch_mean=float(series["pitch_mean"][i]),
+                roll_mean=float(series["roll_mean"][i]),
+            )
+            for i in range(len(series["ts"]))
+        ]
+
+    @staticmethod
+    def _downsample(series: dict[str, np.ndarray], resolution: int) -> list[MetricsPointDTO]:
+        """Равные по времени интервалы: среднее по кадрам + min/max для engagement/attention."""
+        ts = series["ts"]
+        edges = np.linspace(ts[0], ts[-1], resolution + 1)
+        bucket = np.clip(np.searchsorted(edges, ts, side="right") - 1, 0, resolution - 1)
+        counts = np.bincount(bucket, minlength=resolution)
+        filled = counts > 0
+
+        def bucket_mean(values: np.ndarray) -> np.ndarray:
+            return np.bincount(bucket, weights=values, minlength=resolution)[filled] / counts[filled]
+
+        def bucket_extreme(values: np.ndarray, ufunc: np.ufunc, init: float) -> np.ndarray:
+            out = np.full(resolution, init)
+            ufunc.at(out, bucket, values)
+            return out[filled]
+
+        means = {name: bucket_mean(series[name]) for name in ("ts", *_MEAN_FIELDS)}
+        extremes = {
+            f"{name}_{suffix}": bucket_extreme(series[name], ufunc, init)
+            for name in ("engagement_ratio", "attention_ratio")
+            for suffix, ufunc, init in (("min", np.minimum, np.inf), ("max", np.maximum, -np.inf))
+        }
+        frames = counts[filled]
+
+        return [
+            MetricsPointDTO(
+                timestamp_sec=float(means["ts"][i]),
+                n_faces_total=int(round(means["n_faces_total"][i])),
+                n_faces_analyzed=int(round(means["n_faces_analyzed"][i])),
+                engagement_ratio=float(means["engagement_ratio"][i]),
+                engagement_posprob_mean=float(means["engagement_posprob_mean"][i]),
+                attention_ratio=float(means["attention_ratio"][i]),
+                yaw_mean=float(means["yaw_mean"][i]),
+                pitch_mean=float(means["pitch_mean"][i]),
+                roll_mean=float(means["roll_mean"][i]),
+                engagement_ratio_min=float(extremes["engagement_ratio_min"][i]),
+                engagement_ratio_max=float(extremes["engagement_ratio_max"][i]),
+                attention_ratio_min=float(extremes["attention_ratio_min"][i]),
+                attention_ratio_max=float(extremes["attention_ratio_max"][i]),
+                frames=int(frames[i]),
+            )
+            for i in range(len(frames))
+        ]
@@ -2,27 +2,46 @@ from __future__ import annotations
 
 import json
 import asyncio
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
 import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import Callable
 from uuid import UUID
 
-import cv2
 import numpy as np
-from fastapi import UploadFile
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import UploadFile, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.config import settings
 from app.infrastructure.core import settings as core_settings
+from app.infrastructure.logger import logger
 from app.infrastructure.repositories.LectureRepository import LectureRepository
 from app.infrastructure.repositories.AnalysisResultRepository import AnalysisResultRepository
-from app.models.dbModels.LectureEntity import LectureStatusEnum
-from app.services.emotion_classifier import EmotionClassifier
+from app.infrastructure.repositories.AnalysisJobRepository import AnalysisJobRepository
+from app.models.dbModels.LectureEntity import LectureEntity, LectureStatusEnum
+from app.models.dbModels.AnalysisJobEntity import AnalysisJobStatusEnum
+from app.services.analysis_cache import AnalysisCache, file_sha256, get_analysis_cache
 from app.services.attention_estimator import AttentionEstimator
+from app.services.emotion_classifier import EmotionClassifier
+from app.services.emotion_reuse import EmotionReuseCache
+from app.services.face_tracker import FaceTracker, match_boxes
+from app.services.frame_pipeline import StagePipeline
+from app.services.frame_reader import SampledFrameReader
+from app.services.frame_records import FaceRecord, FrameRecord
+from app.services.metrics_store import write_columnar_metrics
+from app.services.model_registry import ModelRegistry, get_model_registry
+from app.services.online_summary import OnlineSummary, emotion_sums, normalize_histogram
+from app.services.scene_gate import SceneGate
 from app.models.dtoModels.AnalysisDTO import (
-    FaceMetrics,
-    FaceEmotion,
-    FrameMetrics,
     AnalysisSummary,
     AnalyzeVideoResponse,
     TimelineHighlight,
@@ -30,6 +49,162 @@ from app.models.dtoModels.AnalysisDTO import (
 
 
 POSITIVE_EMOTIONS = {"happy", "surprise"}
+# Если не удалось классифицировать, используем нейтральные значения (affect = 0.5)
+_FALLBACK_EMOTION: tuple[str, float, dict[str, float]] = ("neutral", 0.0, {"neutral": 1.0})
+
+# progress_cb(processed_samples, expected_samples); expected_samples == 0, если длина видео неизвестна
+ProgressCallback = Callable[[int, int], None]
+# partial_cb(summary) — промежуточная сводка по уже обработанным кадрам
+PartialCallback = Callable[[OnlineSummary], None]
+# треки кадров прогрева сегмента: [(ts_sec, [(track_id, bbox)])]
+WarmupTracks = list[tuple[float, list[tuple[int, tuple[int, int, int, int]]]]]
+
+
+class AnalysisCancelledError(Exception):
+    """Задачу анализа отменили, пока она выполнялась."""
+
+
+@dataclass(frozen=True)
+class StoredVideo:
+    """Загруженное видео, сохранённое в artifacts/videos."""
+
+    path: Path
+    size_bytes: int
+    sha256: str
+
+
+class _PendingFrame:
+    """
+    Проанализированный кадр, лица которого ещё не прошли классификацию эмоций.
+    repeat — кадр пропущен SceneGate: его метрики копируются с предыдущего кадра.
+    """
+
+    __slots__ = ("ts_sec", "faces", "face_rois", "repeat")
+
+    def __init__(
+        self, ts_sec: float, faces: list[dict], face_rois: list[np.ndarray], repeat: bool = False
+    ) -> None:
+        self.ts_sec = ts_sec
+        self.faces = faces
+        self.face_rois = face_rois
+        self.repeat = repeat
+
+
+class _ProgressReporter:
+    """
+    Отчёты из цикла по кадрам с троттлингом: прогресс (progress_cb) не чаще progress_interval,
+    промежуточная сводка (partial_cb) не чаще partial_interval секунд.
+    Сводка копится в OnlineSummary, только если partial_cb задан.
+    """
+
+    __slots__ = (
+        "progress_cb",
+        "partial_cb",
+        "expected_samples",
+        "progress_interval",
+        "partial_interval",
+        "online",
+        "processed",
+        "_last_progress",
+        "_last_partial",
+    )
+
+    def __init__(
+        self,
+        progress_cb: ProgressCallback | None,
+        partial_cb: PartialCallback | None,
+        expected_samples: int,
+        progress_interval: float,
+        partial_interval: float,
+        highlight_candidates: int = 32,
+    ) -> None:
+        self.progress_cb = progress_cb
+        self.partial_cb = partial_cb if partial_interval > 0 else None
+        self.expected_samples = expected_samples
+        self.progress_interval = progress_interval
+        self.partial_interval = partial_interval
+        self.online = OnlineSummary(highlight_candidates) if self.partial_cb is not None else None
+        self.processed = 0
+        self._last_progress = self._last_partial = time.perf_counter()
+
+    def frames_built(self, frames: list[FrameRecord]) -> None:
+        if self.online is not None:
+            self.online.add(frames)
+
+    def samples_done(self, count: int = 1, *, force: bool = False) -> None:
+        """force — отчёт о прогрессе без троттлинга (вызывающий сам задаёт период)."""
+        self.processed += count
+        now = time.perf_counter()
+        if self.progress_cb is not None and (force or now - self._last_progress >= self.progress_interval):
+            self.progress_cb(self.processed, self.expected_samples)
+            self._last_progress = now
+        if self.online is not None and self.online.frames and now - self._last_partial >= self.partial_interval:
+            self.partial_cb(self.online)
+            self._last_partial = now
+
+
+# Период ожидания сегментов между отчётами о прогрессе, если ANALYSIS_PROGRESS_INTERVAL_SEC меньше
+_SEGMENT_POLL_SEC = 0.5
+
+# Пул процессов для параллельного анализа сегментов (ANALYSIS_EXECUTION_MODE == "segments")
+_segment_pool: ProcessPoolExecutor | None = None
+_segment_pool_lock = threading.Lock()
+# VideoAnalysisService внутри процесса пула (со своими моделями)
+_segment_service: "VideoAnalysisService | None" = None
+
+
+def limit_worker_threads() -> None:
+    """
+    Каждый процесс пула считает на одном ядре — иначе потоки ONNX/torch/OpenCV конкурируют.
+    Число потоков модели эмоций, заданное явно, не меняется. Вызывать до загрузки моделей.
+    """
+    import cv2
+
+    cv2.setNumThreads(1)
+    if settings.EMOTION_INTRA_OP_THREADS == 0:
+        settings.EMOTION_INTRA_OP_THREADS = 1
+    if settings.EMOTION_INTER_OP_THREADS == 0:
+        settings.EMOTION_INTER_OP_THREADS = 1
+
+
+def _exit_with_parent() -> None:
+    """Процесс пула завершается вместе с родителем (воркер очереди убит через terminate/kill)."""
+    multiprocessing.connection.wait([multiprocessing.parent_process().sentinel])
+    os._exit(0)
+
+
+def _init_segment_worker() -> None:
+    global _segment_service
+    limit_worker_threads()
+    threading.Thread(target=_exit_with_parent, name="segment-parent-watch", daemon=True).start()
+    _segment_service = VideoAnalysisService(models=get_model_registry())
+
+
+def _analyze_segment_in_worker(
+    video_path: str, sample_sec: float, frame_step: int, start_frame: int, end_frame: int | None
+) -> tuple[list[FrameRecord], float, WarmupTracks]:
+    assert _segment_service is not None
+    return _segment_service._analyze_segment(video_path, sample_sec, frame_step, start_frame, end_frame)
+
+
+def _get_segment_pool(workers: int) -> ProcessPoolExecutor:
+    global _segment_pool
+    with _segment_pool_lock:
+        if _segment_pool is None:
+            _segment_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_segment_worker,
+            )
+        return _segment_pool
+
+
+def shutdown_segment_pool() -> None:
+    global _segment_pool
+    with _segment_pool_lock:
+        if _segment_pool is not None:
+            _segment_pool.shutdown(wait=False, cancel_futures=True)
+            _segment_pool = None
 
 
 class VideoAnalysisService:
@@ -43,39 +218,60 @@ class VideoAnalysisService:
     - сохранение AnalysisResult + обновление Lecture
     """
 
-    def __init__(self, emotion_service=None) -> None:
-        # Инициализируем классификатор эмоций
-        model_path = Path(settings.EMOTION_MODEL_PATH)
-        if not model_path.is_absolute():
-            # Относительный путь от корня проекта
-            base_dir = Path(__file__).resolve().parents[2]
-            model_path = base_dir / model_path
-        self._emotion_classifier = EmotionClassifier(str(model_path))
-        
-        # Инициализируем оценщик внимания
-        self._attention_estimator = AttentionEstimator(
-            yaw_ok=settings.ATTENTION_YAW_OK,
-            pitch_ok=settings.ATTENTION_PITCH_OK,
-            max_faces=settings.FACE_DETECT_MAX_FACES,
-            min_detection_confidence=settings.FACE_DETECT_MIN_CONF,
-            pad_ratio=settings.FACE_PAD_RATIO,
-        )
-        
+    def __init__(
+        self,
+        emotion_service=None,
+        models: ModelRegistry | None = None,
+        cache: AnalysisCache | None = None,
+        execution_mode: str | None = None,
+        concurrent_analyses: int | None = None,
+    ) -> None:
+        # Модели загружаются один раз на процесс и переиспользуются между запросами
+        self._models = models or get_model_registry()
+        # Кэш результатов по содержимому видео (None — кэш выключен)
+        self._cache = cache if cache is not None else get_analysis_cache()
+
         # базовая папка для артефактов (напр. смонтированная volume)
         self._artifacts_dir = Path(getattr(core_settings, "ARTIFACTS_DIR", "artifacts")).absolute()
         self._videos_dir = self._artifacts_dir / "videos"
         self._metrics_dir = Path(settings.METRICS_DIR).absolute()
+        self._metrics_format = settings.METRICS_FORMAT
         self._face_pad_ratio = settings.FACE_PAD_RATIO
         self._min_face_size = settings.FACE_MIN_SIZE
+        self._detect_every = max(1, settings.FACE_DETECT_EVERY_N)
+        self._track_iou = settings.FACE_TRACK_IOU
         self._positive_threshold = settings.POSITIVE_ENGAGEMENT_THRESHOLD
         self._min_samples = max(1, settings.MIN_SAMPLES_PER_VIDEO)
+        self._emotion_batch_size = max(1, settings.EMOTION_BATCH_SIZE)
+        self._emotion_batch_max_frames = max(1, settings.EMOTION_BATCH_MAX_FRAMES)
+        self._emotion_reuse_threshold = max(0.0, settings.EMOTION_REUSE_THRESHOLD)
+        self._emotion_reuse_max_staleness = max(0, settings.EMOTION_REUSE_MAX_STALENESS)
+        self._scene_gate_threshold = max(0.0, settings.SCENE_GATE_THRESHOLD)
+        self._scene_gate_max_skip_sec = max(0.0, settings.SCENE_GATE_MAX_SKIP_SEC)
+        self._frame_sampling_mode = settings.FRAME_SAMPLING_MODE
+        self._progress_interval = max(0.0, settings.ANALYSIS_PROGRESS_INTERVAL_SEC)
+        self._partial_interval = max(0.0, settings.ANALYSIS_PARTIAL_INTERVAL_SEC)
+        self._upload_chunk_size = max(64 * 1024, settings.UPLOAD_CHUNK_SIZE)
+        self._upload_max_bytes = max(0, settings.UPLOAD_MAX_BYTES)
+        self._execution_mode = execution_mode or settings.ANALYSIS_EXECUTION_MODE
+        # ядра делятся между анализами, которые идут одновременно (воркеры очереди):
+        # у каждого из них свой пул сегментов
+        concurrent_analyses = max(1, concurrent_analyses or settings.ANALYSIS_WORKERS)
+        self._segment_workers = max(
+            1, settings.ANALYSIS_SEGMENT_WORKERS or (os.cpu_count() or 1) // concurrent_analyses
+        )
+        self._segment_min_samples = max(1, settings.ANALYSIS_SEGMENT_MIN_SAMPLES)
+        self._segment_warmup_samples = max(0, settings.ANALYSIS_SEGMENT_WARMUP_SAMPLES)
+        self._pipeline_queue_size = max(1, settings.ANALYSIS_PIPELINE_QUEUE_SIZE)
+        # Время декодирования и анализа последнего видео (для логов и бенчмарков)
+        self.last_timings: dict = {}
 
         self._videos_dir.mkdir(parents=True, exist_ok=True)
         self._metrics_dir.mkdir(parents=True, exist_ok=True)
 
     # ========== Публичные методы ==========
 
-    async def create_lecture_and_run_analysis(
+    async def create_lecture_and_enqueue_analysis(
         self,
         *,
         session: AsyncSession,
@@ -83,16 +279,18 @@ class VideoAnalysisService:
         title: str,
         subject: str | None,
         upload_file: UploadFile,
-    ):
+    ) -> LectureEntity | None:
         """
-        1) Сохраняем видео во временную папку
-        2) Создаём Lecture
-        3) Запускаем анализ
+        1) Сохраняем видео
+        2) Создаём Lecture в статусе pending
+        3) Ставим задачу анализа в очередь (её заберёт воркер, см. app.worker)
         """
         lecture_repo = LectureRepository(session)
+        job_repo = AnalysisJobRepository(session)
 
         # 1. Сохраняем видео
-        video_path = await self._save_uploaded_video(upload_file)
+        stored = await self.store_upload(upload_file)
+        video_path = stored.path
 
         # 2. Создаём лекцию в статусе pending
         lecture = await lecture_repo.create(
@@ -102,46 +300,100 @@ class VideoAnalysisService:
             video_tmp_path=str(video_path),
         )
 
-        # 3. Обновляем статус -> processing
-        await lecture_repo.update_status(
+        # 3. Задача в очереди
+        job = await job_repo.enqueue(
             lecture_id=lecture.id,
-            status=LectureStatusEnum.processing,
-            progress=0,
+            video_path=str(video_path),
+            sample_sec=settings.FRAME_SAMPLE_SEC,
+            video_sha256=stored.sha256,
         )
         await session.commit()
+        logger.info("Lecture {} queued for analysis (job {})", lecture.id, job.id)
+
+        return lecture
+
+    async def run_analysis_job(
+        self,
+        *,
+        session_factory: async_sessionmaker,
+        job_id: UUID,
+        lecture_id: UUID,
+        video_path: str,
+        sample_sec: float,
+        video_sha256: str | None = None,
+    ) -> None:
+        """
+        Выполняет задачу из очереди: анализ в отдельном потоке с отчётами о прогрессе
+        из цикла по кадрам, затем сохранение результата и финальные статусы.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def report(progress: int) -> bool:
+            async with session_factory() as session:
+                cancel_requested = await AnalysisJobRepository(session).update_progress(job_id, progress=progress)
+                await LectureRepository(session).update_status(
+                    lecture_id=lecture_id,
+                    status=LectureStatusEnum.processing,
+                    progress=progress,
+                )
+                await session.commit()
+                return cancel_requested
+
+        def on_progress(processed: int, expected: int) -> None:
+            # 100% ставится только после сохранения результата
+            progress = min(int(processed / expected * 100), 99) if expected else 0
+            if asyncio.run_coroutine_threadsafe(report(progress), loop).result():
+                raise AnalysisCancelledError(f"Analysis job {job_id} was cancelled")
+
+        async def save_partial(summary_json: str, processed_until_sec: float) -> None:
+            async with session_factory() as session:
+                await AnalysisJobRepository(session).update_partial(
+                    job_id, summary_json=summary_json, processed_until_sec=processed_until_sec
+                )
+                await session.commit()
+
+        def on_partial(online: OnlineSummary) -> None:
+            summary = self._partial_summary(online, lecture_id, sample_sec)
+            asyncio.run_coroutine_threadsafe(
+                save_partial(summary.model_dump_json(), online.processed_until_sec), loop
+            ).result()
 
-        # 4. Запускаем анализ
         try:
-            analysis_repo = AnalysisResultRepository(session)
-            await self._run_full_analysis(
-                session=session,
-                lecture_id=lecture.id,
-                video_path=video_path,
-                lecture_repo=lecture_repo,
-                analysis_repo=analysis_repo,
+            result = await asyncio.to_thread(
+                self._analyze_cached, video_path, sample_sec, video_sha256, on_progress, on_partial
             )
-        except Exception as e:
-            # В случае ошибки — помечаем лекцию как error
-            await lecture_repo.update_status(
-                lecture_id=lecture.id,
-                status=LectureStatusEnum.error,
-                progress=0,
-                error_message=str(e),
+            async with session_factory() as session:
+                await self._persist_analysis(
+                    session=session,
+                    lecture_id=lecture_id,
+                    sample_sec=sample_sec,
+                    result=result,
+                )
+                await LectureRepository(session).update_status(
+                    lecture_id=lecture_id,
+                    status=LectureStatusEnum.done,
+                    progress=100,
+                )
+                await AnalysisJobRepository(session).finish(job_id, status=AnalysisJobStatusEnum.done)
+                await session.commit()
+        except AnalysisCancelledError:
+            logger.info("Analysis job {} cancelled", job_id)
+            await self._fail_job(
+                session_factory, job_id, lecture_id, AnalysisJobStatusEnum.cancelled, "Анализ отменён"
             )
-            await session.commit()
-            raise
-
-        # заново получаем лекцию с обновлённым статусом
-        return await lecture_repo.get_by_id(lecture.id)
+        except Exception as e:
+            logger.exception("Analysis job {} failed", job_id)
+            await self._fail_job(session_factory, job_id, lecture_id, AnalysisJobStatusEnum.error, str(e))
 
     async def analyze_video(
         self,
         *,
-        upload_tmp_path: str,
+        video_path: str,
         lecture_id: UUID,
         sample_sec: float,
         session: AsyncSession,
         analysis_repo: AnalysisResultRepository,
+        video_sha256: str | None = None,
     ) -> AnalyzeVideoResponse:
         """Новый метод для анализа видео с полным пайплайном"""
         # Run CPU-heavy work off the event loop
@@ -154,51 +406,15 @@ class VideoAnalysisService:
             top_peaks,
             top_dips,
             suggestions,
-        ) = await asyncio.to_thread(self._analyze_sync, upload_tmp_path, sample_sec)
+        ) = await asyncio.to_thread(self._analyze_cached, video_path, sample_sec, video_sha256)
 
-        summary = AnalysisSummary(
+        summary, out_path, entity = await self._persist_analysis(
+            session=session,
             lecture_id=lecture_id,
-            frames_analyzed=len(frames),
-            faces_total=sum(f.face_count for f in frames),
-            avg_attention=avg_att,
-            avg_engagement=avg_eng,
-            score=score,
-            emotion_hist=emotion_hist,
-            top_peaks=top_peaks,
-            top_dips=top_dips,
-            suggestions=suggestions,
-        )
-
-        # Persist metrics JSON
-        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-        out_name = f"{lecture_id}_{stamp}.json"
-        out_path = str(self._metrics_dir / out_name)
-
-        metrics_payload = {
-            "lecture_id": str(lecture_id),
-            "sample_sec": sample_sec,
-            "frames": [f.model_dump() for f in frames],
-            "highlights": {
-                "peaks": [h.model_dump() for h in top_peaks],
-                "dips": [h.model_dump() for h in top_dips],
-            },
-            "suggestions": suggestions,
-            "summary": summary.model_dump(mode="json"),
-        }
-
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(metrics_payload, f, ensure_ascii=False, indent=2)
-
-        # Save to DB
-        entity = await analysis_repo.create(
-            lecture_id=lecture_id,
-            avg_engagement=avg_eng,
-            avg_attention=avg_att,
-            score=score,
-            metrics_path=out_path,
-            summary_json=summary.model_dump_json(),
+            sample_sec=sample_sec,
+            result=(frames, avg_att, avg_eng, score, emotion_hist, top_peaks, top_dips, suggestions),
+            analysis_repo=analysis_repo,
         )
-
         await session.commit()
 
         from app.models.dtoModels.AnalysisDTO import AnalysisResultOut
@@ -208,28 +424,89 @@ class VideoAnalysisService:
             summary=summary,
             metrics_path=out_path,
             db_record=db_record,
-            frames=frames,
+            frames=[frame.to_dto() for frame in frames],
         )
 
-    # ========== Внутренние методы ==========
+    def analyze_file(self, video_path: str, lecture_id: UUID, sample_sec: float) -> tuple[AnalysisSummary, str]:
+        """
+        Анализ видеофайла без БД (офлайн-обработка, см. app.cli): те же кэш и артефакты метрик,
+        что у задачи из очереди. Возвращает (summary, metrics_path).
+        """
+        result = self._analyze_cached(video_path, sample_sec, file_sha256(video_path))
+        return self._write_metrics(lecture_id, sample_sec, result)
 
-    async def _save_uploaded_video(self, upload_file: UploadFile) -> Path:
-        """Сохраняет загруженное видео в файловую систему."""
+    async def store_upload(self, upload_file: UploadFile) -> StoredVideo:
+        """
+        Потоково сохраняет загруженное видео в artifacts/videos: читаем по UPLOAD_CHUNK_SIZE,
+        пишем в отдельном потоке, по ходу считаем sha256 и обрываем загрузку (413),
+        как только превышен UPLOAD_MAX_BYTES.
+        """
         suffix = Path(upload_file.filename or "video.mp4").suffix or ".mp4"
-        fname = f"{uuid.uuid4()}{suffix}"
-        out_path = self._videos_dir / fname
+        out_path = self._videos_dir / f"{uuid.uuid4()}{suffix}"
+        part_path = out_path.with_name(out_path.name + ".part")
+
+        # размер известен заранее (multipart уже разобран) — отказываем, не копируя
+        if self._upload_max_bytes and upload_file.size is not None and upload_file.size > self._upload_max_bytes:
+            raise self._upload_too_large()
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with part_path.open("wb") as f:
+                while chunk := await upload_file.read(self._upload_chunk_size):
+                    size += len(chunk)
+                    if self._upload_max_bytes and size > self._upload_max_bytes:
+                        raise self._upload_too_large()
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            part_path.replace(out_path)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
 
-        # читаем всё содержимое файла
-        data = await upload_file.read()
-        with out_path.open("wb") as f:
-            f.write(data)
+        return StoredVideo(path=out_path, size_bytes=size, sha256=digest.hexdigest())
+
+    # ========== Внутренние методы ==========
+
+    def _upload_too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Файл слишком большой (максимум {self._upload_max_bytes // (1024 * 1024)} МБ)",
+        )
+
+    def _analyze_cached(
+        self,
+        video_path: str,
+        sample_sec: float,
+        video_sha256: str | None = None,
+        progress_cb: ProgressCallback | None = None,
+        partial_cb: PartialCallback | None = None,
+    ) -> tuple:
+        """_analyze_sync через кэш: повторная загрузка того же видео с теми же параметрами не пересчитывается."""
+        if self._cache is None:
+            return self._analyze_sync(video_path, sample_sec, progress_cb, partial_cb)
+
+        key = self._cache.build_key(
+            video_sha256 or file_sha256(video_path), sample_sec, self._models.model_checksum
+        )
+        result = self._cache.get(key)
+        if result is not None:
+            self.last_timings = {"mode": "cache"}
+            logger.info("Analysis cache hit for {} ({} frames)", video_path, len(result[0]))
+            return result
 
-        return out_path
+        result = self._analyze_sync(video_path, sample_sec, progress_cb, partial_cb)
+        self._cache.put(key, result)
+        return result
 
     def _analyze_sync(
-        self, video_path: str, sample_sec: float
+        self,
+        video_path: str,
+        sample_sec: float,
+        progress_cb: ProgressCallback | None = None,
+        partial_cb: PartialCallback | None = None,
     ) -> tuple[
-        list[FrameMetrics],
+        list[FrameRecord],
         float,
         float,
         float,
@@ -241,183 +518,712 @@ class VideoAnalysisService:
         """
         Синхронный метод анализа видео (выполняется в отдельном потоке).
         Возвращает: (frames, avg_attention, avg_engagement, score, emotion_hist)
-        """
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Не удалось открыть видео: {video_path}")
-
-        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
-        frame_step = max(int(fps * sample_sec), 1)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        if total_frames > 0:
-            adaptive_step = max(total_frames // self._min_samples, 1)
-            frame_step = min(frame_step, adaptive_step)
 
-        frames: list[FrameMetrics] = []
-        frame_idx = 0
-        emotion_sum: dict[str, float] = {}
+        progress_cb вызывается из цикла по кадрам не чаще ANALYSIS_PROGRESS_INTERVAL_SEC;
+        исключение из него прерывает анализ (так работает отмена задачи).
+        partial_cb получает сводку по уже обработанным кадрам не чаще ANALYSIS_PARTIAL_INTERVAL_SEC.
+        """
+        started = time.perf_counter()
+        reader = SampledFrameReader(
+            video_path, sample_sec, min_samples=self._min_samples, mode=self._frame_sampling_mode
+        )
+        expected_samples = -(-reader.total_frames // reader.frame_step) if reader.total_frames > 0 else 0
+        segments = self._plan_segments(expected_samples, reader.frame_step)
+        reporter = _ProgressReporter(
+            progress_cb,
+            partial_cb,
+            expected_samples,
+            self._progress_interval,
+            self._partial_interval,
+            self._highlight_candidates(sample_sec),
+        )
 
-        while True:
-            ret, frame_bgr = cap.read()
-            if not ret:
-                break
+        if len(segments) > 1:
+            reader.close()
+            segment_frames, decode_sec, warmups = self._analyze_segments(
+                video_path, sample_sec, reader.frame_step, segments, reporter
+            )
+            frames = [frame for part in segment_frames for frame in part]
+            timings = {"mode": "segments", "segments": len(segments), "frame_step": reader.frame_step}
+            strategy = f"{len(segments)} segments"
+        else:
+            tracker = self._create_tracker()
+            emotion_reuse = self._create_emotion_reuse()
+            scene_gate = self._create_scene_gate()
+            pipelined = self._execution_mode == "pipeline"
+            stage_timings: dict = {}
+            with reader, self._models.attention_estimator() as attention_estimator:
+                # состояние трекинга не должно зависеть от предыдущего видео
+                attention_estimator.reset()
+                stages = (reader, attention_estimator, tracker, emotion_reuse, scene_gate)
+                if pipelined:
+                    frames = self._analyze_frames_pipelined(*stages, reporter=reporter, stage_timings=stage_timings)
+                else:
+                    frames = self._analyze_frames(*stages, reporter=reporter)
+            segment_frames = [frames]
+            warmups = [[]]
+            decode_sec = reader.decode_sec
+            timings = {
+                "mode": "pipeline" if pipelined else "sequential",
+                **stage_timings,
+                **reader.stats(),
+                **tracker.stats(),
+                **emotion_reuse.stats(),
+                **scene_gate.stats(),
+            }
+            strategy = f"{reader.strategy}, pipeline" if pipelined else reader.strategy
+
+        timings["tracks"] = self._link_tracks(segment_frames, warmups)
+
+        total_sec = time.perf_counter() - started
+        self.last_timings = {
+            **timings,
+            "decode_sec": round(decode_sec, 3),
+            "analysis_sec": round(total_sec - decode_sec, 3),
+            "total_sec": round(total_sec, 3),
+        }
+        logger.info(
+            "Analyzed {} frames of {}: decode {:.2f}s ({}), analysis {:.2f}s",
+            len(frames), video_path, decode_sec, strategy, total_sec - decode_sec,
+        )
 
-            if frame_idx % frame_step == 0:
-                ts_sec = frame_idx / fps
+        if not frames:
+            raise ValueError("Не удалось обработать ни одного кадра")
 
-                # 1. Детекция лиц и оценка внимания
-                face_data = self._attention_estimator.estimate(frame_bgr)
-                frame_faces: list[FaceMetrics] = []
+        return self._summarize(frames, sample_sec)
 
-                for fd in face_data:
-                    bbox = fd["bbox"]
-                    x, y, w, h = bbox
+    def _analyze_frames(
+        self,
+        reader: SampledFrameReader,
+        attention_estimator: AttentionEstimator,
+        tracker: FaceTracker,
+        emotion_reuse: EmotionReuseCache,
+        scene_gate: SceneGate,
+        *,
+        reporter: _ProgressReporter | None = None,
+        skip_before: int = 0,
+        warmup: WarmupTracks | None = None,
+    ) -> list[FrameRecord]:
+        """
+        Основной цикл по кадрам. Кадры с индексом < skip_before только прогоняются
+        через трекер лиц (прогрев сегмента) и в результат не попадают; их треки
+        дописываются в warmup.
+        Кадры, которые scene_gate считает неизменившимися, не анализируются.
+        """
+        frames: list[FrameRecord] = []
+        emotion_classifier = self._models.emotion_classifier
+
+        # Кадры, чьи лица ещё ждут классификации эмоций (копим батч через несколько кадров)
+        pending: list[_PendingFrame] = []
+        pending_faces = 0
+
+        for frame_idx, ts_sec, frame_bgr in reader:
+            frame = self._detect_frame(
+                frame_idx,
+                ts_sec,
+                frame_bgr,
+                reader.frame_step,
+                attention_estimator,
+                tracker,
+                scene_gate,
+                skip_before,
+                warmup,
+            )
+            if frame is None:
+                continue
+            pending.append(frame)
+            pending_faces += len(frame.face_rois)
+
+            # 2. Классификация эмоций батчем
+            if pending_faces >= self._emotion_batch_size or len(pending) >= self._emotion_batch_max_frames:
+                done = len(frames)
+                self._flush_pending(pending, emotion_classifier, emotion_reuse, frames)
+                pending_faces = 0
+                if reporter is not None:
+                    reporter.frames_built(frames[done:])
+
+            if reporter is not None:
+                reporter.samples_done()
+
+        done = len(frames)
+        self._flush_pending(pending, emotion_classifier, emotion_reuse, frames)
+        if reporter is not None:
+            reporter.frames_built(frames[done:])
+        return frames
+
+    def _analyze_frames_pipelined(
+        self,
+        reader: SampledFrameReader,
+        attention_estimator: AttentionEstimator,
+        tracker: FaceTracker,
+        emotion_reuse: EmotionReuseCache,
+        scene_gate: SceneGate,
+        *,
+        reporter: _ProgressReporter | None = None,
+        stage_timings: dict | None = None,
+    ) -> list[FrameRecord]:
+        """
+        Тот же анализ, что и _analyze_frames, но стадии работают в своих потоках и
+        перекрываются по времени: декодирование -> детекция/трекинг -> классификация
+        эмоций батчами -> сборка результата в вызывающем потоке. OpenCV и ONNX Runtime/torch
+        отпускают GIL, поэтому декодирование следующих кадров идёт во время инференса.
+        Детекция — один поток: трекер и граф MediaPipe обрабатывают кадры строго по порядку.
+        Результат совпадает с последовательным проходом.
+        """
+        frames: list[FrameRecord] = []
+        emotion_classifier = self._models.emotion_classifier
+        pending: list[_PendingFrame] = []
+        pending_faces = 0
+
+        def detect(item: tuple[int, float, np.ndarray]) -> list[_PendingFrame]:
+            frame = self._detect_frame(*item, reader.frame_step, attention_estimator, tracker, scene_gate, 0)
+            return [frame] if frame is not None else []
+
+        def classify(frame: _PendingFrame) -> list[FrameRecord]:
+            nonlocal pending_faces
+            pending.append(frame)
+            pending_faces += len(frame.face_rois)
+            if pending_faces < self._emotion_batch_size and len(pending) < self._emotion_batch_max_frames:
+                return []
+            pending_faces = 0
+            return flush()
+
+        def flush() -> list[FrameRecord]:
+            done = len(frames)
+            self._flush_pending(pending, emotion_classifier, emotion_reuse, frames)
+            return frames[done:]
+
+        pipeline = (
+            StagePipeline(reader, source_name="read", queue_size=self._pipeline_queue_size)
+            .add_stage("detect", detect)
+            .add_stage("classify", classify, finish=flush)
+        )
+        with pipeline:
+            for frame in pipeline:
+                if reporter is not None:
+                    reporter.frames_built([frame])
+                    reporter.samples_done()
 
-                    # Извлекаем лицо
-                    if min(w, h) < self._min_face_size:
-                        continue
+        if stage_timings is not None:
+            stage_timings.update(pipeline.stats())
+        return frames
 
-                    face_roi = self._extract_face_roi(frame_bgr, (x, y, w, h))
-                    if face_roi.size == 0:
-                        continue
+    def _detect_frame(
+        self,
+        frame_idx: int,
+        ts_sec: float,
+        frame_bgr: np.ndarray,
+        frame_step: int,
+        attention_estimator: AttentionEstimator,
+        tracker: FaceTracker,
+        scene_gate: SceneGate,
+        skip_before: int,
+        warmup: WarmupTracks | None = None,
+    ) -> _PendingFrame | None:
+        """Лица кадра с кропами для классификатора; None — кадр прогрева, в результат не идёт."""
+        # 0. Сцена не изменилась с последнего анализа — повторяем его метрики
+        if frame_idx >= skip_before and scene_gate.should_skip(ts_sec, frame_bgr):
+            return _PendingFrame(ts_sec, [], [], repeat=True)
+
+        # 1. Детекция (или трекинг) лиц и оценка внимания
+        face_data = tracker.process(frame_idx // frame_step, frame_bgr, attention_estimator)
+        if frame_idx < skip_before:
+            if warmup is not None:
+                warmup.append((ts_sec, [(fd["track_id"], fd["bbox"]) for fd in face_data]))
+            return None
+
+        kept_faces: list[dict] = []
+        face_rois: list[np.ndarray] = []
+
+        for fd in face_data:
+            x, y, w, h = fd["bbox"]
+
+            # Извлекаем лицо
+            if min(w, h) < self._min_face_size:
+                continue
+
+            face_roi = self._extract_face_roi(frame_bgr, (x, y, w, h))
+            if face_roi.size == 0:
+                continue
+
+            kept_faces.append(fd)
+            face_rois.append(face_roi)
+
+        return _PendingFrame(ts_sec, kept_faces, face_rois)
+
+    # ========== Параллельный анализ по сегментам ==========
+
+    def _plan_segments(self, expected_samples: int, frame_step: int) -> list[tuple[int, int | None]]:
+        """
+        Делит видео на сегменты [start_frame, end_frame), выровненные по шагу выборки,
+        чтобы сегменты в сумме давали ровно те же кадры, что и один проход.
+        Последний сегмент открыт справа (CAP_PROP_FRAME_COUNT бывает неточным).
+        С SceneGate или повторным использованием эмоций видео не делится: их состояние
+        (эталонный кадр, отпечатки треков) зависит от всей предыстории, и прогрев сегмента
+        его не восстанавливает — результат разошёлся бы с последовательным проходом.
+        """
+        if self._execution_mode != "segments" or expected_samples <= 0:
+            return [(0, None)]
+        if self._create_scene_gate().enabled or self._create_emotion_reuse().enabled:
+            logger.info("Scene gate or emotion reuse is on: analyzing the video in one pass instead of segments")
+            return [(0, None)]
+
+        workers = self._segment_workers
+        count = min(workers, expected_samples // self._segment_min_samples)
+        if count <= 1:
+            return [(0, None)]
+
+        # границы кратны FACE_DETECT_EVERY_N, чтобы полные детекции шли на тех же кадрах
+        k = self._detect_every
+        bounds = sorted({round(i * expected_samples / count / k) * k for i in range(count + 1)})
+        count = len(bounds) - 1
+        if count <= 1:
+            return [(0, None)]
+        segments: list[tuple[int, int | None]] = [
+            (bounds[i] * frame_step, bounds[i + 1] * frame_step) for i in range(count)
+        ]
+        segments[-1] = (segments[-1][0], None)
+        return segments
+
+    def _analyze_segments(
+        self,
+        video_path: str,
+        sample_sec: float,
+        frame_step: int,
+        segments: list[tuple[int, int | None]],
+        reporter: _ProgressReporter,
+    ) -> tuple[list[list[FrameRecord]], float, list[WarmupTracks]]:
+        """
+        Сегменты считаются в пуле процессов; результаты возвращаются в порядке сегментов.
+        В промежуточную сводку попадают только сегменты, перед которыми всё уже готово
+        (сводка растёт по времени без пропусков).
+        """
+        pool = _get_segment_pool(self._segment_workers)
+        futures = [
+            pool.submit(_analyze_segment_in_worker, video_path, sample_sec, frame_step, start, end)
+            for start, end in segments
+        ]
+
+        results: dict[int, tuple[list[FrameRecord], float, WarmupTracks]] = {}
+        index_of = {future: i for i, future in enumerate(futures)}
+        reported = 0
+        # ждём с таймаутом: progress_cb (heartbeat задачи и проверка отмены) вызывается
+        # и пока сегменты ещё считаются, а не только по завершении сегмента
+        tick = max(self._progress_interval, _SEGMENT_POLL_SEC)
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=tick, return_when=FIRST_COMPLETED)
+                finished_samples = 0
+                for future in done:
+                    results[index_of[future]] = future.result()
+                    finished_samples += len(results[index_of[future]][0])
+                while reported in results:
+                    reporter.frames_built(results[reported][0])
+                    reported += 1
+                reporter.samples_done(finished_samples, force=True)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
 
-                    # 2. Классификация эмоций
-                    try:
-                        top_emotion, top_prob, emotion_dist = self._emotion_classifier.predict(face_roi)
-                        affect = self._emotion_classifier.affect_from_distribution(emotion_dist)
-                    except Exception:
-                        # Если не удалось классифицировать, используем нейтральные значения
-                        top_emotion, top_prob = "neutral", 0.0
-                        emotion_dist = {"neutral": 1.0}
-                        affect = 0.5
-
-                    # 3. Вычисляем engagement
-                    attention = fd["attention"]
-                    engagement = (
-                        settings.WEIGHT_ATTENTION * attention + settings.WEIGHT_AFFECT * affect
-                    )
-
-                    # Собираем метрики лица
-                    face_metrics = FaceMetrics(
-                        bbox=bbox,
-                        yaw_deg=fd["yaw"],
-                        pitch_deg=fd["pitch"],
-                        roll_deg=fd["roll"],
-                        attention=attention,
-                        affect=affect,
-                        engagement=engagement,
-                        top_emotion=FaceEmotion(label=top_emotion, prob=top_prob),
-                        emotions=emotion_dist,
-                        looking_target=fd["looking_target"],
-                    )
-
-                    frame_faces.append(face_metrics)
-
-                    # Суммируем эмоции
-                    weight = max(attention, 0.2)
-                    for emo, prob in emotion_dist.items():
-                        emotion_sum[emo] = emotion_sum.get(emo, 0.0) + prob * weight
-
-                face_count = len(frame_faces)
-                positive_faces = sum(
-                    1
-                    for frm_face in frame_faces
-                    if frm_face.engagement >= self._positive_threshold
-                    or (
-                        frm_face.top_emotion
-                        and frm_face.top_emotion.label in POSITIVE_EMOTIONS
-                        and frm_face.top_emotion.prob >= 0.5
-                    )
-                )
-                if face_count:
-                    attention_values = np.array([frm_face.attention for frm_face in frame_faces], dtype=np.float32)
-                    weights = np.clip(attention_values, 0.1, 1.0)
-                    attention_ratio = float(np.average(attention_values, weights=weights))
-                else:
-                    attention_ratio = 0.0
-                engagement_ratio = float(positive_faces / face_count) if face_count else 0.0
-
-                frames.append(
-                    FrameMetrics(
-                        ts_sec=ts_sec,
-                        faces=frame_faces,
-                        engagement_ratio=engagement_ratio,
-                        attention_ratio=attention_ratio,
-                        positive_faces=positive_faces,
-                        face_count=face_count,
-                    )
-                )
+        frames = [results[i][0] for i in range(len(segments))]
+        decode_sec = sum(results[i][1] for i in range(len(segments)))
+        return frames, decode_sec, [results[i][2] for i in range(len(segments))]
 
-            frame_idx += 1
+    def _analyze_segment(
+        self, video_path: str, sample_sec: float, frame_step: int, start_frame: int, end_frame: int | None
+    ) -> tuple[list[FrameRecord], float, WarmupTracks]:
+        """
+        Кадры сегмента, время декодирования и треки кадров прогрева (для _link_tracks).
+        frame_step — шаг выборки всего видео (из _analyze_sync), по нему считается начало прогрева.
+        """
+        # несколько предыдущих полных детекций прогоняем через трекер, чтобы его состояние
+        # на первом кадре сегмента совпадало с последовательным проходом: не меньше
+        # max_misses + 1 детекций, иначе трек, пропавший на последних кадрах прошлого
+        # сегмента (он ещё жив в последовательном трекере), получит новый номер
+        tracker = self._create_tracker()
+        warmup_detections = self._segment_warmup_samples
+        if warmup_detections:
+            warmup_detections = max(warmup_detections, tracker.max_misses + 1)
+        warmup_start = max(0, start_frame - warmup_detections * self._detect_every * frame_step)
+
+        reader = SampledFrameReader(
+            video_path,
+            sample_sec,
+            min_samples=self._min_samples,
+            mode=self._frame_sampling_mode,
+            start_frame=warmup_start,
+            end_frame=end_frame,
+        )
+        warmup: WarmupTracks = []
+        with reader, self._models.attention_estimator() as attention_estimator:
+            attention_estimator.reset()
+            frames = self._analyze_frames(
+                reader,
+                attention_estimator,
+                tracker,
+                self._create_emotion_reuse(),
+                self._create_scene_gate(),
+                skip_before=start_frame,
+                warmup=warmup,
+            )
+        return frames, reader.decode_sec, warmup
 
-        cap.release()
+    def _create_tracker(self) -> FaceTracker:
+        return FaceTracker(detect_every=self._detect_every, iou_threshold=self._track_iou)
 
-        if not frames:
-            raise ValueError("Не удалось обработать ни одного кадра")
+    def _create_emotion_reuse(self) -> EmotionReuseCache:
+        return EmotionReuseCache(self._emotion_reuse_threshold, self._emotion_reuse_max_staleness)
 
-        # Агрегация
-        meaningful_frames = [frame for frame in frames if frame.face_count > 0]
+    def _create_scene_gate(self) -> SceneGate:
+        return SceneGate(self._scene_gate_threshold, self._scene_gate_max_skip_sec)
 
-        if meaningful_frames:
-            avg_att = float(np.mean([frame.attention_ratio for frame in meaningful_frames]))
-            avg_eng = float(np.mean([frame.engagement_ratio for frame in meaningful_frames]))
+    def _link_tracks(self, segment_frames: list[list[FrameRecord]], warmups: list[WarmupTracks]) -> int:
+        """
+        Перенумеровывает track_id по порядку первого появления в результате.
+        Номера треков внутри сегмента локальные. На стыке сегментов треки продолжаются по
+        кадрам прогрева следующего сегмента: это те же кадры, что и в конце предыдущего,
+        поэтому трек, которого нет на первом кадре сегмента (лицо на миг закрыли), всё равно
+        получает свой номер, как в последовательном проходе. Без прогрева — по последнему
+        кадру предыдущего сегмента и первому кадру следующего.
+        Возвращает число треков.
+        """
+        next_id = 0
+        prev_frames: list[FrameRecord] = []
+        for frames, warmup in zip(segment_frames, warmups):
+            mapping: dict[int, int] = {}
+            if prev_frames and frames:
+                mapping = self._match_segment_tracks(prev_frames, frames, warmup)
+
+            for frame in frames:
+                for face in frame.faces:
+                    if face.track_id is None:
+                        continue
+                    if face.track_id not in mapping:
+                        mapping[face.track_id] = next_id
+                        next_id += 1
+                    face.track_id = mapping[face.track_id]
+            if frames:
+                prev_frames = frames
+        return next_id
+
+    def _match_segment_tracks(
+        self, prev_frames: list[FrameRecord], frames: list[FrameRecord], warmup: WarmupTracks
+    ) -> dict[int, int]:
+        """Локальный track_id сегмента -> уже перенумерованный track_id предыдущего сегмента."""
+        prev_by_ts = {frame.ts_sec: frame for frame in prev_frames}
+        overlap = [(prev_by_ts[ts], faces) for ts, faces in warmup if ts in prev_by_ts]
+        if not overlap:
+            first_frame = frames[0]
+            overlap = [(prev_frames[-1], [(face.track_id, face.bbox) for face in first_frame.faces])]
+
+        # голоса за пары треков по всем общим кадрам; сопоставление один к одному
+        votes: Counter[tuple[int, int]] = Counter()
+        for prev_frame, faces in overlap:
+            pairs = match_boxes([face.bbox for face in prev_frame.faces], [bbox for _, bbox in faces], self._track_iou)
+            for i, j in pairs:
+                prev_id, local_id = prev_frame.faces[i].track_id, faces[j][0]
+                if prev_id is not None and local_id is not None:
+                    votes[(local_id, prev_id)] += 1
+
+        mapping: dict[int, int] = {}
+        used: set[int] = set()
+        for (local_id, prev_id), _ in votes.most_common():
+            if local_id not in mapping and prev_id not in used:
+                mapping[local_id] = prev_id
+                used.add(prev_id)
+        return mapping
+
+    def _summarize(
+        self, frames: list[FrameRecord], sample_sec: float
+    ) -> tuple[
+        list[FrameRecord],
+        float,
+        float,
+        float,
+        dict[str, float],
+        list[TimelineHighlight],
+        list[TimelineHighlight],
+        list[str],
+    ]:
+        # Агрегация по колонкам кадров
+        n_frames = len(frames)
+        ts = np.fromiter((frame.ts_sec for frame in frames), dtype=np.float64, count=n_frames)
+        attention = np.fromiter((frame.attention_ratio for frame in frames), dtype=np.float64, count=n_frames)
+        engagement = np.fromiter((frame.engagement_ratio for frame in frames), dtype=np.float64, count=n_frames)
+        meaningful = np.fromiter((frame.face_count > 0 for frame in frames), dtype=bool, count=n_frames)
+
+        if meaningful.any():
+            avg_att = float(np.mean(attention[meaningful]))
+            avg_eng = float(np.mean(engagement[meaningful]))
         else:
             avg_att = 0.0
             avg_eng = 0.0
 
-        total = sum(emotion_sum.values()) or 1.0
-        emotion_hist = {k: float(v / total) for k, v in sorted(emotion_sum.items())}
+        emotion_hist = normalize_histogram(emotion_sums(frames))
 
         score = float(0.7 * avg_eng + 0.3 * avg_att)
 
-        top_peaks, top_dips = self._build_highlights(frames, sample_sec)
+        top_peaks, top_dips = self._build_highlights(
+            ts[meaningful], attention[meaningful], engagement[meaningful], sample_sec
+        )
         suggestions = self._generate_suggestions(avg_eng, avg_att, top_peaks, top_dips)
 
         return frames, avg_att, avg_eng, score, emotion_hist, top_peaks, top_dips, suggestions
 
+    def _partial_summary(self, online: OnlineSummary, lecture_id: UUID, sample_sec: float) -> AnalysisSummary:
+        """Промежуточная сводка по уже обработанным кадрам (без рекомендаций — они по всей лекции)."""
+        avg_att = online.avg_attention
+        avg_eng = online.avg_engagement
+        top_peaks, top_dips = self._build_highlights(*online.columns(), sample_sec)
+        return AnalysisSummary(
+            lecture_id=lecture_id,
+            frames_analyzed=online.frames,
+            faces_total=online.faces,
+            avg_attention=avg_att,
+            avg_engagement=avg_eng,
+            score=float(0.7 * avg_eng + 0.3 * avg_att),
+            emotion_hist=normalize_histogram(online.emotion_sum),
+            top_peaks=top_peaks,
+            top_dips=top_dips,
+        )
+
+    def _flush_pending(
+        self,
+        pending: list[_PendingFrame],
+        emotion_classifier: EmotionClassifier,
+        emotion_reuse: EmotionReuseCache,
+        frames: list[FrameRecord],
+    ) -> None:
+        """Один прогон классификатора по всем накопленным лицам, затем сборка FrameRecord по порядку."""
+        if not pending:
+            return
+
+        rois = [roi for frame in pending for roi in frame.face_rois]
+        if emotion_reuse.enabled:
+            track_ids = [fd.get("track_id") for frame in pending for fd in frame.faces]
+            emotions = self._classify_faces_reusing(emotion_classifier, emotion_reuse, rois, track_ids)
+        else:
+            emotions = self._classify_faces(emotion_classifier, rois)
+
+        offset = 0
+        for frame in pending:
+            if frame.repeat:
+                # сцена не изменилась — копия предыдущего кадра с новым временем
+                frames.append(frames[-1].copy(frame.ts_sec))
+                continue
+            n = len(frame.face_rois)
+            frames.append(
+                self._build_frame_metrics(
+                    frame.ts_sec, frame.faces, emotions[offset:offset + n], emotion_classifier
+                )
+            )
+            offset += n
+        pending.clear()
+
+    @staticmethod
+    def _classify_faces(
+        emotion_classifier: EmotionClassifier,
+        face_rois: list[np.ndarray],
+        batch: np.ndarray | None = None,
+    ) -> list[tuple[str, float, dict[str, float]]]:
+        try:
+            if batch is not None:
+                return emotion_classifier.predict_preprocessed(batch)
+            return emotion_classifier.predict_batch(face_rois)
+        except Exception:
+            # Батч целиком не прошёл — классифицируем по одному, чтобы не терять остальные лица
+            results = []
+            for face_roi in face_rois:
+                try:
+                    results.append(emotion_classifier.predict(face_roi))
+                except Exception:
+                    results.append(_FALLBACK_EMOTION)
+            return results
+
+    @classmethod
+    def _classify_faces_reusing(
+        cls,
+        emotion_classifier: EmotionClassifier,
+        emotion_reuse: EmotionReuseCache,
+        face_rois: list[np.ndarray],
+        track_ids: list[int | None],
+    ) -> list[tuple[str, float, dict[str, float]]]:
+        """Модель считается только для лиц, чей кроп заметно изменился с прошлой классификации трека."""
+        try:
+            batch = emotion_classifier.preprocess_batch(face_rois)
+        except Exception:
+            return cls._classify_faces(emotion_classifier, face_rois)
+
+        entries = []
+        missing: list[int] = []
+        for i, track_id in enumerate(track_ids):
+            fingerprint = emotion_reuse.fingerprint(batch[i])
+            entry = emotion_reuse.lookup(track_id, fingerprint)
+            if entry is None:
+                entry = emotion_reuse.store(track_id, fingerprint)
+                missing.append(i)
+            entries.append(entry)
+
+        results = cls._classify_faces(emotion_classifier, [face_rois[i] for i in missing], batch[missing])
+        for i, result in zip(missing, results):
+            entries[i].result = result
+            if result is _FALLBACK_EMOTION:
+                # нейтральную заглушку дальше не раздаём
+                emotion_reuse.discard(track_ids[i])
+        return [entry.result for entry in entries]
+
+    def _build_frame_metrics(
+        self,
+        ts_sec: float,
+        face_data: list[dict],
+        emotions: list[tuple[str, float, dict[str, float]]],
+        emotion_classifier: EmotionClassifier,
+    ) -> FrameRecord:
+        frame_faces: list[FaceRecord] = []
+
+        for fd, emotion in zip(face_data, emotions):
+            top_emotion, top_prob, emotion_dist = emotion
+            if emotion is _FALLBACK_EMOTION:
+                affect = 0.5
+            else:
+                affect = emotion_classifier.affect_from_distribution(emotion_dist)
+
+            # 3. Вычисляем engagement
+            attention = fd["attention"]
+            engagement = (
+                settings.WEIGHT_ATTENTION * attention + settings.WEIGHT_AFFECT * affect
+            )
+
+            # Собираем метрики лица (DTO FaceMetrics строится только при отдаче наружу)
+            face_metrics = FaceRecord(
+                bbox=tuple(fd["bbox"]),
+                yaw_deg=fd["yaw"],
+                pitch_deg=fd["pitch"],
+                roll_deg=fd["roll"],
+                attention=attention,
+                affect=affect,
+                engagement=engagement,
+                top_label=top_emotion,
+                top_prob=top_prob,
+                emotions=emotion_dist,
+                looking_target=fd["looking_target"],
+                track_id=fd.get("track_id"),
+            )
+
+            frame_faces.append(face_metrics)
+
+        face_count = len(frame_faces)
+        positive_faces = sum(
+            1
+            for frm_face in frame_faces
+            if frm_face.engagement >= self._positive_threshold
+            or (frm_face.top_label in POSITIVE_EMOTIONS and frm_face.top_prob >= 0.5)
+        )
+        if face_count:
+            attention_values = np.array([frm_face.attention for frm_face in frame_faces], dtype=np.float32)
+            weights = np.clip(attention_values, 0.1, 1.0)
+            attention_ratio = float(np.average(attention_values, weights=weights))
+        else:
+            attention_ratio = 0.0
+        engagement_ratio = float(positive_faces / face_count) if face_count else 0.0
+
+        return FrameRecord(
+            ts_sec=ts_sec,
+            faces=frame_faces,
+            engagement_ratio=engagement_ratio,
+            attention_ratio=attention_ratio,
+            positive_faces=positive_faces,
+            face_count=face_count,
+        )
+
     def _build_highlights(
         self,
-        frames: list[FrameMetrics],
+        ts: np.ndarray,
+        attention: np.ndarray,
+        engagement: np.ndarray,
         sample_sec: float,
         limit: int = 3,
     ) -> tuple[list[TimelineHighlight], list[TimelineHighlight]]:
-        """Find peak and dip moments for timeline summaries."""
-        meaningful = [frame for frame in frames if frame.face_count > 0]
-        if not meaningful:
+        """
+        Find peak and dip moments for timeline summaries.
+        ts / attention / engagement — колонки кадров с лицами.
+        """
+        if not len(ts):
             return [], []
 
-        window = max(sample_sec * 3.0, 2.0)
+        window = self._highlight_window(sample_sec)
+        peaks = [
+            self._frame_to_highlight(float(ts[i]), float(engagement[i]), float(attention[i]), window, "Peak engagement")
+            for i in self._pick_extremes(ts, -engagement, window, limit)
+        ]
+        dips = [
+            self._frame_to_highlight(float(ts[i]), float(engagement[i]), float(attention[i]), window, "Engagement dip")
+            for i in self._pick_extremes(ts, engagement, window, limit)
+        ]
+        return peaks, dips
 
-        def pick(sorted_frames: list[FrameMetrics]) -> list[FrameMetrics]:
-            selected: list[FrameMetrics] = []
-            for frame in sorted_frames:
-                if all(abs(frame.ts_sec - prev.ts_sec) >= window for prev in selected):
-                    selected.append(frame)
-                if len(selected) >= limit:
-                    break
-            return selected
+    @staticmethod
+    def _highlight_window(sample_sec: float) -> float:
+        return max(sample_sec * 3.0, 2.0)
 
-        sorted_peaks = sorted(meaningful, key=lambda frame: frame.engagement_ratio, reverse=True)
-        sorted_dips = sorted(meaningful, key=lambda frame: frame.engagement_ratio)
+    @classmethod
+    def _highlight_candidates(cls, sample_sec: float, limit: int = 3) -> int:
+        """
+        Сколько кадров с наибольшим/наименьшим engagement хранить для промежуточных пиков/провалов.
+        Каждый выбранный кадр подавляет соседей в пределах окна; кадры идут не чаще
+        sample_sec / 2 (шаг выборки округляется до целого числа кадров видео), поэтому
+        limit разнесённых кадров всегда находятся среди limit * (кадров в двух окнах + 1) лучших.
+        """
+        per_window = int(np.ceil(cls._highlight_window(sample_sec) / (sample_sec / 2)))
+        return limit * (2 * per_window + 1)
 
-        peaks = [self._frame_to_highlight(frame, window, "Peak engagement") for frame in pick(sorted_peaks)]
-        dips = [self._frame_to_highlight(frame, window, "Engagement dip") for frame in pick(sorted_dips)]
-        return peaks, dips
+    @staticmethod
+    def _pick_extremes(ts: np.ndarray, values: np.ndarray, window: float, limit: int) -> list[int]:
+        """
+        NMS по времени: индексы кадров по возрастанию values (при равенстве — раньше по времени),
+        каждый не ближе window секунд к уже выбранным, не больше limit штук.
+        Сортируются только кандидаты из argpartition; если среди них не нашлось limit
+        разнесённых кадров, кандидатов становится больше.
+        """
+        n = len(values)
+        candidates = min(n, max(limit * 8, 32))
+        while True:
+            if candidates < n:
+                threshold = values[np.argpartition(values, candidates - 1)[candidates - 1]]
+                # все кадры со значением <= порога, включая равные ему: порядок совпадает с полной сортировкой
+                order = np.flatnonzero(values <= threshold)
+            else:
+                order = np.arange(n)
+            order = order[np.argsort(values[order], kind="stable")]
+
+            selected: list[int] = []
+            for i in order.tolist():
+                if all(abs(ts[i] - ts[j]) >= window for j in selected):
+                    selected.append(i)
+                    if len(selected) >= limit:
+                        return selected
+            if len(order) == n:
+                return selected
+            candidates *= 4
 
     def _frame_to_highlight(
         self,
-        frame: FrameMetrics,
+        ts_sec: float,
+        engagement_ratio: float,
+        attention_ratio: float,
         window: float,
         label_prefix: str,
     ) -> TimelineHighlight:
         half = window / 2
         return TimelineHighlight(
-            ts_sec=frame.ts_sec,
-            window_start_sec=max(frame.ts_sec - half, 0.0),
-            window_end_sec=frame.ts_sec + half,
-            engagement_ratio=frame.engagement_ratio,
-            attention_ratio=frame.attention_ratio,
-            label=f"{label_prefix} @ {self._format_timestamp(frame.ts_sec)}",
+            ts_sec=ts_sec,
+            window_start_sec=max(ts_sec - half, 0.0),
+            window_end_sec=ts_sec + half,
+            engagement_ratio=engagement_ratio,
+            attention_ratio=attention_ratio,
+            label=f"{label_prefix} @ {self._format_timestamp(ts_sec)}",
         )
 
     def _generate_suggestions(
@@ -458,45 +1264,36 @@ class VideoAnalysisService:
         seconds = int(ts_sec % 60)
         return f"{minutes}:{seconds:02d}"
 
-    async def _run_full_analysis(
+    async def _persist_analysis(
         self,
         *,
         session: AsyncSession,
         lecture_id: UUID,
-        video_path: Path,
-        lecture_repo: LectureRepository,
-        analysis_repo: AnalysisResultRepository,
-    ) -> None:
+        sample_sec: float,
+        result: tuple,
+        analysis_repo: AnalysisResultRepository | None = None,
+    ):
         """
-        Полный пайплайн анализа видео (используется в create_lecture_and_run_analysis).
+        Сохраняет метрики по кадрам (METRICS_FORMAT) и AnalysisResult. Коммит делает вызывающий код.
+        Возвращает (summary, metrics_path, entity).
         """
-        # Запускаем анализ в отдельном потоке
-        (
-            frames,
-            avg_att,
-            avg_eng,
-            score,
-            emotion_hist,
-            top_peaks,
-            top_dips,
-            suggestions,
-        ) = await asyncio.to_thread(self._analyze_sync, str(video_path), settings.FRAME_SAMPLE_SEC)
+        analysis_repo = analysis_repo or AnalysisResultRepository(session)
+        summary, out_path = self._write_metrics(lecture_id, sample_sec, result)
 
-        total_frames = len(frames)
+        # Сохраняем AnalysisResult
+        entity = await analysis_repo.create(
+            lecture_id=lecture_id,
+            avg_engagement=summary.avg_engagement,
+            avg_attention=summary.avg_attention,
+            score=summary.score,
+            metrics_path=out_path,
+            summary_json=summary.model_dump_json(),
+        )
+        return summary, out_path, entity
 
-        # Обновляем прогресс
-        for idx, _ in enumerate(frames):
-            progress = int((idx + 1) / total_frames * 100)
-            await lecture_repo.update_status(
-                lecture_id=lecture_id,
-                status=LectureStatusEnum.processing,
-                progress=progress,
-            )
-            await session.commit()
-        # ���?�:�?���?�?��? metrics.json
-        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-        out_name = f"{lecture_id}_{stamp}.json"
-        metrics_path = self._metrics_dir / out_name
+    def _write_metrics(self, lecture_id: UUID, sample_sec: float, result: tuple) -> tuple[AnalysisSummary, str]:
+        """Сводка анализа и файл(ы) метрик по кадрам в metrics_dir. Возвращает (summary, metrics_path)."""
+        frames, avg_att, avg_eng, score, emotion_hist, top_peaks, top_dips, suggestions = result
 
         summary = AnalysisSummary(
             lecture_id=lecture_id,
@@ -511,10 +1308,12 @@ class VideoAnalysisService:
             suggestions=suggestions,
         )
 
-        metrics_payload = {
+        # Сохраняем метрики по кадрам
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        base_name = f"{lecture_id}_{stamp}"
+        meta = {
             "lecture_id": str(lecture_id),
-            "sample_sec": settings.FRAME_SAMPLE_SEC,
-            "frames": [f.model_dump() for f in frames],
+            "sample_sec": sample_sec,
             "highlights": {
                 "peaks": [h.model_dump() for h in top_peaks],
                 "dips": [h.model_dump() for h in top_dips],
@@ -523,30 +1322,37 @@ class VideoAnalysisService:
             "summary": summary.model_dump(mode="json"),
         }
 
-        with open(metrics_path, "w", encoding="utf-8") as f:
-            json.dump(metrics_payload, f, ensure_ascii=False, indent=2)
-
-
-        # Сохраняем AnalysisResult
-        await analysis_repo.create(
-            lecture_id=lecture_id,
-            avg_engagement=avg_eng,
-            avg_attention=avg_att,
-            score=score,
-            metrics_path=str(metrics_path),
-            summary_json=summary.model_dump_json(),
-        )
-
-        # Обновляем лекцию -> done
-        await lecture_repo.update_status(
-            lecture_id=lecture_id,
-            status=LectureStatusEnum.done,
-            progress=100,
-            error_message=None,
-        )
-
-        await session.commit()
+        out_path = None
+        if self._metrics_format in ("columnar", "both"):
+            out_path = str(write_columnar_metrics(self._metrics_dir / base_name, frames, meta))
+        if self._metrics_format in ("json", "both"):
+            json_path = self._metrics_dir / f"{base_name}.json"
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {**meta, "frames": [f.to_dict() for f in frames]},
+                    f,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            out_path = out_path or str(json_path)
+        return summary, out_path
 
+    @staticmethod
+    async def _fail_job(
+        session_factory: async_sessionmaker,
+        job_id: UUID,
+        lecture_id: UUID,
+        status: str,
+        message: str,
+    ) -> None:
+        async with session_factory() as session:
+            await AnalysisJobRepository(session).finish(job_id, status=status, error_message=message)
+            await LectureRepository(session).update_status(
+                lecture_id=lecture_id,
+                status=LectureStatusEnum.error,
+                error_message=message,
+            )
+            await session.commit()
 
     def _extract_face_roi(self, frame: np.ndarray, bbox: tuple[int, int, int, int]) -> np.ndarray:
         x, y, w, h = bbox
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.infrastructure.logger import logger
+from app.models.dtoModels.AnalysisDTO import TimelineHighlight
+from app.services.frame_records import FrameRecord
+
+
+# Настройки, от которых зависит результат анализа (входят в ключ кэша).
+# Размер батча и режим исполнения на результат не влияют: конвейер и сегменты дают те же
+# кадры, треки и метрики, что и последовательный проход (с SceneGate или повтором эмоций
+# видео на сегменты не делится), другой состав батчей модели эмоций меняет вероятности
+# только в пределах округления float32. Способ чтения кадров входит в ключ:
+# побитовое совпадение кадров после seek и после grab не гарантировано для всех кодеков.
+CACHE_KEY_SETTINGS = (
+    "FRAME_SAMPLING_MODE",
+    "EMOTION_BACKEND",
+    "EMOTION_PRECISION",
+    "EMOTION_REUSE_THRESHOLD",
+    "EMOTION_REUSE_MAX_STALENESS",
+    "SCENE_GATE_THRESHOLD",
+    "SCENE_GATE_MAX_SKIP_SEC",
+    "MIN_SAMPLES_PER_VIDEO",
+    "ATTENTION_YAW_OK",
+    "ATTENTION_PITCH_OK",
+    "FACE_DETECT_MAX_FACES",
+    "FACE_DETECT_MIN_CONF",
+    "FACE_PAD_RATIO",
+    "FACE_MIN_SIZE",
+    "FACE_DETECT_LONG_EDGE",
+    "FACE_DETECT_AUTO_SCALE",
+    "FACE_DETECT_TILES",
+    "FACE_DETECT_TILE_OVERLAP",
+    "FACE_DETECT_EVERY_N",
+    "FACE_TRACK_IOU",
+    "POSITIVE_ENGAGEMENT_THRESHOLD",
+    "WEIGHT_ATTENTION",
+    "WEIGHT_AFFECT",
+)
+
+# Версия формата записи: меняется вместе с логикой анализа/агрегации
+CACHE_FORMAT_VERSION = 5
+
+
+def file_sha256(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of analysis results on disk (METRICS_DIR/cache).
+
+    Key = sha256 of (video content hash, sample_sec, model checksum, result-affecting settings).
+    Entries are JSON files; total size is bounded by evicting the least recently used
+    ones (mtime is refreshed on every hit). Writes go through a temp file + os.replace,
+    so several processes can share the directory.
+
+    Hit/miss counters are kept in memory and written to counters/<host>-<pid>.json at most
+    every few seconds (and at exit); stats() sums the files of all processes. A restarted
+    process with the same pid overwrites its predecessor's file.
+    """
+
+    # Как часто счётчики процесса сбрасываются в файл
+    _FLUSH_INTERVAL_SEC = 5.0
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self._root = Path(root)
+        self._counters_dir = self._root / "counters"
+        self._max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._counters_path = self._counters_dir / f"{socket.gethostname()}-{os.getpid()}.json"
+        self._flushed_at = 0.0
+        self._counters_dir.mkdir(parents=True, exist_ok=True)
+        atexit.register(self._flush_counters)
+
+    # ========== Ключ ==========
+
+    @staticmethod
+    def build_key(video_sha256: str, sample_sec: float, model_checksum: str) -> str:
+        params = {name: getattr(settings, name) for name in CACHE_KEY_SETTINGS}
+        raw = json.dumps(
+            {
+                "version": CACHE_FORMAT_VERSION,
+                "video": video_sha256,
+                "sample_sec": float(sample_sec),
+                "model": model_checksum,
+                "settings": params,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self._root / f"{key}.json"
+
+    # ========== Чтение / запись ==========
+
+    def get(self, key: str) -> tuple | None:
+        """Возвращает результат _analyze_sync или None при промахе."""
+        path = self._entry_path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                payload = json.load(f)
+            os.utime(path)  # LRU: отмечаем использование
+            result = (
+                [FrameRecord.from_dict(frame) for frame in payload["frames"]],
+                payload["avg_attention"],
+                payload["avg_engagement"],
+                payload["score"],
+                payload["emotion_hist"],
+                [TimelineHighlight.model_validate(h) for h in payload["top_peaks"]],
+                [TimelineHighlight.model_validate(h) for h in payload["top_dips"]],
+                payload["suggestions"],
+            )
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Broken analysis cache entry {}: {}", path.name, e)
+            path.unlink(missing_ok=True)
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return result
+
+    def put(self, key: str, result: tuple) -> None:
+        frames, avg_att, avg_eng, score, emotion_hist, top_peaks, top_dips, suggestions = result
+        payload = {
+            "frames": [f.to_dict() for f in frames],
+            "avg_attention": avg_att,
+            "avg_engagement": avg_eng,
+            "score": score,
+            "emotion_hist": emotion_hist,
+            "top_peaks": [h.model_dump() for h in top_peaks],
+            "top_dips": [h.model_dump() for h in top_dips],
+            "suggestions": suggestions,
+        }
+        path = self._entry_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to store analysis cache entry {}: {}", path.name, e)
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._count("stores")
+        self._evict()
+
+    def _entries(self) -> list[tuple[os.stat_result, Path]]:
+        entries = []
+        for path in self._root.glob("*.json"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _evict(self) -> None:
+        """Удаляет самые давно использованные записи, пока кэш больше max_bytes."""
+        if not self._max_bytes:
+            return
+        entries = self._entries()
+        total = sum(stat.st_size for stat, _ in entries)
+        if total <= self._max_bytes:
+            return
+
+        evicted = 0
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if total <= self._max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    # ========== Статистика ==========
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+            due = time.monotonic() - self._flushed_at >= self._FLUSH_INTERVAL_SEC
+        if due:
+            self._flush_counters()
+
+    def _flush_counters(self) -> None:
+        with self._lock:
+            counters = dict(self._counters)
+            self._flushed_at = time.monotonic()
+        try:
+            self._counters_path.write_text(json.dumps(counters), encoding="utf-8")
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        self._flush_counters()
+        totals = {name: 0 for name in self._counters}
+        for path in self._counters_dir.glob("*.json"):
+            try:
+                counters = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for name in totals:
+                totals[name] += int(counters.get(name, 0))
+
+        entries = self._entries()
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": round(totals["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(entries),
+            "size_bytes": sum(stat.st_size for stat, _ in entries),
+            "max_bytes": self._max_bytes,
+        }
+
+
+_cache: AnalysisCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache | None:
+    """Кэш процесса (None, если отключён через APP_ANALYSIS_CACHE_ENABLED)."""
+    global _cache
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache(Path(settings.METRICS_DIR).absolute() / "cache", settings.ANALYSIS_CACHE_MAX_BYTES)
+    return _cache
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Попарный IoU двух наборов (N, 4) и (M, 4) боксов x, y, w, h."""
+    inter, area_a, area_b = _intersections(a, b)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _intersections(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ax1, ay1, ax2, ay2 = a[:, 0:1], a[:, 1:2], a[:, 0:1] + a[:, 2:3], a[:, 1:2] + a[:, 3:4]
+    bx1, by1, bx2, by2 = b[:, 0], b[:, 1], b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    inter = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None) * np.clip(
+        np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None
+    )
+    return inter, a[:, 2] * a[:, 3], b[:, 2] * b[:, 3]
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float,
+    containment_threshold: float | None = None,
+) -> np.ndarray:
+    """
+    Greedy non-maximum suppression по убыванию score. Матрица перекрытий считается один раз.
+    containment_threshold — дополнительно подавляет бокс, который почти целиком лежит внутри
+    уже выбранного или накрывает его (пересечение / меньшая площадь): так убираются обрезанные
+    на краю тайла копии лица. Возвращает индексы оставленных боксов.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(boxes):
+        return np.zeros(0, dtype=np.int64)
+
+    inter, area, _ = _intersections(boxes, boxes)
+    union = area[:, None] + area[None, :] - inter
+    overlap = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0) > iou_threshold
+    if containment_threshold is not None:
+        smaller = np.minimum(area[:, None], area[None, :])
+        overlap |= np.divide(inter, smaller, out=np.zeros_like(inter), where=smaller > 0) > containment_threshold
+
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= overlap[i]
+    return np.array(keep, dtype=np.int64)
@@ -1,111 +1,132 @@
 from __future__ import annotations
 
-import cv2
+import threading
+
 import numpy as np
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
-from collections import OrderedDict
-from pathlib import Path
-from typing import Dict, Tuple
-
-
-class SeparableConv2d(nn.Module):
-    def __init__(self, in_ch: int, out_ch: int, k: int = 3, s: int = 1, p: int = 1) -> None:
-        super().__init__()
-        self.depthwise = nn.Conv2d(in_ch, in_ch, k, s, p, groups=in_ch, bias=False)
-        self.pointwise = nn.Conv2d(in_ch, out_ch, 1, 1, 0, bias=False)
-        self.bn = nn.BatchNorm2d(out_ch)
-
-    def forward(self, x: torch.Tensor) -> torch.Tensor:  # pragma: no cover - trivial
-        x = self.depthwise(x)
-        x = self.pointwise(x)
-        x = self.bn(x)
-        return F.relu(x, inplace=True)
-
-
-class MiniXBlock(nn.Module):
-    def __init__(self, in_ch: int, out_ch: int) -> None:
-        super().__init__()
-        self.sep1 = SeparableConv2d(in_ch, out_ch)
-        self.sep2 = SeparableConv2d(out_ch, out_ch)
-        self.pool = nn.MaxPool2d(3, stride=2, padding=1)
-        self.skip = nn.Conv2d(in_ch, out_ch, 1, stride=2, bias=False)
-        self.bn = nn.BatchNorm2d(out_ch)
-
-    def forward(self, x: torch.Tensor) -> torch.Tensor:  # pragma: no cover - trivial
-        y = self.sep1(x)
-        y = self.sep2(y)
-        y = self.pool(y)
-        s = self.bn(self.skip(x))
-        return F.relu(y + s, inplace=True)
-
-
-class MiniXEmotion(nn.Module):
-    def __init__(self, n_classes: int, in_ch: int = 1) -> None:
-        super().__init__()
-        self.entry = nn.Sequential(
-            nn.Conv2d(in_ch, 8, 3, padding=1, bias=False),
-            nn.BatchNorm2d(8),
-            nn.ReLU(inplace=True),
-        )
-        self.blocks = nn.Sequential(
-            MiniXBlock(8, 16),
-            MiniXBlock(16, 32),
-            MiniXBlock(32, 64),
-            MiniXBlock(64, 128),
-        )
-        self.head = nn.Sequential(
-            nn.Conv2d(128, 128, 3, padding=1, bias=False),
-            nn.BatchNorm2d(128),
-            nn.ReLU(inplace=True),
-            nn.AdaptiveAvgPool2d(1),
-        )
-        self.fc = nn.Linear(128, n_classes)
-
-    def forward(self, x: torch.Tensor) -> torch.Tensor:  # pragma: no cover - trivial
-        x = self.entry(x)
-        x = self.blocks(x)
-        x = self.head(x)
-        x = torch.flatten(x, 1)
-        return self.fc(x)
+from typing import Dict, List, Sequence, Tuple
+
+from app.services.inference_engines import InferenceEngine, create_inference_engine
+
+
+class _PreprocessBuffers:
+    """
+    Буферы подготовки батча одного потока: серый кроп (view на область нужного размера),
+    кропы после resize + CLAHE (N, S, S) uint8 и вход модели (N, 1, S, S) float32.
+    Растут по мере надобности и переиспользуются.
+    """
+
+    __slots__ = ("clahe", "crop", "resized", "gray", "input")
+
+    def __init__(self, img_size: int) -> None:
+        import cv2
+
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self.crop = np.empty((0, 0), dtype=np.uint8)
+        self.resized = np.empty((img_size, img_size), dtype=np.uint8)
+        self.gray = np.empty((0, img_size, img_size), dtype=np.uint8)
+        self.input = np.empty((0, 1, img_size, img_size), dtype=np.float32)
+
+    def crop_view(self, height: int, width: int) -> np.ndarray:
+        if height > self.crop.shape[0] or width > self.crop.shape[1]:
+            self.crop = np.empty((max(height, self.crop.shape[0]), max(width, self.crop.shape[1])), dtype=np.uint8)
+        return self.crop[:height, :width]
+
+    def reserve(self, n: int) -> None:
+        capacity = len(self.gray)
+        if n <= capacity:
+            return
+        capacity = max(n, capacity * 2)
+        size = self.resized.shape[0]
+        self.gray = np.empty((capacity, size, size), dtype=np.uint8)
+        self.input = np.empty((capacity, 1, size, size), dtype=np.float32)
 
 
 class EmotionClassifier:
-    """Torch-based classifier used for emotion estimation."""
-
-    def __init__(self, model_path: str) -> None:
-        ckpt_path = Path(model_path)
-        checkpoint = torch.load(ckpt_path, map_location="cpu")
-        self.class_names = checkpoint.get("classes") or ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
-        self.img_size = int(checkpoint.get("img_size", 96))
-        state_dict = checkpoint.get("model") or checkpoint
-        state_dict = self._remap_legacy_keys(state_dict)
-
-        self.model = MiniXEmotion(n_classes=len(self.class_names), in_ch=1)
-        self.model.load_state_dict(state_dict)
-        self.model.eval()
-        self.device = torch.device("cpu")
-        self.model.to(self.device)
-
-    def _preprocess(self, face_bgr: np.ndarray) -> torch.Tensor:
-        gray = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY)
-        resized = cv2.resize(gray, (self.img_size, self.img_size), interpolation=cv2.INTER_AREA)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        normalized = clahe.apply(resized)
-        tensor = torch.from_numpy(normalized).float().unsqueeze(0).unsqueeze(0) / 255.0
-        tensor = (tensor - 0.5) / 0.5
-        return tensor.to(self.device)
-
-    @torch.inference_mode()
+    """Emotion classifier on top of a pluggable inference engine (PyTorch or ONNX Runtime)."""
+
+    def __init__(
+        self,
+        model_path: str | None = None,
+        *,
+        backend: str = "torch",
+        engine: InferenceEngine | None = None,
+    ) -> None:
+        if engine is None:
+            if model_path is None:
+                raise ValueError("Either model_path or engine must be provided")
+            engine = create_inference_engine(backend, model_path)
+        self.engine = engine
+        self.class_names = list(engine.class_names)
+        self.img_size = int(engine.img_size)
+        # классификатор общий для потоков (см. ModelRegistry), буферы и CLAHE — у каждого свои
+        self._local = threading.local()
+
+    def _buffers(self) -> _PreprocessBuffers:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = _PreprocessBuffers(self.img_size)
+        return buffers
+
+    def _preprocess(self, face_bgr: np.ndarray) -> np.ndarray:
+        """Один кроп -> новый массив (1, 1, img_size, img_size) float32 (не буфер потока)."""
+        return self.preprocess_batch([face_bgr]).copy()
+
+    def preprocess_batch(self, faces_bgr: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        N кропов лиц (BGR, обычно view на кадр) -> (N, 1, img_size, img_size) float32 в [-1, 1].
+        Все промежуточные результаты пишутся в буферы текущего потока. Возвращается view
+        на буфер: он действителен до следующего вызова preprocess_batch в этом потоке,
+        поэтому хранить его нельзя — только копию.
+        """
+        import cv2
+
+        size = self.img_size
+        n = len(faces_bgr)
+        buffers = self._buffers()
+        buffers.reserve(n)
+        gray = buffers.gray[:n]
+        for i, face_bgr in enumerate(faces_bgr):
+            face = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY, dst=buffers.crop_view(*face_bgr.shape[:2]))
+            cv2.resize(face, (size, size), dst=buffers.resized, interpolation=cv2.INTER_AREA)
+            buffers.clahe.apply(buffers.resized, dst=gray[i])
+        # (x / 255 - 0.5) / 0.5 в буфер входа модели, без промежуточных массивов
+        batch = buffers.input[:n]
+        np.multiply(gray, np.float32(2.0 / 255.0), out=batch[:, 0], dtype=np.float32)
+        batch -= np.float32(1.0)
+        return batch
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        shifted = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(shifted)
+        return exp / exp.sum(axis=1, keepdims=True)
+
     def predict(self, face_bgr: np.ndarray) -> Tuple[str, float, Dict[str, float]]:
         inp = self._preprocess(face_bgr)
-        logits = self.model(inp)
-        probs = torch.softmax(logits, dim=1).cpu().numpy().flatten()
+        logits = self.engine.run(inp)
+        probs = self._softmax(logits).flatten()
         top_idx = int(probs.argmax())
         distributions = {label: float(probs[i]) for i, label in enumerate(self.class_names)}
         return self.class_names[top_idx], float(probs[top_idx]), distributions
 
+    def predict_batch(self, faces_bgr: Sequence[np.ndarray]) -> List[Tuple[str, float, Dict[str, float]]]:
+        """Классифицирует все переданные лица одним прогоном модели."""
+        if not faces_bgr:
+            return []
+        return self.predict_preprocessed(self.preprocess_batch(faces_bgr))
+
+    def predict_preprocessed(self, batch: np.ndarray) -> List[Tuple[str, float, Dict[str, float]]]:
+        """То же, что predict_batch, для уже подготовленного батча (см. preprocess_batch)."""
+        if not len(batch):
+            return []
+        probs = self._softmax(self.engine.run(batch))
+        top_indices = probs.argmax(axis=1)
+        results: List[Tuple[str, float, Dict[str, float]]] = []
+        for row, top_idx in zip(probs.tolist(), top_indices.tolist()):
+            distributions = dict(zip(self.class_names, row))
+            results.append((self.class_names[top_idx], row[top_idx], distributions))
+        return results
+
     @staticmethod
     def affect_from_distribution(dist: Dict[str, float]) -> float:
         pos = dist.get("happy", 0.0) + 0.5 * dist.get("surprise", 0.0)
@@ -113,20 +134,3 @@ class EmotionClassifier:
         neu = dist.get("neutral", 0.0) * 0.5
         score = pos * 0.8 + (1 - min(1.0, neg + neu)) * 0.2
         return max(0.0, min(1.0, score))
-
-    @staticmethod
-    def _remap_legacy_keys(state_dict: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
-        """Adapt checkpoints trained before refactor (b1.* -> blocks.* naming)."""
-        if not any(key.startswith("b1.") for key in state_dict.keys()):
-            return state_dict
-
-        remapped: "OrderedDict[str, torch.Tensor]" = OrderedDict()
-        for key, value in state_dict.items():
-            if len(key) > 2 and key[0] == "b" and key[1].isdigit() and key[2] == ".":
-                block_idx = int(key[1]) - 1
-                suffix = key[3:]
-                new_key = f"blocks.{block_idx}.{suffix}"
-                remapped[new_key] = value
-            else:
-                remapped[key] = value
-        return remapped
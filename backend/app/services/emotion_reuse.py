@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "result", "reuses")
+
+    def __init__(self, fingerprint: np.ndarray) -> None:
+        self.fingerprint = fingerprint
+        # заполняется после прогона батча через модель
+        self.result: tuple[str, float, dict[str, float]] | None = None
+        self.reuses = 0
+
+
+class EmotionReuseCache:
+    """
+    Повторное использование эмоций лица, если его кроп почти не изменился.
+
+    Отпечаток — подготовленный для модели кроп (img_size x img_size, [-1, 1]), уменьшенный
+    усреднением блоков до grid x grid. Если средняя абсолютная разница с отпечатком кропа,
+    по которому последний раз считалась модель, не больше threshold, лицу того же трека
+    отдаётся прошлое распределение эмоций — но не больше max_staleness раз подряд.
+
+    Живёт в пределах одного прохода по видео (как и FaceTracker); с включённым кэшем видео
+    не делится на сегменты — отпечатки треков зависят от всей предыстории.
+    """
+
+    def __init__(self, threshold: float, max_staleness: int, grid: int = 12) -> None:
+        self.threshold = threshold
+        self.max_staleness = max(0, max_staleness)
+        self.grid = grid
+        self._entries: dict[int, _Entry] = {}
+        self.inferred = 0
+        self.reused = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.max_staleness > 0
+
+    def fingerprint(self, tensor: np.ndarray) -> np.ndarray:
+        """(1, S, S) -> (grid, grid): среднее по блокам (хвост, не кратный grid, отбрасывается)."""
+        image = tensor.reshape(tensor.shape[-2], tensor.shape[-1])
+        block = max(1, image.shape[0] // self.grid)
+        size = block * self.grid
+        return image[:size, :size].reshape(self.grid, block, self.grid, block).mean(axis=(1, 3))
+
+    def lookup(self, track_id: int | None, fingerprint: np.ndarray) -> _Entry | None:
+        """Запись, чей результат можно переиспользовать, или None — лицо нужно классифицировать."""
+        entry = self._entries.get(track_id) if track_id is not None else None
+        if entry is None or entry.reuses >= self.max_staleness:
+            return None
+        if float(np.abs(fingerprint - entry.fingerprint).mean()) > self.threshold:
+            return None
+        entry.reuses += 1
+        self.reused += 1
+        return entry
+
+    def store(self, track_id: int | None, fingerprint: np.ndarray) -> _Entry:
+        """Новая запись под результат модели (для лица без трека — не запоминается)."""
+        entry = _Entry(fingerprint)
+        if track_id is not None:
+            self._entries[track_id] = entry
+        self.inferred += 1
+        return entry
+
+    def discard(self, track_id: int | None) -> None:
+        self._entries.pop(track_id, None)
+
+    def stats(self) -> dict:
+        total = self.inferred + self.reused
+        return {
+            "emotion_inferred": self.inferred,
+            "emotion_reused": self.reused,
+            "emotion_reuse_rate": round(self.reused / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import numpy as np
+
+from app.services.attention_estimator import AttentionEstimator
+from app.services.box_ops import iou_matrix
+
+
+def match_boxes(
+    prev: np.ndarray, curr: np.ndarray, iou_threshold: float, max_center_shift: float = 0.5
+) -> list[tuple[int, int]]:
+    """
+    Жадное сопоставление боксов двух кадров: сначала по убыванию IoU,
+    оставшиеся — по расстоянию между центрами (не дальше max_center_shift размера лица).
+    Возвращает пары (индекс в prev, индекс в curr).
+    """
+    prev = np.asarray(prev, dtype=np.float64).reshape(-1, 4)
+    curr = np.asarray(curr, dtype=np.float64).reshape(-1, 4)
+    if not len(prev) or not len(curr):
+        return []
+
+    pairs: list[tuple[int, int]] = []
+    free_prev = np.ones(len(prev), dtype=bool)
+    free_curr = np.ones(len(curr), dtype=bool)
+
+    def take(scores: np.ndarray, accept) -> None:
+        for flat in np.argsort(-scores, axis=None, kind="stable"):
+            i, j = divmod(int(flat), len(curr))
+            if not accept(scores[i, j]):
+                break
+            if free_prev[i] and free_curr[j]:
+                free_prev[i] = free_curr[j] = False
+                pairs.append((i, j))
+
+    take(iou_matrix(prev, curr), lambda score: score >= iou_threshold)
+
+    centers_prev = prev[:, :2] + prev[:, 2:] / 2
+    centers_curr = curr[:, :2] + curr[:, 2:] / 2
+    shift = np.linalg.norm(centers_prev[:, None, :] - centers_curr[None, :, :], axis=2)
+    scale = np.maximum(prev[:, 2:].max(axis=1), 1.0)[:, None]
+    take(-(shift / scale), lambda score: -score <= max_center_shift)
+    return pairs
+
+
+class _Track:
+    __slots__ = ("track_id", "roi", "face", "misses")
+
+    def __init__(self, track_id: int, face: dict) -> None:
+        self.track_id = track_id
+        self.roi = face["roi"]
+        self.face = face
+        self.misses = 0
+
+
+class FaceTracker:
+    """
+    Трекинг лиц между сэмплами одного видео.
+
+    Полный проход AttentionEstimator.estimate (FaceDetection + FaceMesh по всему кадру)
+    выполняется раз в detect_every сэмплов, а также когда трек с landmarks потерян.
+    Между ними FaceMesh запускается только в окрестности известных лиц, а лица без
+    landmarks (найденные только детектором) переносятся с предыдущего кадра.
+
+    Каждому лицу проставляется face["track_id"] — идентификатор человека в пределах видео
+    (сопоставление по IoU, затем по сдвигу центра).
+    """
+
+    def __init__(self, detect_every: int = 1, iou_threshold: float = 0.3, max_misses: int = 2) -> None:
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max(0, max_misses)
+        self._tracks: list[_Track] = []
+        self._next_id = 0
+        self._last_detect_sample = 0
+        self.full_detections = 0
+        self.roi_frames = 0
+
+    def process(self, sample_idx: int, frame_bgr: np.ndarray, estimator: AttentionEstimator) -> list[dict]:
+        """Лица кадра с номером сэмпла sample_idx (номер глобальный — от начала видео)."""
+        # второе условие — если сэмпл с номером, кратным detect_every, был пропущен (SceneGate)
+        if (
+            sample_idx % self.detect_every == 0
+            or sample_idx - self._last_detect_sample >= self.detect_every
+            or not self._tracks
+        ):
+            self._last_detect_sample = sample_idx
+            return self._detect(frame_bgr, estimator)
+
+        faces: list[dict] = []
+        updated: list[tuple[_Track, dict]] = []
+        for track in self._tracks:
+            if track.misses:
+                continue
+            if not track.face["has_landmarks"]:
+                # лица без позы (только детектор) FaceMesh по области не уточнит — переносим
+                faces.append(dict(track.face))
+                continue
+            # поза с прошлого кадра — начальное приближение для solvePnP
+            face = estimator.estimate_roi(frame_bgr, track.roi, pose_guess=track.face.get("pose"))
+            if face is None:
+                # человек отвернулся или ушёл — нужна полная детекция
+                self._last_detect_sample = sample_idx
+                return self._detect(frame_bgr, estimator)
+            face["track_id"] = track.track_id
+            faces.append(face)
+            updated.append((track, face))
+
+        for track, face in updated:
+            track.face, track.roi = face, face["roi"]
+        self.roi_frames += 1
+        return faces
+
+    def _detect(self, frame_bgr: np.ndarray, estimator: AttentionEstimator) -> list[dict]:
+        faces = estimator.estimate(frame_bgr)
+        self.full_detections += 1
+
+        pairs = match_boxes(
+            [track.roi for track in self._tracks], [face["roi"] for face in faces], self.iou_threshold
+        )
+        matched = {j: i for i, j in pairs}
+        matched_tracks = set(matched.values())
+
+        tracks: list[_Track] = []
+        for j, face in enumerate(faces):
+            i = matched.get(j)
+            if i is None:
+                track = _Track(self._next_id, face)
+                self._next_id += 1
+            else:
+                track = self._tracks[i]
+                track.face, track.roi, track.misses = face, face["roi"], 0
+            face["track_id"] = track.track_id
+            tracks.append(track)
+
+        # пропавшие треки живут ещё max_misses полных детекций (лицо могли на миг закрыть)
+        for i, track in enumerate(self._tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+                if track.misses <= self.max_misses:
+                    tracks.append(track)
+        self._tracks = tracks
+        return faces
+
+    def stats(self) -> dict:
+        return {
+            "full_detections": self.full_detections,
+            "roi_frames": self.roi_frames,
+            "tracks": self._next_id,
+        }
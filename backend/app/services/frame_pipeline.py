@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+# Конец потока элементов (после него стадия вызывает finish и завершается)
+_DONE = object()
+# Период проверки флага остановки при ожидании на очереди
+_POLL_SEC = 0.1
+
+
+class _Stage:
+    __slots__ = ("name", "fn", "finish", "busy_sec", "wait_sec")
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Iterable[Any]] | None,
+        finish: Callable[[], Iterable[Any]] | None,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.finish = finish
+        self.busy_sec = 0.0
+        self.wait_sec = 0.0
+
+
+class StagePipeline:
+    """
+    Конвейер из потоков, соединённых ограниченными очередями:
+    source -> stage 1 -> ... -> stage N -> итерация в вызывающем потоке.
+
+    Каждая стадия — fn(item) -> iterable результатов (0, 1 или несколько элементов,
+    например когда стадия копит батч) и необязательный finish() -> iterable для хвоста
+    после конца входа. Порядок элементов сохраняется: у каждой стадии один поток.
+    Полная очередь блокирует предыдущую стадию (backpressure), поэтому в памяти
+    одновременно не больше queue_size элементов на каждом стыке.
+
+    Исключение в любой стадии останавливает конвейер и пробрасывается из итерации;
+    выход из with (в том числе по исключению потребителя) останавливает и дожидается потоков.
+
+    stats(): <stage>_sec — время работы стадии, <stage>_wait_sec — время ожидания
+    на очередях (пустой вход или полный выход).
+    """
+
+    def __init__(self, source: Iterable[Any], source_name: str = "source", queue_size: int = 4) -> None:
+        self._source = source
+        self._stages = [_Stage(source_name, None, None)]
+        self._queue_size = max(1, queue_size)
+        self._stop = threading.Event()
+        self._error: BaseException | None = None
+        self._threads: list[threading.Thread] = []
+        self._output: queue.Queue | None = None
+        self.consumer_wait_sec = 0.0
+
+    def add_stage(
+        self,
+        name: str,
+        fn: Callable[[Any], Iterable[Any]],
+        finish: Callable[[], Iterable[Any]] | None = None,
+    ) -> "StagePipeline":
+        self._stages.append(_Stage(name, fn, finish))
+        return self
+
+    def __enter__(self) -> "StagePipeline":
+        queues = [queue.Queue(maxsize=self._queue_size) for _ in self._stages]
+        self._threads = [
+            threading.Thread(
+                target=self._run_source, args=(self._stages[0], queues[0]), name=f"pipeline-{self._stages[0].name}"
+            )
+        ]
+        for i, stage in enumerate(self._stages[1:], start=1):
+            self._threads.append(
+                threading.Thread(
+                    target=self._run_stage, args=(stage, queues[i - 1], queues[i]), name=f"pipeline-{stage.name}"
+                )
+            )
+        self._output = queues[-1]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def __iter__(self) -> Iterator[Any]:
+        assert self._output is not None, "StagePipeline is used outside of `with`"
+        while True:
+            started = time.perf_counter()
+            item = self._get(self._output)
+            self.consumer_wait_sec += time.perf_counter() - started
+            if item is _DONE:
+                break
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    def stats(self) -> dict:
+        result = {}
+        for stage in self._stages:
+            result[f"{stage.name}_sec"] = round(stage.busy_sec, 3)
+            result[f"{stage.name}_wait_sec"] = round(stage.wait_sec, 3)
+        return result
+
+    # ========== Потоки стадий ==========
+
+    def _run_source(self, stage: _Stage, outbox: queue.Queue) -> None:
+        try:
+            iterator = iter(self._source)
+            while True:
+                started = time.perf_counter()
+                item = next(iterator, _DONE)
+                stage.busy_sec += time.perf_counter() - started
+                if item is _DONE or not self._put(stage, outbox, item):
+                    break
+        except BaseException as exc:
+            self._fail(exc)
+        self._put(stage, outbox, _DONE)
+
+    def _run_stage(self, stage: _Stage, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        try:
+            while True:
+                started = time.perf_counter()
+                item = self._get(inbox)
+                stage.wait_sec += time.perf_counter() - started
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                results = list(stage.fn(item))
+                stage.busy_sec += time.perf_counter() - started
+                for result in results:
+                    if not self._put(stage, outbox, result):
+                        return
+            if stage.finish is not None and not self._stop.is_set():
+                started = time.perf_counter()
+                results = list(stage.finish())
+                stage.busy_sec += time.perf_counter() - started
+                for result in results:
+                    if not self._put(stage, outbox, result):
+                        return
+        except BaseException as exc:
+            self._fail(exc)
+        self._put(stage, outbox, _DONE)
+
+    def _fail(self, exc: BaseException) -> None:
+        if self._error is None:
+            self._error = exc
+        self._stop.set()
+
+    def _get(self, inbox: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return inbox.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _put(self, stage: _Stage, outbox: queue.Queue, item: Any) -> bool:
+        """False — конвейер остановлен, элемент никому не нужен."""
+        started = time.perf_counter()
+        try:
+            while not self._stop.is_set() or item is _DONE:
+                try:
+                    outbox.put(item, timeout=_POLL_SEC)
+                    return True
+                except queue.Full:
+                    if item is _DONE and self._stop.is_set():
+                        return False
+            return False
+        finally:
+            stage.wait_sec += time.perf_counter() - started
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import time
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from app.infrastructure.logger import logger
+
+
+# Кодеки без межкадрового сжатия: любой кадр декодируется независимо, seek всегда дешёвый
+INTRA_ONLY_FOURCCS = {"MJPG", "mjpa", "mjpb", "jpeg", "AVdn", "AVdh", "apch", "apcn", "apcs", "apco", "ap4h"}
+
+# Seek выбирается, только если он заметно дешевле пропуска кадров через grab()
+SEEK_ADVANTAGE = 0.8
+
+
+class SampledFrameReader:
+    """
+    Iterates over every `frame_step`-th frame of a video without decoding the rest into BGR.
+
+    Strategies:
+    - "grab": skipped frames are only grabbed (demuxed/decoded, no retrieve + color conversion);
+    - "seek": jump straight to the next sampled frame via CAP_PROP_POS_FRAMES
+      (the decoder restarts from the nearest keyframe);
+    - "auto": intra-only codecs always seek; otherwise the first samples are read
+      with both strategies and the cheaper one is kept for the rest of the video.
+
+    Time spent inside OpenCV decode calls is accumulated in `decode_sec`.
+
+    `start_frame`/`end_frame` restrict iteration to one segment of the video
+    (used for parallel analysis); `start_frame` should be a multiple of `frame_step`
+    so that segments sample exactly the same frames as a single full pass.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        sample_sec: float,
+        min_samples: int = 1,
+        mode: str = "auto",
+        start_frame: int = 0,
+        end_frame: int | None = None,
+    ) -> None:
+        import cv2
+
+        if mode not in ("auto", "grab", "seek"):
+            raise ValueError(f"Unknown frame sampling mode: {mode!r}")
+
+        self._video_path = video_path
+        self.start_frame = max(0, start_frame)
+        self.end_frame = end_frame
+        self._cap = cv2.VideoCapture(video_path)
+        if not self._cap.isOpened():
+            raise ValueError(f"Не удалось открыть видео: {video_path}")
+
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_step = max(int(self.fps * sample_sec), 1)
+        if self.total_frames > 0:
+            adaptive_step = max(self.total_frames // max(1, min_samples), 1)
+            frame_step = min(frame_step, adaptive_step)
+        self.frame_step = frame_step
+
+        fourcc = int(self._cap.get(cv2.CAP_PROP_FOURCC))
+        self.codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+        self.mode = mode
+        self.strategy = mode if mode != "auto" else None
+        self.decode_sec = 0.0
+        self.frames_decoded = 0
+        self.frames_returned = 0
+        self._grab_cost: float | None = None
+        self._seek_cost: float | None = None
+
+        if self.strategy is None and (self.frame_step == 1 or self.total_frames <= 0):
+            # нечего пропускать или нельзя позиционироваться по номеру кадра
+            self.strategy = "grab"
+        elif self.strategy is None and self.codec in INTRA_ONLY_FOURCCS:
+            self.strategy = "seek"
+
+    # ========== Итерация ==========
+
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yields (frame_idx, ts_sec, frame_bgr) for every sampled frame."""
+        frame_idx = self.start_frame
+        frame = self._read() if frame_idx == 0 else self._read_start(frame_idx)
+        while frame is not None:
+            yield frame_idx, frame_idx / self.fps, frame
+            if self.end_frame is not None and frame_idx + self.frame_step >= self.end_frame:
+                return
+            frame_idx, frame = self._next_sample(frame_idx)
+
+    def _read_start(self, start_frame: int) -> np.ndarray | None:
+        import cv2
+
+        frame = self._seek_read(start_frame)
+        actual_idx = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+        if frame is None or actual_idx == start_frame:
+            return frame
+
+        # неточный seek: переоткрываем видео и доходим до начала сегмента через grab()
+        logger.warning(
+            "Inaccurate seek in {} video (wanted frame {}, got {}); grabbing up to the segment start",
+            self.codec, start_frame, actual_idx,
+        )
+        self._cap.release()
+        self._cap = cv2.VideoCapture(self._video_path)
+        self.strategy = "grab"
+        for _ in range(start_frame):
+            if not self._grab():
+                return None
+        return self._read()
+
+    def _next_sample(self, frame_idx: int) -> Tuple[int, np.ndarray | None]:
+        import cv2
+
+        target = frame_idx + self.frame_step
+        strategy = self.strategy
+        if strategy is None:
+            # калибровка: первый переход через grab, второй через seek
+            strategy = "grab" if self._grab_cost is None else "seek"
+
+        if strategy == "grab":
+            started = time.perf_counter()
+            for _ in range(self.frame_step - 1):
+                if not self._grab():
+                    return target, None
+            frame = self._read()
+            if self.strategy is None:
+                self._grab_cost = time.perf_counter() - started
+            return target, frame
+
+        started = time.perf_counter()
+        frame = self._seek_read(target)
+        actual_idx = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+        if frame is not None and actual_idx != target:
+            # контейнер не поддерживает точный seek — дальше только последовательное чтение
+            logger.warning(
+                "Inaccurate seek in {} video (wanted frame {}, got {}); falling back to grab()",
+                self.codec, target, actual_idx,
+            )
+            self.strategy = "grab"
+            return actual_idx, frame
+        if self.strategy is None:
+            self._seek_cost = time.perf_counter() - started
+            self._choose_strategy()
+        return target, frame
+
+    def _choose_strategy(self) -> None:
+        assert self._grab_cost is not None and self._seek_cost is not None
+        self.strategy = "seek" if self._seek_cost < SEEK_ADVANTAGE * self._grab_cost else "grab"
+        logger.info(
+            "Frame sampling for {} (step {}): grab {:.1f} ms vs seek {:.1f} ms per sample -> {}",
+            self.codec or "unknown codec", self.frame_step,
+            self._grab_cost * 1000, self._seek_cost * 1000, self.strategy,
+        )
+
+    # ========== Вызовы OpenCV (с учётом времени декодирования) ==========
+
+    def _grab(self) -> bool:
+        started = time.perf_counter()
+        ok = self._cap.grab()
+        self.decode_sec += time.perf_counter() - started
+        if ok:
+            self.frames_decoded += 1
+        return ok
+
+    def _read(self) -> np.ndarray | None:
+        started = time.perf_counter()
+        ok, frame = self._cap.read()
+        self.decode_sec += time.perf_counter() - started
+        if not ok:
+            return None
+        self.frames_decoded += 1
+        self.frames_returned += 1
+        return frame
+
+    def _seek_read(self, target: int) -> np.ndarray | None:
+        import cv2
+
+        started = time.perf_counter()
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        self.decode_sec += time.perf_counter() - started
+        return self._read()
+
+    # ========== Жизненный цикл ==========
+
+    def stats(self) -> dict:
+        return {
+            "codec": self.codec,
+            "strategy": self.strategy,
+            "frame_step": self.frame_step,
+            "frames_decoded": self.frames_decoded,
+            "frames_returned": self.frames_returned,
+            "decode_sec": round(self.decode_sec, 3),
+        }
+
+    def close(self) -> None:
+        self._cap.release()
+
+    def __enter__(self) -> "SampledFrameReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from app.models.dtoModels.AnalysisDTO import FaceEmotion, FaceMetrics, FrameMetrics
+
+
+class FaceRecord:
+    """
+    Метрики лица внутри анализа — те же поля, что у FaceMetrics, но без валидации pydantic.
+    top_emotion хранится парой top_label / top_prob; emotions — распределение от
+    классификатора (не копируется, поэтому не изменяется после создания записи).
+    """
+
+    __slots__ = (
+        "bbox",
+        "yaw_deg",
+        "pitch_deg",
+        "roll_deg",
+        "attention",
+        "affect",
+        "engagement",
+        "top_label",
+        "top_prob",
+        "emotions",
+        "looking_target",
+        "track_id",
+    )
+
+    def __init__(
+        self,
+        bbox: tuple[int, int, int, int] | None,
+        yaw_deg: float | None,
+        pitch_deg: float | None,
+        roll_deg: float | None,
+        attention: float,
+        affect: float,
+        engagement: float,
+        top_label: str | None,
+        top_prob: float,
+        emotions: dict[str, float],
+        looking_target: str | None,
+        track_id: int | None,
+    ) -> None:
+        self.bbox = bbox
+        self.yaw_deg = yaw_deg
+        self.pitch_deg = pitch_deg
+        self.roll_deg = roll_deg
+        self.attention = attention
+        self.affect = affect
+        self.engagement = engagement
+        self.top_label = top_label
+        self.top_prob = top_prob
+        self.emotions = emotions
+        self.looking_target = looking_target
+        self.track_id = track_id
+
+    def copy(self) -> "FaceRecord":
+        return FaceRecord(*(getattr(self, name) for name in self.__slots__))
+
+    def to_dict(self) -> dict:
+        """То же, что FaceMetrics.model_dump()."""
+        return {
+            "bbox": self.bbox,
+            "yaw_deg": self.yaw_deg,
+            "pitch_deg": self.pitch_deg,
+            "roll_deg": self.roll_deg,
+            "attention": self.attention,
+            "affect": self.affect,
+            "engagement": self.engagement,
+            "top_emotion": None if self.top_label is None else {"label": self.top_label, "prob": self.top_prob},
+            "emotions": dict(self.emotions),
+            "looking_target": self.looking_target,
+            "track_id": self.track_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FaceRecord":
+        top = data.get("top_emotion")
+        bbox = data.get("bbox")
+        return cls(
+            bbox=tuple(bbox) if bbox is not None else None,
+            yaw_deg=data.get("yaw_deg"),
+            pitch_deg=data.get("pitch_deg"),
+            roll_deg=data.get("roll_deg"),
+            attention=data.get("attention", 0.0),
+            affect=data.get("affect", 0.0),
+            engagement=data.get("engagement", 0.0),
+            top_label=top["label"] if top else None,
+            top_prob=top["prob"] if top else 0.0,
+            emotions=data.get("emotions") or {},
+            looking_target=data.get("looking_target"),
+            track_id=data.get("track_id"),
+        )
+
+    def to_dto(self) -> FaceMetrics:
+        return FaceMetrics(
+            bbox=self.bbox,
+            yaw_deg=self.yaw_deg,
+            pitch_deg=self.pitch_deg,
+            roll_deg=self.roll_deg,
+            attention=self.attention,
+            affect=self.affect,
+            engagement=self.engagement,
+            top_emotion=None if self.top_label is None else FaceEmotion(label=self.top_label, prob=self.top_prob),
+            emotions=self.emotions,
+            looking_target=self.looking_target,
+            track_id=self.track_id,
+        )
+
+
+class FrameRecord:
+    """Метрики кадра внутри анализа (поля FrameMetrics); DTO собирается только на границе API."""
+
+    __slots__ = ("ts_sec", "faces", "engagement_ratio", "attention_ratio", "positive_faces", "face_count")
+
+    def __init__(
+        self,
+        ts_sec: float,
+        faces: list[FaceRecord],
+        engagement_ratio: float = 0.0,
+        attention_ratio: float = 0.0,
+        positive_faces: int = 0,
+        face_count: int = 0,
+    ) -> None:
+        self.ts_sec = ts_sec
+        self.faces = faces
+        self.engagement_ratio = engagement_ratio
+        self.attention_ratio = attention_ratio
+        self.positive_faces = positive_faces
+        self.face_count = face_count
+
+    def copy(self, ts_sec: float) -> "FrameRecord":
+        """Копия кадра с другим временем; лица копируются (track_id перенумеровывается на месте)."""
+        return FrameRecord(
+            ts_sec,
+            [face.copy() for face in self.faces],
+            self.engagement_ratio,
+            self.attention_ratio,
+            self.positive_faces,
+            self.face_count,
+        )
+
+    def to_dict(self) -> dict:
+        """То же, что FrameMetrics.model_dump()."""
+        return {
+            "ts_sec": self.ts_sec,
+            "faces": [face.to_dict() for face in self.faces],
+            "engagement_ratio": self.engagement_ratio,
+            "attention_ratio": self.attention_ratio,
+            "positive_faces": self.positive_faces,
+            "face_count": self.face_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FrameRecord":
+        return cls(
+            ts_sec=data["ts_sec"],
+            faces=[FaceRecord.from_dict(face) for face in data.get("faces", [])],
+            engagement_ratio=data.get("engagement_ratio", 0.0),
+            attention_ratio=data.get("attention_ratio", 0.0),
+            positive_faces=data.get("positive_faces", 0),
+            face_count=data.get("face_count", 0),
+        )
+
+    def to_dto(self) -> FrameMetrics:
+        return FrameMetrics(
+            ts_sec=self.ts_sec,
+            faces=[face.to_dto() for face in self.faces],
+            engagement_ratio=self.engagement_ratio,
+            attention_ratio=self.attention_ratio,
+            positive_faces=self.positive_faces,
+            face_count=self.face_count,
+        )
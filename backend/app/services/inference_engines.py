@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+
+# Порядок классов, в котором их перечисляет ImageFolder при обучении (сортировка папок)
+TRAINING_CLASS_ORDER = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
+LEGACY_CLASS_ORDER = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+
+class InferenceEngine(ABC):
+    """
+    Backend that turns a preprocessed batch of faces into emotion logits.
+
+    Input is a float32 array of shape (N, 1, img_size, img_size) normalized to
+    [-1, 1]; output is a float32 array of logits with shape (N, len(class_names)).
+    """
+
+    name: str = "base"
+    class_names: List[str]
+    img_size: int
+
+    @abstractmethod
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchInferenceEngine(InferenceEngine):
+    """Runs the MiniXEmotion checkpoint with PyTorch (torch is imported only here)."""
+
+    name = "torch"
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0) -> None:
+        import torch
+
+        from app.services.emotion_minix import MiniXEmotion, remap_legacy_keys
+
+        self._torch = torch
+        if intra_op_threads > 0:
+            torch.set_num_threads(intra_op_threads)
+
+        checkpoint = torch.load(Path(model_path), map_location="cpu")
+        self.class_names = checkpoint.get("classes") or list(LEGACY_CLASS_ORDER)
+        self.img_size = int(checkpoint.get("img_size", 96))
+        state_dict = checkpoint.get("model") or checkpoint
+        state_dict = remap_legacy_keys(state_dict)
+
+        self.model = MiniXEmotion(n_classes=len(self.class_names), in_ch=1)
+        self.model.load_state_dict(state_dict)
+        self.model.eval()
+        self.device = torch.device("cpu")
+        self.model.to(self.device)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        with self._torch.inference_mode():
+            logits = self.model(self._torch.from_numpy(batch).to(self.device))
+        return logits.cpu().numpy()
+
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+class OnnxInferenceEngine(InferenceEngine):
+    """
+    Runs the exported ONNX graph with ONNX Runtime on CPU.
+
+    Class names and input size are read from the model metadata written by
+    scripts/export_emotion_minix_onnx.py, then from a meta.json next to the
+    model, and finally inferred from the graph input shape.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        *,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        graph_optimization: str = "all",
+    ) -> None:
+        import onnxruntime as ort
+
+        level_name = _GRAPH_OPTIMIZATION_LEVELS.get(graph_optimization.lower())
+        if level_name is None:
+            raise ValueError(
+                f"Unknown ONNX graph optimization level: {graph_optimization!r} "
+                f"(expected one of {sorted(_GRAPH_OPTIMIZATION_LEVELS)})"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level_name)
+        # Граф маленький и последовательный: параллелизм между узлами только мешает
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads > 0:
+            options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        self._output_name = self.session.get_outputs()[0].name
+
+        meta = self._read_metadata(Path(model_path))
+        self.class_names = meta.get("classes") or list(TRAINING_CLASS_ORDER)
+        self.img_size = int(meta.get("img_size") or self._static_input_size(model_input.shape) or 96)
+
+    def _read_metadata(self, model_path: Path) -> dict:
+        custom = self.session.get_modelmeta().custom_metadata_map or {}
+        meta: dict = {}
+        if "classes" in custom:
+            meta["classes"] = json.loads(custom["classes"])
+        if "img_size" in custom:
+            meta["img_size"] = int(custom["img_size"])
+        if meta:
+            return meta
+
+        sidecar = model_path.with_name("meta.json")
+        if sidecar.exists():
+            with open(sidecar, encoding="utf-8") as f:
+                raw = json.load(f)
+            input_size = raw.get("input_size") or [None]
+            return {"classes": raw.get("classes"), "img_size": input_size[0]}
+        return {}
+
+    @staticmethod
+    def _static_input_size(shape) -> int | None:
+        if len(shape) == 4 and isinstance(shape[-1], int):
+            return shape[-1]
+        return None
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run([self._output_name], {self._input_name: batch})[0]
+
+
+def create_inference_engine(
+    backend: str,
+    model_path: str,
+    *,
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+    graph_optimization: str = "all",
+) -> InferenceEngine:
+    """Фабрика движков инференса по имени бэкенда из настроек ("torch" | "onnx")."""
+    backend = backend.lower()
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Emotion model not found: {model_path}")
+    if backend == "torch":
+        return TorchInferenceEngine(model_path, intra_op_threads=intra_op_threads)
+    if backend == "onnx":
+        return OnnxInferenceEngine(
+            model_path,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            graph_optimization=graph_optimization,
+        )
+    raise ValueError(f"Unknown emotion inference backend: {backend!r} (expected 'torch' or 'onnx')")
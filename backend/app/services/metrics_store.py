@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from app.models.dtoModels.AnalysisDTO import FaceEmotion, FaceMetrics, FrameMetrics
+from app.services.frame_records import FrameRecord
+
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+# Колонки уровня кадра (длина F)
+FRAME_COLUMNS = {
+    "ts_sec": np.float64,
+    "face_count": np.int32,
+    "positive_faces": np.int32,
+    "engagement_ratio": np.float32,
+    "attention_ratio": np.float32,
+    # face_offset[i]:face_offset[i + 1] — лица i-го кадра в колонках лиц (длина F + 1)
+    "face_offset": np.int64,
+}
+
+# Колонки уровня лица (длина N); NaN / -1 означают «нет значения»
+FACE_COLUMNS = {
+    "bbox": np.int32,  # (N, 4): x, y, w, h
+    "yaw_deg": np.float32,
+    "pitch_deg": np.float32,
+    "roll_deg": np.float32,
+    "attention": np.float32,
+    "affect": np.float32,
+    "engagement": np.float32,
+    "top_emotion": np.int16,  # индекс в meta["emotion_labels"]
+    "top_prob": np.float32,
+    "emotions": np.float32,  # (N, E); NaN — класса не было в распределении
+    "looking_target": np.int8,  # индекс в meta["looking_targets"]
+    "track_id": np.int32,  # человек в пределах видео (см. FaceTracker)
+}
+
+
+def write_columnar_metrics(out_dir: Path, frames: list[FrameRecord], meta: dict) -> Path:
+    """
+    Сохраняет метрики кадров в колоночном виде: по одному .npy на колонку + meta.json.
+    Каталог пишется во временный и переименовывается целиком, чтобы читатель
+    не увидел наполовину записанные метрики.
+    """
+    emotion_labels = sorted(
+        {label for frame in frames for face in frame.faces for label in face.emotions}
+        | {face.top_label for frame in frames for face in frame.faces if face.top_label is not None}
+    )
+    looking_targets = sorted({face.looking_target for frame in frames for face in frame.faces if face.looking_target})
+    emotion_index = {label: i for i, label in enumerate(emotion_labels)}
+    target_index = {target: i for i, target in enumerate(looking_targets)}
+
+    n_frames = len(frames)
+    n_faces = sum(len(frame.faces) for frame in frames)
+
+    columns: dict[str, np.ndarray] = {
+        name: np.zeros(n_frames + 1 if name == "face_offset" else n_frames, dtype=dtype)
+        for name, dtype in FRAME_COLUMNS.items()
+    }
+    for name, dtype in FACE_COLUMNS.items():
+        if name == "bbox":
+            columns[name] = np.full((n_faces, 4), -1, dtype=dtype)
+        elif name == "emotions":
+            columns[name] = np.full((n_faces, len(emotion_labels)), np.nan, dtype=dtype)
+        elif np.issubdtype(dtype, np.integer):
+            columns[name] = np.full(n_faces, -1, dtype=dtype)
+        else:
+            columns[name] = np.full(n_faces, np.nan, dtype=dtype)
+
+    j = 0
+    for i, frame in enumerate(frames):
+        columns["ts_sec"][i] = frame.ts_sec
+        columns["face_count"][i] = frame.face_count
+        columns["positive_faces"][i] = frame.positive_faces
+        columns["engagement_ratio"][i] = frame.engagement_ratio
+        columns["attention_ratio"][i] = frame.attention_ratio
+        columns["face_offset"][i] = j
+        for face in frame.faces:
+            if face.bbox is not None:
+                columns["bbox"][j] = face.bbox
+            for name in ("yaw_deg", "pitch_deg", "roll_deg"):
+                value = getattr(face, name)
+                if value is not None:
+                    columns[name][j] = value
+            columns["attention"][j] = face.attention
+            columns["affect"][j] = face.affect
+            columns["engagement"][j] = face.engagement
+            if face.top_label is not None:
+                columns["top_emotion"][j] = emotion_index.get(face.top_label, -1)
+                columns["top_prob"][j] = face.top_prob
+            for label, prob in face.emotions.items():
+                columns["emotions"][j, emotion_index[label]] = prob
+            if face.looking_target:
+                columns["looking_target"][j] = target_index[face.looking_target]
+            if face.track_id is not None:
+                columns["track_id"][j] = face.track_id
+            j += 1
+    columns["face_offset"][n_frames] = j
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name, values in columns.items():
+        np.save(tmp_dir / f"{name}.npy", values)
+
+    full_meta = {
+        **meta,
+        "format_version": FORMAT_VERSION,
+        "frame_count": n_frames,
+        "face_count": n_faces,
+        "emotion_labels": emotion_labels,
+        "looking_targets": looking_targets,
+    }
+    with open(tmp_dir / META_FILE, "w", encoding="utf-8") as f:
+        json.dump(full_meta, f, ensure_ascii=False)
+
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+class ColumnarMetrics:
+    """
+    Reader for metrics written by write_columnar_metrics.
+
+    Columns are opened with np.load(mmap_mode="r"): nothing is read until sliced, so
+    a time range of a long lecture costs only the pages it touches.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path / META_FILE, encoding="utf-8") as f:
+            self.meta: dict = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported metrics format in {self.path}: {self.meta.get('format_version')}")
+        self._columns: dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def is_columnar(path: str | Path) -> bool:
+        return (Path(path) / META_FILE).is_file()
+
+    @property
+    def emotion_labels(self) -> list[str]:
+        return self.meta["emotion_labels"]
+
+    def column(self, name: str) -> np.ndarray:
+        values = self._columns.get(name)
+        if values is None:
+            try:
+                values = np.load(self.path / f"{name}.npy", mmap_mode="r")
+            except ValueError:
+                # пустой массив (например, ни одного лица) нельзя отобразить в память
+                values = np.load(self.path / f"{name}.npy")
+            self._columns[name] = values
+        return values
+
+    # ========== Срезы по времени ==========
+
+    def frame_range(self, from_sec: float | None = None, to_sec: float | None = None) -> slice:
+        """Кадры с from_sec <= ts_sec <= to_sec (ts_sec отсортирован по возрастанию)."""
+        ts = self.column("ts_sec")
+        start = 0 if from_sec is None else int(np.searchsorted(ts, from_sec, side="left"))
+        stop = len(ts) if to_sec is None else int(np.searchsorted(ts, to_sec, side="right"))
+        return slice(start, max(start, stop))
+
+    def face_range(self, frames: slice) -> slice:
+        offsets = self.column("face_offset")
+        return slice(int(offsets[frames.start]), int(offsets[frames.stop]))
+
+    def frames(self, from_sec: float | None = None, to_sec: float | None = None) -> dict[str, np.ndarray]:
+        """Колонки кадров за интервал (view на memmap, без копирования)."""
+        rows = self.frame_range(from_sec, to_sec)
+        return {name: self.column(name)[rows] for name in FRAME_COLUMNS if name != "face_offset"}
+
+    def faces(self, from_sec: float | None = None, to_sec: float | None = None) -> dict[str, np.ndarray]:
+        """Колонки лиц за интервал + frame_index (номер кадра каждого лица внутри среза)."""
+        rows = self.frame_range(from_sec, to_sec)
+        face_rows = self.face_range(rows)
+        result = {name: self.column(name)[face_rows] for name in FACE_COLUMNS}
+        counts = np.diff(self.column("face_offset")[rows.start:rows.stop + 1])
+        result["frame_index"] = np.repeat(np.arange(rows.stop - rows.start), counts)
+        return result
+
+    # ========== Обратная совместимость ==========
+
+    def to_frame_metrics(self, from_sec: float | None = None, to_sec: float | None = None) -> list[FrameMetrics]:
+        """Материализует FrameMetrics (как в старом JSON) — только для небольших интервалов."""
+        rows = self.frame_range(from_sec, to_sec)
+        frame_cols = {name: np.asarray(self.column(name)[rows]) for name in FRAME_COLUMNS if name != "face_offset"}
+        offsets = np.asarray(self.column("face_offset")[rows.start:rows.stop + 1])
+        face_rows = slice(int(offsets[0]), int(offsets[-1])) if len(offsets) else slice(0, 0)
+        face_cols = {name: np.asarray(self.column(name)[face_rows]) for name in FACE_COLUMNS}
+        labels = self.emotion_labels
+        targets = self.meta["looking_targets"]
+
+        def opt(value) -> float | None:
+            return None if np.isnan(value) else float(value)
+
+        result: list[FrameMetrics] = []
+        base = int(offsets[0]) if len(offsets) else 0
+        for i in range(rows.stop - rows.start):
+            faces = []
+            for j in range(int(offsets[i]) - base, int(offsets[i + 1]) - base):
+                bbox = face_cols["bbox"][j]
+                top = int(face_cols["top_emotion"][j])
+                target = int(face_cols["looking_target"][j])
+                track_id = int(face_cols["track_id"][j])
+                emotions = face_cols["emotions"][j]
+                faces.append(
+                    FaceMetrics(
+                        bbox=None if bbox[0] < 0 else tuple(int(v) for v in bbox),
+                        yaw_deg=opt(face_cols["yaw_deg"][j]),
+                        pitch_deg=opt(face_cols["pitch_deg"][j]),
+                        roll_deg=opt(face_cols["roll_deg"][j]),
+                        attention=float(face_cols["attention"][j]),
+                        affect=float(face_cols["affect"][j]),
+                        engagement=float(face_cols["engagement"][j]),
+                        top_emotion=None if top < 0 else FaceEmotion(label=labels[top], prob=float(face_cols["top_prob"][j])),
+                        emotions={labels[k]: float(p) for k, p in enumerate(emotions) if not np.isnan(p)},
+                        looking_target=None if target < 0 else targets[target],
+                        track_id=None if track_id < 0 else track_id,
+                    )
+                )
+            result.append(
+                FrameMetrics(
+                    ts_sec=float(frame_cols["ts_sec"][i]),
+                    faces=faces,
+                    engagement_ratio=float(frame_cols["engagement_ratio"][i]),
+                    attention_ratio=float(frame_cols["attention_ratio"][i]),
+                    positive_faces=int(frame_cols["positive_faces"][i]),
+                    face_count=int(frame_cols["face_count"][i]),
+                )
+            )
+        return result
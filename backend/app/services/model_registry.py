@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import hashlib
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from app.config import settings
+from app.services.emotion_classifier import EmotionClassifier
+from app.services.inference_engines import create_inference_engine
+from app.services.attention_estimator import AttentionEstimator
+
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+
+def resolve_model_path(path: str) -> Path:
+    """Относительные пути к моделям считаются от корня backend/."""
+    model_path = Path(path)
+    if not model_path.is_absolute():
+        model_path = BASE_DIR / model_path
+    return model_path
+
+
+def current_rss_mb() -> float:
+    """Resident set size of the current process in MB (0.0 if unavailable)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return maxrss / (1024.0 * 1024.0) if sys.platform == "darwin" else maxrss / 1024.0
+    except Exception:
+        return 0.0
+
+
+@dataclass
+class ModelLoadStats:
+    name: str
+    load_sec: float
+    rss_delta_mb: float
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of ML models used by VideoAnalysisService.
+
+    - EmotionClassifier is loaded once and shared: inference does not mutate
+      the model, so concurrent predict() calls are safe.
+    - AttentionEstimator wraps MediaPipe graphs which are not re-entrant and
+      keep tracking state between frames, so instances are handed out from a
+      bounded pool for exclusive use (one per running analysis).
+    """
+
+    def __init__(self, *, attention_pool_size: int | None = None) -> None:
+        self._pool_size = max(1, attention_pool_size or settings.ATTENTION_POOL_SIZE)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._emotion_classifier: EmotionClassifier | None = None
+        self._estimators: queue.Queue[AttentionEstimator] = queue.Queue()
+        self._estimators_created = 0
+        self._estimators_in_use = 0
+        self._load_stats: list[ModelLoadStats] = []
+        self._warmed_up = False
+        self._model_checksum: str | None = None
+
+    # ========== Модели ==========
+
+    @property
+    def emotion_classifier(self) -> EmotionClassifier:
+        classifier = self._emotion_classifier
+        if classifier is not None:
+            return classifier
+        with self._load_lock:
+            if self._emotion_classifier is None:
+                self._emotion_classifier = self._timed_load(
+                    f"emotion_classifier[{settings.EMOTION_BACKEND}/{settings.EMOTION_PRECISION}]",
+                    self._create_emotion_classifier,
+                )
+            return self._emotion_classifier
+
+    @staticmethod
+    def _emotion_model_path() -> Path:
+        if settings.EMOTION_PRECISION == "int8":
+            if settings.EMOTION_BACKEND != "onnx":
+                raise ValueError("EMOTION_PRECISION=int8 requires EMOTION_BACKEND=onnx")
+            return resolve_model_path(settings.EMOTION_ONNX_INT8_PATH)
+        if settings.EMOTION_PRECISION != "fp32":
+            raise ValueError(f"Unknown emotion model precision: {settings.EMOTION_PRECISION!r} (expected 'fp32' or 'int8')")
+        if settings.EMOTION_BACKEND == "onnx":
+            return resolve_model_path(settings.EMOTION_ONNX_PATH)
+        return resolve_model_path(settings.EMOTION_MODEL_PATH)
+
+    @property
+    def model_checksum(self) -> str:
+        """sha256 файла(ов) активной модели эмоций — часть ключа кэша результатов анализа."""
+        if self._model_checksum is None:
+            model_path = self._emotion_model_path()
+            digest = hashlib.sha256()
+            # внешние веса ONNX (model.onnx.data) тоже определяют результат
+            for path in (model_path, model_path.with_name(model_path.name + ".data")):
+                if path.exists():
+                    with path.open("rb") as f:
+                        while chunk := f.read(1024 * 1024):
+                            digest.update(chunk)
+            self._model_checksum = digest.hexdigest()
+        return self._model_checksum
+
+    @classmethod
+    def _create_emotion_classifier(cls) -> EmotionClassifier:
+        model_path = cls._emotion_model_path()
+        engine = create_inference_engine(
+            settings.EMOTION_BACKEND,
+            str(model_path),
+            intra_op_threads=settings.EMOTION_INTRA_OP_THREADS,
+            inter_op_threads=settings.EMOTION_INTER_OP_THREADS,
+            graph_optimization=settings.ONNX_GRAPH_OPTIMIZATION,
+        )
+        return EmotionClassifier(engine=engine)
+
+    @contextmanager
+    def attention_estimator(self, timeout: float | None = None) -> Iterator[AttentionEstimator]:
+        """
+        Выдаёт AttentionEstimator из пула в монопольное пользование.
+        Блокируется, пока не освободится экземпляр (queue.Empty по таймауту).
+        """
+        estimator = self._checkout(timeout)
+        try:
+            yield estimator
+        finally:
+            with self._lock:
+                self._estimators_in_use -= 1
+            self._estimators.put(estimator)
+
+    def close(self) -> None:
+        """Освобождает свободные AttentionEstimator (графы MediaPipe, потоки детекции по тайлам)."""
+        while True:
+            try:
+                estimator = self._estimators.get_nowait()
+            except queue.Empty:
+                break
+            estimator.close()
+            with self._lock:
+                self._estimators_created -= 1
+
+    def _checkout(self, timeout: float | None) -> AttentionEstimator:
+        try:
+            estimator = self._estimators.get_nowait()
+        except queue.Empty:
+            estimator = None
+
+        if estimator is None:
+            with self._lock:
+                can_create = self._estimators_created < self._pool_size
+                if can_create:
+                    slot = self._estimators_created
+                    self._estimators_created += 1
+            if can_create:
+                try:
+                    estimator = self._timed_load(
+                        f"attention_estimator[{slot}]",
+                        self._create_attention_estimator,
+                    )
+                except Exception:
+                    with self._lock:
+                        self._estimators_created -= 1
+                    raise
+            else:
+                estimator = self._estimators.get(timeout=timeout)
+
+        with self._lock:
+            self._estimators_in_use += 1
+        return estimator
+
+    @staticmethod
+    def _create_attention_estimator() -> AttentionEstimator:
+        return AttentionEstimator(
+            yaw_ok=settings.ATTENTION_YAW_OK,
+            pitch_ok=settings.ATTENTION_PITCH_OK,
+            max_faces=settings.FACE_DETECT_MAX_FACES,
+            min_detection_confidence=settings.FACE_DETECT_MIN_CONF,
+            pad_ratio=settings.FACE_PAD_RATIO,
+            detect_long_edge=settings.FACE_DETECT_LONG_EDGE,
+            min_face_size=settings.FACE_MIN_SIZE if settings.FACE_DETECT_AUTO_SCALE else 0,
+            detect_tiles=settings.FACE_DETECT_TILES,
+            tile_overlap=settings.FACE_DETECT_TILE_OVERLAP,
+        )
+
+    def _timed_load(self, name: str, factory):
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        model = factory()
+        stats = ModelLoadStats(
+            name=name,
+            load_sec=time.perf_counter() - started,
+            rss_delta_mb=current_rss_mb() - rss_before,
+        )
+        with self._lock:
+            self._load_stats.append(stats)
+        return model
+
+    # ========== Прогрев и статистика ==========
+
+    def warm_up(self) -> None:
+        """Загружает модели и прогоняет их на пустом кадре (первый вызов инициализирует графы)."""
+        started = time.perf_counter()
+        classifier = self.emotion_classifier
+        blank_face = np.zeros((classifier.img_size, classifier.img_size, 3), dtype=np.uint8)
+        classifier.predict(blank_face)
+
+        with self.attention_estimator() as estimator:
+            estimator.estimate(np.zeros((480, 640, 3), dtype=np.uint8))
+
+        with self._lock:
+            self._load_stats.append(
+                ModelLoadStats(name="warm_up", load_sec=time.perf_counter() - started, rss_delta_mb=0.0)
+            )
+            self._warmed_up = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "warmed_up": self._warmed_up,
+                "rss_mb": round(current_rss_mb(), 1),
+                "emotion_classifier_loaded": self._emotion_classifier is not None,
+                "emotion_backend": settings.EMOTION_BACKEND,
+                "attention_pool": {
+                    "size": self._pool_size,
+                    "created": self._estimators_created,
+                    "in_use": self._estimators_in_use,
+                },
+                "loads": [asdict(s) for s in self._load_stats],
+            }
+
+
+_registry: ModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Единственный на процесс экземпляр реестра моделей."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def shutdown_model_registry() -> None:
+    """Закрывает модели реестра процесса, если он создавался (остановка приложения)."""
+    if _registry is not None:
+        _registry.close()
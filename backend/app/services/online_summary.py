@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import heapq
+
+import numpy as np
+
+from app.services.frame_records import FrameRecord
+
+
+def emotion_sums(frames: list[FrameRecord]) -> dict[str, float]:
+    """
+    Сумма распределений эмоций всех лиц с весом max(attention, 0.2) (без нормировки):
+    вероятности раскладываются в матрицу (лица x эмоции) по индексу метки, матрица
+    умножается на вектор весов.
+    """
+    faces = [face for frame in frames for face in frame.faces]
+    labels = sorted({label for face in faces for label in face.emotions})
+    if not labels:
+        return {}
+    label_index = {label: i for i, label in enumerate(labels)}
+
+    # строка матрицы — лицо, столбец — индекс метки; неполные распределения остаются с нулями
+    rows = np.repeat(np.arange(len(faces)), [len(face.emotions) for face in faces])
+    cols = [label_index[label] for face in faces for label in face.emotions]
+    probs = [prob for face in faces for prob in face.emotions.values()]
+    values = np.zeros((len(faces), len(labels)), dtype=np.float64)
+    values[rows, cols] = probs
+
+    attention = np.array([face.attention for face in faces], dtype=np.float64)
+    sums = np.maximum(attention, 0.2) @ values
+    return dict(zip(labels, sums.tolist()))
+
+
+def normalize_histogram(sums: dict[str, float]) -> dict[str, float]:
+    total = sum(sums.values()) or 1.0
+    return {label: float(value / total) for label, value in sorted(sums.items())}
+
+
+class OnlineSummary:
+    """
+    Сводка анализа, которая обновляется по мере появления кадров (для промежуточных результатов):
+    счётчики и суммы для средних, суммы эмоций и по highlight_candidates кадров с лицами
+    с наибольшим и наименьшим engagement (кандидаты в пики/провалы). Кадры подаются по
+    порядку времени; память и время построения сводки не растут с длиной видео.
+
+    Итог анализа по-прежнему считает VideoAnalysisService._summarize по всем кадрам;
+    средние и гистограмма совпадают с ним с точностью до порядка суммирования, пики и
+    провалы — если limit лучших разнесённых по времени кадров есть среди кандидатов
+    (VideoAnalysisService._highlight_candidates выбирает их число с запасом).
+    """
+
+    def __init__(self, highlight_candidates: int = 32) -> None:
+        self.frames = 0
+        self.faces = 0
+        self.processed_until_sec = 0.0
+        self.emotion_sum: dict[str, float] = {}
+        self.highlight_candidates = max(1, highlight_candidates)
+        self._meaningful = 0
+        self._attention_sum = 0.0
+        self._engagement_sum = 0.0
+        # min-кучи размера highlight_candidates; ключ (значение, -номер кадра): при равенстве
+        # вытесняется более поздний кадр — как при стабильной сортировке в _pick_extremes
+        self._peaks: list[tuple[float, int, float, float]] = []
+        self._dips: list[tuple[float, int, float, float]] = []
+
+    def add(self, frames: list[FrameRecord]) -> None:
+        if not frames:
+            return
+        for frame in frames:
+            self.faces += frame.face_count
+            if frame.face_count > 0:
+                seq = -self._meaningful
+                self._meaningful += 1
+                self._attention_sum += frame.attention_ratio
+                self._engagement_sum += frame.engagement_ratio
+                self._push(self._peaks, (frame.engagement_ratio, seq, frame.ts_sec, frame.attention_ratio))
+                self._push(self._dips, (-frame.engagement_ratio, seq, frame.ts_sec, frame.attention_ratio))
+        self.frames += len(frames)
+        self.processed_until_sec = frames[-1].ts_sec
+        for label, value in emotion_sums(frames).items():
+            self.emotion_sum[label] = self.emotion_sum.get(label, 0.0) + value
+
+    def _push(self, heap: list[tuple[float, int, float, float]], item: tuple[float, int, float, float]) -> None:
+        if len(heap) < self.highlight_candidates:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    @property
+    def avg_attention(self) -> float:
+        return self._attention_sum / self._meaningful if self._meaningful else 0.0
+
+    @property
+    def avg_engagement(self) -> float:
+        return self._engagement_sum / self._meaningful if self._meaningful else 0.0
+
+    def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ts, attention, engagement) кадров-кандидатов в пики и провалы, по порядку времени."""
+        rows = {seq: (ts, attention, value) for value, seq, ts, attention in self._peaks}
+        rows.update((seq, (ts, attention, -value)) for value, seq, ts, attention in self._dips)
+        ordered = [rows[seq] for seq in sorted(rows, reverse=True)]
+        if not ordered:
+            return np.empty(0), np.empty(0), np.empty(0)
+        ts, attention, engagement = (np.asarray(column, dtype=np.float64) for column in zip(*ordered))
+        return ts, attention, engagement
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class SceneGate:
+    """
+    Пропуск анализа кадров, почти не отличающихся от последнего проанализированного.
+
+    Отпечаток кадра — серая миниатюра width x height (кадр сначала прореживается по пикселям,
+    чтобы resize не читал весь 4K-кадр). Кадр пропускается, если средняя абсолютная разница
+    миниатюр в долях [0, 1] не больше threshold и с последнего полного анализа прошло меньше
+    max_skip_sec секунд. Сравнение идёт с последним проанализированным кадром, а не с
+    предыдущим, поэтому медленный дрейф сцены тоже приводит к анализу.
+
+    Состояние — только эталонная миниатюра и её время, сброса нет: VideoAnalysisService создаёт
+    новый SceneGate на каждый проход, поэтому первый кадр всегда анализируется. Эталон зависит
+    от всей предыстории, поэтому с включённым гейтом видео не делится на сегменты.
+    """
+
+    def __init__(self, threshold: float, max_skip_sec: float, width: int = 64, height: int = 36) -> None:
+        self.threshold = threshold
+        self.max_skip_sec = max(0.0, max_skip_sec)
+        self.size = (width, height)
+        self._reference: np.ndarray | None = None
+        self._reference_ts = 0.0
+        self.analyzed = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.max_skip_sec > 0
+
+    def thumbnail(self, frame_bgr: np.ndarray) -> np.ndarray:
+        import cv2
+
+        h, w = frame_bgr.shape[:2]
+        step = max(1, min(w // (self.size[0] * 4), h // (self.size[1] * 4)))
+        gray = cv2.cvtColor(frame_bgr[::step, ::step], cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+    def should_skip(self, ts_sec: float, frame_bgr: np.ndarray) -> bool:
+        """True — кадр можно не анализировать и повторить метрики предыдущего."""
+        if not self.enabled:
+            return False
+        thumbnail = self.thumbnail(frame_bgr)
+        if (
+            self._reference is not None
+            and ts_sec - self._reference_ts < self.max_skip_sec
+            and float(np.abs(thumbnail - self._reference).mean()) <= self.threshold
+        ):
+            self.skipped += 1
+            return True
+        self._reference, self._reference_ts = thumbnail, ts_sec
+        self.analyzed += 1
+        return False
+
+    def stats(self) -> dict:
+        total = self.analyzed + self.skipped
+        return {
+            "scene_skipped": self.skipped,
+            "scene_skip_rate": round(self.skipped / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,168 @@
+# app/worker.py
+"""
+Воркеры фонового анализа лекций.
+
+Каждый воркер — отдельный процесс со своим реестром моделей и своим подключением к БД.
+Задачи берутся из таблицы analysis_jobs (FOR UPDATE SKIP LOCKED), поэтому
+воркеров можно запускать сколько угодно и где угодно:
+
+    python -m app.worker --workers 2
+
+Либо их поднимает само API при старте (APP_ANALYSIS_WORKERS > 0).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+
+from app.config import settings
+from app.infrastructure.db.session import async_session_maker
+from app.infrastructure.logger import logger
+from app.infrastructure.repositories.AnalysisJobRepository import AnalysisJobRepository
+from app.infrastructure.repositories.LectureRepository import LectureRepository
+from app.models.dbModels.AnalysisJobEntity import AnalysisJobStatusEnum
+from app.models.dbModels.LectureEntity import LectureStatusEnum
+from app.services.VideoAnalysisService import VideoAnalysisService, shutdown_segment_pool
+from app.services.model_registry import get_model_registry
+
+
+async def _process_next_job(service: VideoAnalysisService, worker_id: str) -> bool:
+    """Забирает и выполняет одну задачу. Возвращает False, если очередь пуста."""
+    async with async_session_maker() as session:
+        job_repo = AnalysisJobRepository(session)
+        lecture_repo = LectureRepository(session)
+
+        job = await job_repo.claim_next(worker_id=worker_id, stale_after_sec=settings.ANALYSIS_JOB_STALE_SEC)
+        if job is None:
+            await session.rollback()
+            return False
+
+        if job.cancel_requested:
+            # отмену запросили, а воркер упал раньше, чем успел её увидеть
+            await job_repo.finish(job.id, status=AnalysisJobStatusEnum.cancelled)
+            await lecture_repo.update_status(
+                lecture_id=job.lecture_id,
+                status=LectureStatusEnum.error,
+                error_message="Анализ отменён",
+            )
+            await session.commit()
+            return True
+
+        if job.attempts > settings.ANALYSIS_JOB_MAX_ATTEMPTS:
+            # задача уже несколько раз «роняла» воркер — больше не пробуем
+            message = f"Анализ прерывался {job.attempts - 1} раз(а), задача снята"
+            await job_repo.finish(job.id, status=AnalysisJobStatusEnum.error, error_message=message)
+            await lecture_repo.update_status(
+                lecture_id=job.lecture_id,
+                status=LectureStatusEnum.error,
+                error_message=message,
+            )
+            await session.commit()
+            logger.warning("Analysis job {} dropped after {} attempts", job.id, job.attempts - 1)
+            return True
+
+        await lecture_repo.update_status(
+            lecture_id=job.lecture_id,
+            status=LectureStatusEnum.processing,
+            progress=0,
+        )
+        await session.commit()
+        job_id, lecture_id, video_path, sample_sec = job.id, job.lecture_id, job.video_path, job.sample_sec
+        video_sha256 = job.video_sha256
+
+    logger.info("Worker {} started job {} (lecture {})", worker_id, job_id, lecture_id)
+    await service.run_analysis_job(
+        session_factory=async_session_maker,
+        job_id=job_id,
+        lecture_id=lecture_id,
+        video_path=video_path,
+        sample_sec=sample_sec,
+        video_sha256=video_sha256,
+    )
+    return True
+
+
+async def run_worker(worker_id: str, workers: int = 1) -> None:
+    """
+    Бесконечный цикл воркера: берёт задачи из очереди, пока они есть, иначе ждёт.
+    workers — сколько воркеров работает рядом: в режиме segments ядра делятся между ними.
+    """
+    registry = get_model_registry()
+    if settings.MODEL_WARMUP:
+        await asyncio.to_thread(registry.warm_up)
+    service = VideoAnalysisService(models=registry, concurrent_analyses=workers)
+    logger.info("Analysis worker {} ready", worker_id)
+
+    try:
+        while True:
+            try:
+                claimed = await _process_next_job(service, worker_id)
+            except Exception:
+                # БД недоступна и т.п. — воркер не должен умирать, повторим после паузы
+                logger.exception("Analysis worker {} failed to process the queue", worker_id)
+                claimed = False
+            if not claimed:
+                await asyncio.sleep(settings.ANALYSIS_POLL_INTERVAL_SEC)
+    finally:
+        shutdown_segment_pool()
+
+
+def _worker_main(index: int, workers: int) -> None:
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    # terminate() из stop_worker_pool — выходим через finally, а не молча по SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        asyncio.run(run_worker(worker_id, workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_segment_pool()
+
+
+def start_worker_pool(workers: int) -> list[multiprocessing.Process]:
+    # spawn: дочерний процесс не наследует состояние event loop, пулы соединений и модели родителя
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(workers):
+        process = ctx.Process(target=_worker_main, args=(index, workers), name=f"analysis-worker-{index}")
+        process.start()
+        processes.append(process)
+    logger.info("Started {} analysis worker process(es)", len(processes))
+    return processes
+
+
+def stop_worker_pool(processes: list[multiprocessing.Process], timeout: float = 10.0) -> None:
+    """
+    Останавливает воркеры. Прерванная задача остаётся в статусе running и после
+    ANALYSIS_JOB_STALE_SEC без heartbeat её заберёт следующий воркер.
+    Процессы пула сегментов воркера завершаются вместе с ним (и после kill тоже).
+    """
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Analysis job workers")
+    ap.add_argument("--workers", type=int, default=max(1, settings.ANALYSIS_WORKERS))
+    args = ap.parse_args()
+
+    processes = start_worker_pool(args.workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_worker_pool(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,9 +29,11 @@ export interface AnalysisData {
   avg_attention: number;
   avg_engagement: number;
   score: number;
-  metrics_path: string;
+  metrics_path: string | null;
   summary_json: AnalysisSummary | string | null;
   created_at: string;
+  partial?: boolean;
+  processed_until_sec?: number | null;
 }
 
 export interface AnalysisResult extends AnalysisData {}
@@ -0,0 +1,131 @@
+# scripts/bench_aggregation.py
+"""
+Post-processing after the frame loop for a long recording: averages, peak/dip highlights and
+the emotion histogram. The previous implementation (Python lists, two full sorts with an
+O(n*k) window check, per-face dict updates) versus VideoAnalysisService._summarize on arrays
+(argpartition + NMS in time, bincount over flattened emotion pairs).
+
+Frames are synthetic FrameRecords; engagement ratios are quantized like positive_faces / face_count,
+so ties between frames are common. Fails if highlights differ or the histogram differs beyond --atol.
+
+    python scripts/bench_aggregation.py --hours 4 --faces-per-frame 20
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.VideoAnalysisService import VideoAnalysisService  # noqa: E402
+from app.services.frame_records import FaceRecord, FrameRecord  # noqa: E402
+
+LABELS = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
+
+
+def synthetic_frames(n_frames: int, faces_per_frame: int, sample_sec: float, seed: int = 0) -> list[FrameRecord]:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(n_frames):
+        # пустые кадры (лиц нет) тоже встречаются
+        n_faces = 0 if rng.random() < 0.05 else faces_per_frame
+        probs = rng.dirichlet(np.ones(len(LABELS)), size=n_faces).tolist()
+        attention = rng.uniform(0, 1, size=n_faces).tolist()
+        faces = [
+            FaceRecord((0, 0, 10, 10), 0.0, 0.0, 0.0, attention[j], 0.5, 0.5, "neutral", 0.5,
+                       dict(zip(LABELS, probs[j])), "screen", j)
+            for j in range(n_faces)
+        ]
+        positive = int(rng.integers(0, n_faces + 1)) if n_faces else 0
+        frames.append(
+            FrameRecord(
+                i * sample_sec,
+                faces,
+                engagement_ratio=positive / n_faces if n_faces else 0.0,
+                attention_ratio=float(np.mean(attention)) if n_faces else 0.0,
+                positive_faces=positive,
+                face_count=n_faces,
+            )
+        )
+    return frames
+
+
+# ---------- предыдущая реализация ----------
+
+def legacy_summarize(frames, sample_sec: float, limit: int = 3):
+    meaningful = [frame for frame in frames if frame.face_count > 0]
+    avg_att = float(np.mean([frame.attention_ratio for frame in meaningful])) if meaningful else 0.0
+    avg_eng = float(np.mean([frame.engagement_ratio for frame in meaningful])) if meaningful else 0.0
+
+    emotion_sum: dict[str, float] = {}
+    for frame in frames:
+        for face in frame.faces:
+            weight = max(face.attention, 0.2)
+            for emo, prob in face.emotions.items():
+                emotion_sum[emo] = emotion_sum.get(emo, 0.0) + prob * weight
+    total = sum(emotion_sum.values()) or 1.0
+    emotion_hist = {k: float(v / total) for k, v in sorted(emotion_sum.items())}
+
+    window = max(sample_sec * 3.0, 2.0)
+
+    def pick(sorted_frames):
+        selected = []
+        for frame in sorted_frames:
+            if all(abs(frame.ts_sec - prev.ts_sec) >= window for prev in selected):
+                selected.append(frame)
+            if len(selected) >= limit:
+                break
+        return selected
+
+    peaks = pick(sorted(meaningful, key=lambda frame: frame.engagement_ratio, reverse=True))
+    dips = pick(sorted(meaningful, key=lambda frame: frame.engagement_ratio))
+    return avg_att, avg_eng, emotion_hist, [f.ts_sec for f in peaks], [f.ts_sec for f in dips]
+
+
+def array_summarize(service: VideoAnalysisService, frames, sample_sec: float):
+    _, avg_att, avg_eng, _, emotion_hist, peaks, dips, _ = service._summarize(frames, sample_sec)
+    return avg_att, avg_eng, emotion_hist, [h.ts_sec for h in peaks], [h.ts_sec for h in dips]
+
+
+def best_of(fn, repeats: int):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hours", type=float, default=4.0)
+    ap.add_argument("--sample_sec", type=float, default=1.0)
+    ap.add_argument("--faces-per-frame", type=int, default=20)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--atol", type=float, default=1e-9)
+    args = ap.parse_args()
+
+    n_frames = int(args.hours * 3600 / args.sample_sec)
+    frames = synthetic_frames(n_frames, args.faces_per_frame, args.sample_sec)
+    service = VideoAnalysisService.__new__(VideoAnalysisService)  # без моделей: нужна только агрегация
+    print(f"frames={n_frames} faces={sum(f.face_count for f in frames)}")
+
+    legacy_sec, legacy = best_of(lambda: legacy_summarize(frames, args.sample_sec), args.repeats)
+    array_sec, result = best_of(lambda: array_summarize(service, frames, args.sample_sec), args.repeats)
+    print(f"{'legacy':>8}: {legacy_sec * 1000:8.1f} ms")
+    print(f"{'arrays':>8}: {array_sec * 1000:8.1f} ms  x{legacy_sec / array_sec:.2f}")
+
+    hist_diff = max(abs(legacy[2][k] - result[2].get(k, np.inf)) for k in legacy[2])
+    same_highlights = legacy[3:] == result[3:] and legacy[2].keys() == result[2].keys()
+    means_diff = max(abs(legacy[0] - result[0]), abs(legacy[1] - result[1]))
+    print(f"highlights identical={same_highlights} max|hist diff|={hist_diff:.1e} max|mean diff|={means_diff:.1e}")
+    if not same_highlights or hist_diff > args.atol or means_diff > args.atol:
+        print("FAILED: array aggregation differs from the previous implementation")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# scripts/bench_emotion_batch.py
+"""
+Throughput of EmotionClassifier: one forward pass per face (predict) versus
+one pass per batch (predict_batch), reported in faces/sec.
+
+    python scripts/bench_emotion_batch.py --backend onnx --model backend/app/ml_models/emotion_minix.onnx
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.emotion_classifier import EmotionClassifier  # noqa: E402
+from app.services.inference_engines import create_inference_engine  # noqa: E402
+
+
+def make_faces(n: int, seed: int = 0):
+    # face crops of realistic, varying sizes (lecture hall: 40..160 px)
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(40, 160, size=n)
+    return [rng.integers(0, 255, size=(s, s, 3), dtype=np.uint8) for s in sizes]
+
+
+def faces_per_sec(fn, faces, repeats: int) -> float:
+    fn(faces[: min(len(faces), 8)])  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn(faces)
+    return len(faces) * repeats / (time.perf_counter() - started)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    ap.add_argument("--model", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.pt"))
+    ap.add_argument("--faces", type=int, default=256)
+    ap.add_argument("--batch_sizes", default="1,4,8,16,32,64,128")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=0)
+    args = ap.parse_args()
+
+    clf = EmotionClassifier(engine=create_inference_engine(args.backend, args.model, intra_op_threads=args.threads))
+    faces = make_faces(args.faces)
+
+    def per_face(batch):
+        for face in batch:
+            clf.predict(face)
+
+    def batched(batch_size):
+        def run(batch):
+            for i in range(0, len(batch), batch_size):
+                clf.predict_batch(batch[i:i + batch_size])
+        return run
+
+    print(f"backend={args.backend} img_size={clf.img_size} faces={args.faces}")
+    baseline = faces_per_sec(per_face, faces, args.repeats)
+    print(f"{'predict (per face)':>22}: {baseline:9.1f} faces/sec")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        fps = faces_per_sec(batched(batch_size), faces, args.repeats)
+        print(f"{f'predict_batch({batch_size})':>22}: {fps:9.1f} faces/sec  x{fps / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
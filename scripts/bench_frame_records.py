@@ -0,0 +1,138 @@
+# scripts/bench_frame_records.py
+"""
+Cost of per-face result objects in the analysis loop: pydantic FaceMetrics / FaceEmotion /
+FrameMetrics (validated on creation, model_dump() for JSON) versus the __slots__ records
+FaceRecord / FrameRecord (to_dict() for JSON, to_dto() only at the API boundary).
+
+Prints time to build and to serialize, and memory retained by the built objects,
+per 10k faces. Fails if the two serialized forms differ.
+
+    python scripts/bench_frame_records.py --faces 100000 --faces-per-frame 8
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.models.dtoModels.AnalysisDTO import FaceEmotion, FaceMetrics, FrameMetrics  # noqa: E402
+from app.services.frame_records import FaceRecord, FrameRecord  # noqa: E402
+
+LABELS = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
+TARGETS = ["screen", "left", "right", "up", "down"]
+
+
+def synthetic_faces(n: int, seed: int = 0) -> list[tuple]:
+    """(bbox, yaw, pitch, roll, attention, affect, engagement, label, prob, emotions, target, track_id)"""
+    rng = np.random.default_rng(seed)
+    probs = rng.dirichlet(np.ones(len(LABELS)), size=n).tolist()
+    faces = []
+    for i, row in enumerate(probs):
+        top = int(np.argmax(row))
+        faces.append(
+            (
+                tuple(rng.integers(0, 1000, size=4).tolist()),
+                *rng.uniform(-40, 40, size=3).tolist(),
+                *rng.uniform(0, 1, size=3).tolist(),
+                LABELS[top],
+                row[top],
+                dict(zip(LABELS, row)),
+                TARGETS[i % len(TARGETS)],
+                i % 50,
+            )
+        )
+    return faces
+
+
+def build_pydantic(faces: list[tuple], per_frame: int) -> list[FrameMetrics]:
+    frames = []
+    for start in range(0, len(faces), per_frame):
+        frame_faces = [
+            FaceMetrics(
+                bbox=bbox,
+                yaw_deg=yaw,
+                pitch_deg=pitch,
+                roll_deg=roll,
+                attention=attention,
+                affect=affect,
+                engagement=engagement,
+                top_emotion=FaceEmotion(label=label, prob=prob),
+                emotions=emotions,
+                looking_target=target,
+                track_id=track_id,
+            )
+            for bbox, yaw, pitch, roll, attention, affect, engagement, label, prob, emotions, target, track_id
+            in faces[start:start + per_frame]
+        ]
+        frames.append(FrameMetrics(ts_sec=float(start), faces=frame_faces, face_count=len(frame_faces)))
+    return frames
+
+
+def build_records(faces: list[tuple], per_frame: int) -> list[FrameRecord]:
+    frames = []
+    for start in range(0, len(faces), per_frame):
+        frame_faces = [FaceRecord(*face) for face in faces[start:start + per_frame]]
+        frames.append(FrameRecord(float(start), frame_faces, face_count=len(frame_faces)))
+    return frames
+
+
+def measure(build, serialize, faces, per_frame: int, repeats: int) -> tuple[float, float, float, list]:
+    """(build sec, serialize sec, retained bytes, serialized) — время лучшего из repeats прогонов."""
+    build_sec = serialize_sec = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        frames = build(faces, per_frame)
+        build_sec = min(build_sec, time.perf_counter() - started)
+        started = time.perf_counter()
+        dumped = serialize(frames)
+        serialize_sec = min(serialize_sec, time.perf_counter() - started)
+        del frames
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    frames = build(faces, per_frame)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del frames
+    return build_sec, serialize_sec, retained, dumped
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--faces", type=int, default=50_000)
+    ap.add_argument("--faces-per-frame", type=int, default=8)
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+
+    faces = synthetic_faces(args.faces)
+    scale = 10_000 / args.faces
+    print(f"faces={args.faces} faces_per_frame={args.faces_per_frame} (numbers per 10k faces)")
+
+    rows = {
+        "pydantic": measure(
+            build_pydantic, lambda frames: [f.model_dump() for f in frames], faces, args.faces_per_frame, args.repeats
+        ),
+        "records": measure(
+            build_records, lambda frames: [f.to_dict() for f in frames], faces, args.faces_per_frame, args.repeats
+        ),
+    }
+    base_build, base_dump, base_mem, base_dumped = rows["pydantic"]
+    for name, (build_sec, dump_sec, retained, _) in rows.items():
+        print(
+            f"{name:>10}: build {build_sec * scale * 1000:7.1f} ms  dump {dump_sec * scale * 1000:7.1f} ms  "
+            f"memory {retained * scale / 2 ** 20:6.2f} MiB  "
+            f"(x{base_build / build_sec:.1f} / x{base_dump / dump_sec:.1f} / x{base_mem / retained:.1f})"
+        )
+
+    if rows["records"][3] != base_dumped:
+        print("FAILED: records serialize differently from the pydantic models")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
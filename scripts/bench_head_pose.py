@@ -0,0 +1,193 @@
+# scripts/bench_head_pose.py
+"""
+Per-face cost of turning MediaPipe landmarks into head pose + boxes (AttentionEstimator):
+the previous per-face implementation (Python lists over 478 landmarks, pose constants
+rebuilt for every face) versus the array path (one (F, 478, 2) array per frame,
+constants cached per resolution, Euler angles for all faces at once).
+
+Landmarks come from FaceMesh run around faces of --video; without a video they are
+synthesized by projecting a rotated head model. Fails if the results differ.
+
+    python scripts/bench_head_pose.py --video lecture.mp4 --faces-per-frame 8
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.attention_estimator import AttentionEstimator  # noqa: E402
+
+
+# ---------- предыдущая реализация (по одному лицу) ----------
+
+def legacy_head_pose(landmarks, image_w: int, image_h: int):
+    if len(landmarks) < 468:
+        return 0.0, 0.0, 0.0
+    pts_2d = np.array(
+        [
+            [landmarks[1].x * image_w, landmarks[1].y * image_h],
+            [landmarks[175].x * image_w, landmarks[175].y * image_h],
+            [landmarks[33].x * image_w, landmarks[33].y * image_h],
+            [landmarks[263].x * image_w, landmarks[263].y * image_h],
+            [landmarks[61].x * image_w, landmarks[61].y * image_h],
+            [landmarks[291].x * image_w, landmarks[291].y * image_h],
+        ],
+        dtype=np.float64,
+    )
+    pts_3d = np.array(
+        [
+            [0.0, 0.0, 0.0],
+            [0.0, -63.6, -12.5],
+            [-43.3, 32.7, -26.0],
+            [43.3, 32.7, -26.0],
+            [-28.9, -28.9, -24.1],
+            [28.9, -28.9, -24.1],
+        ],
+        dtype=np.float64,
+    )
+    focal = image_w
+    cam_matrix = np.array([[focal, 0, image_w / 2], [0, focal, image_h / 2], [0, 0, 1]], dtype=np.float64)
+    dist = np.zeros((4, 1))
+    ok, rvec, tvec = cv2.solvePnP(pts_3d, pts_2d, cam_matrix, dist, flags=cv2.SOLVEPNP_ITERATIVE)
+    if not ok:
+        return 0.0, 0.0, 0.0
+    R, _ = cv2.Rodrigues(rvec)
+    sy = np.sqrt(R[0, 0] * R[0, 0] + R[1, 0] * R[1, 0])
+    if sy >= 1e-6:
+        yaw = np.degrees(np.arctan2(R[2, 1], R[2, 2]))
+        pitch = np.degrees(np.arctan2(-R[2, 0], sy))
+        roll = np.degrees(np.arctan2(R[1, 0], R[0, 0]))
+    else:
+        yaw = np.degrees(np.arctan2(-R[1, 2], R[1, 1]))
+        pitch = np.degrees(np.arctan2(-R[2, 0], sy))
+        roll = 0
+    return float(yaw), float(pitch), float(roll)
+
+
+def legacy_bbox(landmarks, w: int, h: int, pad_ratio: float):
+    xs = [lm.x * w for lm in landmarks]
+    ys = [lm.y * h for lm in landmarks]
+    x1, y1 = max(0, int(min(xs))), max(0, int(min(ys)))
+    x2, y2 = min(w - 1, int(max(xs))), min(h - 1, int(max(ys)))
+    pad = int(pad_ratio * max(w, h))
+    x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
+    x2, y2 = min(w - 1, x2 + pad), min(h - 1, y2 + pad)
+    return x1, y1, x2 - x1 + 1, y2 - y1 + 1
+
+
+def legacy_frame(faces, w: int, h: int, pad_ratio: float):
+    return [(legacy_head_pose(face.landmark, w, h), legacy_bbox(face.landmark, w, h, pad_ratio)) for face in faces]
+
+
+def array_frame(estimator: AttentionEstimator, faces, w: int, h: int):
+    points = estimator._landmarks_to_points(faces, scale=(w, h))
+    return [
+        ((face["yaw"], face["pitch"], face["roll"]), face["bbox"])
+        for face in estimator._faces_from_points(points, w, h)
+    ]
+
+
+# ---------- данные ----------
+
+def landmarks_from_video(video_path: str, estimator: AttentionEstimator, limit: int):
+    """Landmarks (protobuf, как отдаёт MediaPipe) в координатах кадра: FaceMesh вокруг найденных детектором лиц."""
+    cap = cv2.VideoCapture(video_path)
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    result = []
+    while len(result) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        for face in estimator.estimate(frame):
+            x, y, bw, bh = estimator._expand_bbox(face["roi"], w, h, pad_ratio=estimator.ROI_MARGIN)
+            crop = cv2.cvtColor(frame[y:y + bh, x:x + bw], cv2.COLOR_BGR2RGB)
+            res = estimator._get_roi_mesh().process(crop)
+            if res and res.multi_face_landmarks:
+                face_lms = landmark_pb2.NormalizedLandmarkList()
+                for lm in res.multi_face_landmarks[0].landmark:
+                    face_lms.landmark.add(x=(x + lm.x * bw) / w, y=(y + lm.y * bh) / h, z=lm.z)
+                result.append(face_lms)
+    cap.release()
+    return result, (w, h)
+
+
+def synthetic_landmarks(n: int, size=(1280, 720), seed: int = 0):
+    """Голова из модели solvePnP под случайным углом + шум для остальных 472 точек."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    cam = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=np.float64)
+    result = []
+    for _ in range(n):
+        rvec = np.deg2rad(rng.uniform(-35, 35, size=3)) + np.array([np.pi, 0, 0])
+        tvec = np.array([rng.uniform(-400, 400), rng.uniform(-200, 200), rng.uniform(900, 2500)])
+        projected, _ = cv2.projectPoints(AttentionEstimator._POSE_MODEL_POINTS, rvec, tvec, cam, np.zeros(4))
+        projected = projected.reshape(-1, 2)
+        center, spread = projected.mean(axis=0), np.ptp(projected, axis=0) + 1
+        points = center + rng.normal(scale=spread / 2, size=(478, 2))
+        points[AttentionEstimator._POSE_LANDMARKS] = projected
+        face_lms = landmark_pb2.NormalizedLandmarkList()
+        for px, py in points:
+            face_lms.landmark.add(x=px / w, y=py / h, z=0.0)
+        result.append(face_lms)
+    return result, size
+
+
+def per_face_us(fn, frames, repeats: int) -> float:
+    fn(frames[0])  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for faces in frames:
+            fn(faces)
+    n_faces = sum(len(faces) for faces in frames) * repeats
+    return (time.perf_counter() - started) / n_faces * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--video", help="clip to take real landmarks from; synthetic landmarks if omitted")
+    ap.add_argument("--faces", type=int, default=64, help="number of distinct landmark sets")
+    ap.add_argument("--faces-per-frame", type=int, default=8)
+    ap.add_argument("--repeats", type=int, default=20)
+    ap.add_argument("--atol", type=float, default=1e-6, help="max allowed |angle diff| in degrees")
+    args = ap.parse_args()
+
+    estimator = AttentionEstimator(pad_ratio=0.2)
+    if args.video:
+        faces, (w, h) = landmarks_from_video(args.video, estimator, args.faces)
+    else:
+        faces, (w, h) = synthetic_landmarks(args.faces)
+    if not faces:
+        print("no landmarks found")
+        sys.exit(1)
+
+    k = args.faces_per_frame
+    frames = [faces[i:i + k] for i in range(0, len(faces), k)]
+    print(f"faces={len(faces)} faces_per_frame={k} resolution={w}x{h}")
+
+    legacy_us = per_face_us(lambda fs: legacy_frame(fs, w, h, estimator.pad_ratio), frames, args.repeats)
+    array_us = per_face_us(lambda fs: array_frame(estimator, fs, w, h), frames, args.repeats)
+    print(f"{'per-face (legacy)':>20}: {legacy_us:8.1f} us/face")
+    print(f"{'array path':>20}: {array_us:8.1f} us/face  x{legacy_us / array_us:.2f}")
+
+    max_angle_diff, box_mismatches = 0.0, 0
+    for fs in frames:
+        for (angles_a, box_a), (angles_b, box_b) in zip(legacy_frame(fs, w, h, estimator.pad_ratio), array_frame(estimator, fs, w, h)):
+            max_angle_diff = max(max_angle_diff, *(abs(a - b) for a, b in zip(angles_a, angles_b)))
+            box_mismatches += tuple(box_a) != tuple(box_b)
+    print(f"max|angle diff|={max_angle_diff:.1e} deg  bbox mismatches={box_mismatches}")
+
+    if max_angle_diff > args.atol or box_mismatches:
+        print("FAILED: array path differs from the per-face implementation")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
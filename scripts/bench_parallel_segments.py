@@ -0,0 +1,150 @@
+# scripts/bench_parallel_segments.py
+"""
+Sequential vs pipelined vs segment-parallel analysis of one video (ANALYSIS_EXECUTION_MODE).
+
+Renders a synthetic lecture video (face crops from data/test drifting over a noisy
+background), analyzes it sequentially, with the threaded stage pipeline (per-stage busy
+and queue wait times are printed) and with 1..N segment workers, and prints wall time,
+speedup and whether the result matches the sequential one.
+Segments batch faces for the emotion model differently, so probabilities may differ
+in the last float digits; everything else (frames, boxes, labels) must be identical.
+
+    python scripts/bench_parallel_segments.py --duration 120 --workers 1,2,4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.config import settings  # noqa: E402
+from app.services.VideoAnalysisService import VideoAnalysisService, shutdown_segment_pool  # noqa: E402
+
+
+def load_face_crops(data_dir: Path, limit: int = 16):
+    crops = []
+    for img_path in sorted(data_dir.rglob("*")):
+        if len(crops) >= limit:
+            break
+        if not img_path.is_file():
+            continue
+        img = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
+        if img is not None:
+            crops.append(cv2.resize(img, (120, 120)))
+    return crops
+
+
+def render_video(path: str, duration_sec: float, fps: float, size=(1280, 720), seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    width, height = size
+    crops = load_face_crops(ROOT / "data" / "test") or [
+        rng.integers(0, 255, size=(120, 120, 3), dtype=np.uint8) for _ in range(4)
+    ]
+    seats = [(80 + (i % 6) * 190, 120 + (i // 6) * 220) for i in range(min(len(crops), 12))]
+    background = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for frame_idx in range(int(duration_sec * fps)):
+        frame = background.copy()
+        for i, (x, y) in enumerate(seats):
+            dx = int(10 * np.sin(frame_idx / fps + i))
+            dy = int(6 * np.cos(frame_idx / (2 * fps) + i))
+            frame[y + dy:y + dy + 120, x + dx:x + dx + 120] = crops[i]
+        writer.write(frame)
+    writer.release()
+
+
+def run(video_path: str, sample_sec: float, mode: str, workers: int):
+    settings.ANALYSIS_EXECUTION_MODE = mode
+    settings.ANALYSIS_SEGMENT_WORKERS = workers
+    service = VideoAnalysisService()
+    # модели и пул процессов живут всё время работы сервиса — их загрузку не считаем
+    service._analyze_sync(video_path, sample_sec)
+    started = time.perf_counter()
+    result = service._analyze_sync(video_path, sample_sec)
+    return time.perf_counter() - started, result, service.last_timings
+
+
+def max_diff(a, b) -> float:
+    """Max |a - b| over all numbers of two nested results; inf if their structure or labels differ."""
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return float("inf")
+        return max((max_diff(x, y) for x, y in zip(a, b)), default=0.0)
+    if isinstance(a, dict) and isinstance(b, dict):
+        if a.keys() != b.keys():
+            return float("inf")
+        return max((max_diff(a[k], b[k]) for k in a), default=0.0)
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b)
+    return 0.0 if a == b else float("inf")
+
+
+def dump(result) -> list:
+    frames, avg_att, avg_eng, score, emotion_hist, peaks, dips, _ = result
+    return [
+        [f.to_dict() for f in frames], avg_att, avg_eng, score, emotion_hist,
+        [h.model_dump() for h in peaks], [h.model_dump() for h in dips],
+    ]
+
+
+def compare(a, b) -> float:
+    return max_diff(dump(a), dump(b))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--video", help="existing video; a synthetic one is rendered if omitted")
+    ap.add_argument("--duration", type=float, default=120.0)
+    ap.add_argument("--fps", type=float, default=25.0)
+    ap.add_argument("--sample_sec", type=float, default=1.0)
+    ap.add_argument("--atol", type=float, default=1e-5)
+    ap.add_argument("--workers", default=",".join(str(2 ** i) for i in range(4) if 2 ** i <= (os.cpu_count() or 1)))
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(td, "synthetic.mp4")
+            render_video(video_path, args.duration, args.fps)
+
+        # каждый сэмпл — отдельный сегмент-кандидат, чтобы сегментов было ровно по числу воркеров
+        settings.ANALYSIS_SEGMENT_MIN_SAMPLES = 1
+        print(f"video={video_path} cpu_count={os.cpu_count()}")
+        base_sec, base_result, timings = run(video_path, args.sample_sec, "sequential", 1)
+        print(f"{'sequential':>14}: {base_sec:7.2f}s  frames={len(base_result[0])} decode={timings['decode_sec']}s")
+
+        elapsed, result, timings = run(video_path, args.sample_sec, "pipeline", 1)
+        diff = compare(base_result, result)
+        mismatches = int(diff > args.atol)
+        stages = " ".join(
+            f"{stage}={timings[f'{stage}_sec']}s/wait {timings[f'{stage}_wait_sec']}s"
+            for stage in ("read", "detect", "classify")
+        )
+        print(f"{'pipeline':>14}: {elapsed:7.2f}s  speedup x{base_sec / elapsed:.2f}  max|diff|={diff:.1e}  {stages}")
+
+        for workers in (int(w) for w in args.workers.split(",")):
+            shutdown_segment_pool()
+            elapsed, result, timings = run(video_path, args.sample_sec, "segments", workers)
+            diff = compare(base_result, result)
+            mismatches += diff > args.atol
+            print(
+                f"{f'segments x{workers}':>14}: {elapsed:7.2f}s  speedup x{base_sec / elapsed:.2f}  "
+                f"segments={timings.get('segments', 1)} max|diff|={diff:.1e}"
+            )
+        shutdown_segment_pool()
+
+    if mismatches:
+        print("FAILED: segment-parallel results differ from the sequential pass")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
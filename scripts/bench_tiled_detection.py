@@ -0,0 +1,108 @@
+# scripts/bench_tiled_detection.py
+"""
+Recall / time trade-off of tiled face detection (AttentionEstimator detect_tiles) on wide shots.
+
+A "lecture hall" frame is simulated by tiling --grid x --grid downscaled copies of a --video
+frame into one frame of the original size, so every face becomes --grid times smaller.
+Ground truth — detector boxes on the full-size source frame, mapped into the mosaic.
+A face counts as found if some returned face overlaps it with IoU >= --iou.
+
+    python scripts/bench_tiled_detection.py --video lecture.mp4 --grid 3 --tiles 1 2 3
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.attention_estimator import AttentionEstimator  # noqa: E402
+from app.services.box_ops import iou_matrix  # noqa: E402
+
+
+def read_frames(video_path: str, limit: int, stride: int) -> list[np.ndarray]:
+    cap = cv2.VideoCapture(video_path)
+    frames, idx = [], 0
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if idx % stride == 0:
+            frames.append(frame)
+        idx += 1
+    cap.release()
+    return frames
+
+
+def make_mosaic(frame: np.ndarray, boxes: np.ndarray, grid: int) -> tuple[np.ndarray, np.ndarray]:
+    """grid x grid уменьшенных копий кадра + боксы лиц в координатах мозаики."""
+    h, w = frame.shape[:2]
+    cell_w, cell_h = w // grid, h // grid
+    small = cv2.resize(frame, (cell_w, cell_h), interpolation=cv2.INTER_AREA)
+    mosaic = np.zeros((cell_h * grid, cell_w * grid, 3), dtype=np.uint8)
+    scale = np.array([cell_w / w, cell_h / h, cell_w / w, cell_h / h])
+    truth = []
+    for row in range(grid):
+        for col in range(grid):
+            mosaic[row * cell_h:(row + 1) * cell_h, col * cell_w:(col + 1) * cell_w] = small
+            truth.append(boxes * scale + np.array([col * cell_w, row * cell_h, 0, 0]))
+    return mosaic, np.concatenate(truth).reshape(-1, 4)
+
+
+def recall(truth: np.ndarray, faces: list[dict], iou: float) -> int:
+    if not len(truth) or not faces:
+        return 0
+    found = np.array([face["roi"] for face in faces], dtype=np.float64)
+    return int((iou_matrix(truth, found) >= iou).any(axis=1).sum())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--video", required=True)
+    ap.add_argument("--frames", type=int, default=10)
+    ap.add_argument("--stride", type=int, default=10, help="take every N-th frame of the clip")
+    ap.add_argument("--grid", type=int, default=3, help="copies per side in the simulated wide shot")
+    ap.add_argument("--tiles", type=int, nargs="+", default=[1, 2, 3])
+    ap.add_argument("--overlap", type=float, default=0.2)
+    ap.add_argument("--iou", type=float, default=0.3)
+    args = ap.parse_args()
+
+    frames = read_frames(args.video, args.frames, args.stride)
+    if not frames:
+        print("no frames read")
+        sys.exit(1)
+
+    reference = AttentionEstimator(max_faces=32, min_detection_confidence=0.35)
+    samples = []
+    for frame in frames:
+        boxes = np.array([face["roi"] for face in reference.estimate(frame)], dtype=np.float64)
+        samples.append(make_mosaic(frame, boxes, args.grid))
+    total = sum(len(truth) for _, truth in samples)
+    if not total:
+        print("no faces in the source frames")
+        sys.exit(1)
+
+    h, w = samples[0][0].shape[:2]
+    print(f"frames={len(samples)} mosaic={w}x{h} grid={args.grid} faces={total}")
+    print(f"{'tiles':>6} {'ms/frame':>10} {'found':>7} {'recall':>7} {'returned':>9}")
+    for n in args.tiles:
+        estimator = AttentionEstimator(
+            max_faces=32, min_detection_confidence=0.35, detect_tiles=n, tile_overlap=args.overlap
+        )
+        estimator.estimate(samples[0][0])  # warm-up: графы MediaPipe, потоки тайлов
+        found = returned = 0
+        started = time.perf_counter()
+        results = [estimator.estimate(mosaic) for mosaic, _ in samples]
+        elapsed = time.perf_counter() - started
+        for (_, truth), faces in zip(samples, results):
+            found += recall(truth, faces, args.iou)
+            returned += len(faces)
+        print(f"{n:>6} {elapsed / len(samples) * 1000:>10.1f} {found:>7} {found / total:>7.2f} {returned:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# scripts/check_cli_insert.py
+"""
+Check of the `python -m app.cli analyze --owner-id` insert path against a real database.
+
+Creates a throwaway user, inserts synthetic analysis results through app.cli.insert_results
+(the same call the CLI makes after analysis) and reads them back through the repositories:
+one lecture per result with status=done, progress=100, no video_tmp_path, the subject and
+title from the file name, and an AnalysisResult with the same metrics. The user is deleted
+afterwards (lectures and results go with it by ON DELETE CASCADE). Fails (exit code 1) on
+any mismatch.
+
+Needs the same environment as the API (DATABASE_* variables); use a test database.
+
+    python scripts/check_cli_insert.py --lectures 3
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from sqlalchemy import delete  # noqa: E402
+
+from app.cli import insert_results  # noqa: E402
+from app.infrastructure.db.session import async_session_maker  # noqa: E402
+from app.infrastructure.init_db import init_db  # noqa: E402
+from app.infrastructure.repositories.AnalysisResultRepository import AnalysisResultRepository  # noqa: E402
+from app.infrastructure.repositories.LectureRepository import LectureRepository  # noqa: E402
+from app.models.dbModels.LectureEntity import LectureStatusEnum  # noqa: E402
+from app.models.dbModels.UserEntity import UserEntity  # noqa: E402
+
+
+def fake_results(count: int) -> list[dict]:
+    """Строки в формате _analyze_in_worker, без анализа видео."""
+    rows = []
+    for i in range(count):
+        lecture_id = uuid.uuid4()
+        rows.append(
+            {
+                "video_path": f"/archive/lectures/lecture_{i:03d}.mp4",
+                "lecture_id": str(lecture_id),
+                "duration_sec": 60.0 * (i + 1),
+                "elapsed_sec": 1.0,
+                "metrics_path": f"artifacts/metrics/{lecture_id}.json",
+                "avg_engagement": 0.1 * i,
+                "avg_attention": 0.5 + 0.1 * i,
+                "score": 0.07 * i + 0.15,
+                "summary_json": f'{{"lecture_id": "{lecture_id}"}}',
+            }
+        )
+    return rows
+
+
+async def check(count: int, subject: str) -> list[str]:
+    await init_db()
+    owner_id = uuid.uuid4()
+    async with async_session_maker() as session:
+        session.add(
+            UserEntity(
+                id=owner_id,
+                email=f"cli-insert-check-{owner_id.hex[:12]}@example.invalid",
+                hashed_password="-",
+                first_name="CLI",
+                last_name="Check",
+            )
+        )
+        await session.commit()
+
+    errors: list[str] = []
+    rows = fake_results(count)
+    try:
+        await insert_results(rows, owner_id, subject)
+
+        async with async_session_maker() as session:
+            lectures = {str(lecture.id): lecture for lecture in await LectureRepository(session).list_by_owner(owner_id)}
+            analyses = await AnalysisResultRepository(session).list_by_lecture_ids([lecture.id for lecture in lectures.values()])
+
+        if len(lectures) != len(rows):
+            errors.append(f"expected {len(rows)} lectures for the owner, found {len(lectures)}")
+        for row in rows:
+            lecture = lectures.get(row["lecture_id"])
+            if lecture is None:
+                errors.append(f"lecture {row['lecture_id']} was not inserted")
+                continue
+            expected = {
+                "title": Path(row["video_path"]).stem,
+                "subject": subject,
+                "status": LectureStatusEnum.done,
+                "progress": 100,
+                "video_tmp_path": None,
+            }
+            for field, value in expected.items():
+                if getattr(lecture, field) != value:
+                    errors.append(f"lecture {lecture.id}: {field}={getattr(lecture, field)!r}, expected {value!r}")
+
+            analysis = analyses.get(lecture.id)
+            if analysis is None:
+                errors.append(f"lecture {lecture.id}: no analysis result")
+                continue
+            for field in ("avg_engagement", "avg_attention", "score", "metrics_path", "summary_json"):
+                if getattr(analysis, field) != row[field]:
+                    errors.append(f"lecture {lecture.id}: analysis {field}={getattr(analysis, field)!r}, expected {row[field]!r}")
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(delete(UserEntity).where(UserEntity.id == owner_id))
+            await session.commit()
+    return errors
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lectures", type=int, default=3)
+    ap.add_argument("--subject", default="cli insert check")
+    args = ap.parse_args()
+
+    errors = asyncio.run(check(args.lectures, args.subject))
+    if errors:
+        for error in errors:
+            print("FAILED:", error)
+        sys.exit(1)
+    print(f"OK: {args.lectures} lecture(s) with analysis results inserted and read back")
+
+
+if __name__ == "__main__":
+    main()
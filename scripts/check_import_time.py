@@ -0,0 +1,86 @@
+# scripts/check_import_time.py
+"""
+Import-time regression check for the API process.
+
+Imports the module (app.main by default) in a fresh interpreter with `python -X importtime`
+and fails if a heavy ML package is imported at module level (torch, mediapipe, onnxruntime,
+TensorFlow, matplotlib, sklearn, OpenCV — they must stay deferred until the first analysis) or if
+the cumulative import time exceeds --budget_ms (best of --runs). Prints the slowest
+top-level imports of the best run.
+
+Needs the same environment as the API (DATABASE_* variables).
+
+    python scripts/check_import_time.py --module app.main --budget_ms 2500
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+BACKEND = ROOT / "backend"
+
+FORBIDDEN = ("torch", "mediapipe", "onnxruntime", "tensorflow", "matplotlib", "sklearn", "cv2")
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """[(модуль, self мкс, cumulative мкс)] из вывода -X importtime, в порядке вывода."""
+    env = dict(os.environ, PYTHONPATH=str(BACKEND))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"FAILED: `import {module}` exited with code {proc.returncode}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--module", default="app.main")
+    ap.add_argument("--budget_ms", type=float, default=2500.0)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    best_rows, best_total = None, float("inf")
+    for _ in range(max(1, args.runs)):
+        rows = import_times(args.module)
+        total = next(cumulative for name, _, cumulative in rows if name.strip() == args.module)
+        if total < best_total:
+            best_rows, best_total = rows, total
+
+    print(f"import {args.module}: {best_total / 1000:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    # прямые зависимости модуля (отступ на один уровень глубже), самые медленные
+    top_level = [(name.strip(), cumulative) for name, _, cumulative in best_rows if name.startswith("   ")
+                 and not name.startswith("     ")]
+    for name, cumulative in sorted(top_level, key=lambda row: -row[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    imported = {name.strip() for name, _, _ in best_rows}
+    heavy = [pkg for pkg in FORBIDDEN if pkg in imported]
+    failed = False
+    if heavy:
+        print(f"FAILED: heavy packages imported at startup: {', '.join(heavy)}")
+        failed = True
+    if best_total / 1000 > args.budget_ms:
+        print(f"FAILED: import time {best_total / 1000:.0f} ms exceeds the budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
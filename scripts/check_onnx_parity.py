@@ -0,0 +1,80 @@
+# scripts/check_onnx_parity.py
+"""
+Parity check between the PyTorch checkpoint and the exported ONNX graph.
+
+Runs both inference engines of the backend on the same preprocessed faces
+from data/test and fails (exit code 1) if logits or top-1 labels diverge.
+
+    python scripts/check_onnx_parity.py --ckpt backend/app/ml_models/emotion_minix.pt \
+        --onnx backend/app/ml_models/emotion_minix.onnx
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.emotion_classifier import EmotionClassifier  # noqa: E402
+from app.services.inference_engines import create_inference_engine  # noqa: E402
+
+
+def load_faces(data_dir: Path, per_class: int):
+    faces = []
+    for class_dir in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        taken = 0
+        for img_path in sorted(class_dir.iterdir()):
+            if taken >= per_class:
+                break
+            img = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            faces.append((img_path, img))
+            taken += 1
+    return faces
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=str(ROOT / "data" / "test"))
+    ap.add_argument("--ckpt", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.pt"))
+    ap.add_argument("--onnx", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.onnx"))
+    ap.add_argument("--per_class", type=int, default=50)
+    ap.add_argument("--atol", type=float, default=1e-3)
+    args = ap.parse_args()
+
+    torch_clf = EmotionClassifier(engine=create_inference_engine("torch", args.ckpt))
+    onnx_clf = EmotionClassifier(engine=create_inference_engine("onnx", args.onnx))
+    if torch_clf.class_names != onnx_clf.class_names or torch_clf.img_size != onnx_clf.img_size:
+        print("Model metadata mismatch:", torch_clf.class_names, torch_clf.img_size,
+              "vs", onnx_clf.class_names, onnx_clf.img_size)
+        sys.exit(1)
+
+    faces = load_faces(Path(args.data), args.per_class)
+    if not faces:
+        print("No readable images under", args.data)
+        sys.exit(1)
+
+    max_diff, label_mismatches = 0.0, 0
+    for img_path, img in faces:
+        inp = torch_clf._preprocess(img)
+        torch_logits = torch_clf.engine.run(inp)
+        onnx_logits = onnx_clf.engine.run(inp)
+        diff = float(np.abs(torch_logits - onnx_logits).max())
+        max_diff = max(max_diff, diff)
+        if int(torch_logits.argmax()) != int(onnx_logits.argmax()):
+            label_mismatches += 1
+            print(f"  top-1 mismatch: {img_path} (max |diff| {diff:.2e})")
+
+    print(f"images: {len(faces)}  max |logit diff|: {max_diff:.2e}  top-1 mismatches: {label_mismatches}")
+    if max_diff > args.atol or label_mismatches:
+        print(f"FAILED (atol={args.atol})")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
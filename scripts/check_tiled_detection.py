@@ -0,0 +1,141 @@
+# scripts/check_tiled_detection.py
+"""
+Agreement check between tiled (AttentionEstimator detect_tiles > 1) and untiled face analysis
+on a multi-face clip.
+
+Faces of both modes are matched per frame by IoU of the face outline ("roi"). Fails (exit
+code 1) if the padding of the box around the outline (box area / outline area) of matched
+faces differs by more than --max_pad_ratio, if head pose (yaw, pitch) of matched faces with
+landmarks in both modes differs by more than --angle_tol degrees on average, or if the tiled mode finds fewer than
+--min_recall of the untiled faces (off by default: the detector legitimately disagrees on
+borderline faces between the full frame and tile crops). A face with landmarks in one mode
+and detector-only in the other is reported but not compared: detector-only attention is the
+detection score, not the head pose. The pose of landmark faces differs by a few degrees
+even on identical detections — the tiled mode runs FaceMesh on the face region, the untiled
+one on the whole frame (the same difference as between full and tracked frames of FaceTracker).
+
+    python scripts/check_tiled_detection.py --video lecture.mp4 --tiles 2
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from bench_tiled_detection import read_frames
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.attention_estimator import AttentionEstimator  # noqa: E402
+from app.services.box_ops import iou_matrix  # noqa: E402
+
+
+def match(untiled: list[dict], tiled: list[dict], iou: float) -> list[tuple[dict, dict]]:
+    """Жадно по убыванию IoU: пары (лицо без тайлов, лицо с тайлами)."""
+    if not untiled or not tiled:
+        return []
+    ious = iou_matrix(
+        np.array([face["roi"] for face in untiled], dtype=np.float64),
+        np.array([face["roi"] for face in tiled], dtype=np.float64),
+    )
+    pairs, used_a, used_b = [], set(), set()
+    for flat in np.argsort(-ious, axis=None):
+        a, b = np.unravel_index(flat, ious.shape)
+        if ious[a, b] < iou:
+            break
+        if a in used_a or b in used_b:
+            continue
+        used_a.add(a)
+        used_b.add(b)
+        pairs.append((untiled[a], tiled[b]))
+    return pairs
+
+
+def padding(face: dict) -> float:
+    """Площадь бокса (с отступом) относительно площади контура лица."""
+    return face["bbox"][2] * face["bbox"][3] / max(1, face["roi"][2] * face["roi"][3])
+
+
+def padding_ratio(a: dict, b: dict) -> float:
+    """Во сколько раз отличаются отступы двух лиц (>= 1)."""
+    pad_a, pad_b = padding(a), padding(b)
+    return max(pad_a, pad_b) / min(pad_a, pad_b)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--video", required=True)
+    ap.add_argument("--frames", type=int, default=20)
+    ap.add_argument("--stride", type=int, default=6, help="take every N-th frame of the clip")
+    ap.add_argument("--tiles", type=int, default=2)
+    ap.add_argument("--overlap", type=float, default=0.2)
+    ap.add_argument("--iou", type=float, default=0.3)
+    ap.add_argument("--min_recall", type=float, default=0.0)
+    ap.add_argument("--max_pad_ratio", type=float, default=1.25)
+    ap.add_argument("--angle_tol", type=float, default=15.0)
+    args = ap.parse_args()
+
+    frames = read_frames(args.video, args.frames, args.stride)
+    if not frames:
+        print("no frames read")
+        sys.exit(1)
+
+    untiled_est = AttentionEstimator(max_faces=32)
+    tiled_est = AttentionEstimator(max_faces=32, detect_tiles=args.tiles, tile_overlap=args.overlap)
+    total = found = 0
+    pad_ratios, angle_diffs = [], []
+    mixed = 0
+    att_untiled, att_tiled = [], []
+    try:
+        for frame in frames:
+            # кадры берутся через stride — трекинг FaceMesh между ними не нужен
+            untiled_est.reset()
+            untiled = untiled_est.estimate(frame)
+            tiled = tiled_est.estimate(frame)
+            att_untiled.extend(face["attention"] for face in untiled)
+            att_tiled.extend(face["attention"] for face in tiled)
+            pairs = match(untiled, tiled, args.iou)
+            total += len(untiled)
+            found += len(pairs)
+            for a, b in pairs:
+                pad_ratios.append(padding_ratio(a, b))
+                if a["has_landmarks"] and b["has_landmarks"]:
+                    angle_diffs.append(max(abs(a["yaw"] - b["yaw"]), abs(a["pitch"] - b["pitch"])))
+                elif a["has_landmarks"] != b["has_landmarks"]:
+                    mixed += 1
+    finally:
+        untiled_est.close()
+        tiled_est.close()
+
+    if not total:
+        print("no faces found without tiles")
+        sys.exit(1)
+
+    recall = found / total
+    worst_ratio = max(pad_ratios, default=1.0)
+    mean_angle_diff = float(np.mean(angle_diffs)) if angle_diffs else 0.0
+    print(f"frames={len(frames)} tiles={args.tiles} faces untiled={total} tiled={len(att_tiled)} matched={found}")
+    print(f"recall {recall:.3f}  box padding ratio max {worst_ratio:.2f} median {np.median(pad_ratios or [1.0]):.2f}")
+    print(
+        f"attention: mean untiled {np.mean(att_untiled):.3f} tiled {np.mean(att_tiled or [0.0]):.3f}; "
+        f"landmarks in both: {len(angle_diffs)} pairs, mean pose |diff| {mean_angle_diff:.1f} deg; "
+        f"landmarks in one mode only: {mixed} pairs"
+    )
+
+    failed = False
+    if recall < args.min_recall:
+        print(f"FAILED: tiled detection found {recall:.3f} of the untiled faces (< {args.min_recall})")
+        failed = True
+    if worst_ratio > args.max_pad_ratio:
+        print(f"FAILED: box padding of matched faces differs up to x{worst_ratio:.2f} (> {args.max_pad_ratio})")
+        failed = True
+    if mean_angle_diff > args.angle_tol:
+        print(f"FAILED: head pose differs by {mean_angle_diff:.1f} deg on average (> {args.angle_tol})")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
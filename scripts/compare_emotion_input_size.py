@@ -0,0 +1,87 @@
+# scripts/compare_emotion_input_size.py
+"""
+Emotion models trained for different input sizes (e.g. the 96px checkpoint versus one
+trained with `train_emotion_minix.py --img_size 48`), each run at its own img_size
+as stored in the checkpoint / ONNX metadata.
+
+Per model: validation accuracy with the training eval transform, model forward time per
+batch (preprocessed input, no image work), and end-to-end faces/sec of
+EmotionClassifier.predict_batch on synthetic face crops (backend preprocessing included).
+Accuracy is skipped with --no_accuracy, e.g. when the validation split is not available.
+
+    python scripts/train_emotion_minix.py --img_size 48 --outdir models/minix48 --reportdir reports/minix48
+    python scripts/compare_emotion_input_size.py backend/app/ml_models/emotion_minix.pt \
+        models/minix48/emotion_minix.pt --data data/val
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from report_emotion_quantization import evaluate, faces_per_sec, load_classifier, model_size
+
+
+def forward_ms(clf, batch_size: int, repeats: int) -> float:
+    """Время одного прогона модели на батче batch_size (лучшее из repeats), мс."""
+    rng = np.random.default_rng(0)
+    batch = rng.uniform(-1, 1, size=(batch_size, 1, clf.img_size, clf.img_size)).astype(np.float32)
+    clf.engine.run(batch)  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        clf.engine.run(batch)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("models", nargs="+", help="checkpoints (.pt) or ONNX graphs; the first one is the baseline")
+    ap.add_argument("--data", default="data/val")
+    ap.add_argument("--no_accuracy", action="store_true")
+    ap.add_argument("--batch_size", type=int, default=16)
+    ap.add_argument("--faces", type=int, default=256)
+    ap.add_argument("--repeats", type=int, default=10)
+    ap.add_argument("--threads", type=int, default=0)
+    args = ap.parse_args()
+
+    if not args.no_accuracy and not Path(args.data).is_dir():
+        print(f"Validation split not found: {args.data} (pass --no_accuracy to compare speed only)")
+        sys.exit(1)
+
+    rng = np.random.default_rng(0)
+    faces = [rng.integers(0, 255, size=(s, s, 3), dtype=np.uint8) for s in rng.integers(40, 160, size=args.faces)]
+
+    rows = []
+    for path in args.models:
+        clf = load_classifier(path, args.threads)
+        acc = None
+        if not args.no_accuracy:
+            y_true, y_pred, _ = evaluate(clf, Path(args.data), batch=128)
+            acc = float(np.mean(y_true == y_pred))
+        rows.append(
+            (
+                path,
+                clf.img_size,
+                acc,
+                forward_ms(clf, args.batch_size, args.repeats),
+                faces_per_sec(clf, faces, args.batch_size, max(1, args.repeats // 5)),
+                model_size(path),
+            )
+        )
+
+    _, _, base_acc, base_ms, base_fps, _ = rows[0]
+    print(f"batch_size={args.batch_size} faces={args.faces}")
+    for path, img_size, acc, ms, fps, size in rows:
+        acc_text = "   n/a" if acc is None else f"{acc:.4f}"
+        delta = "" if acc is None or base_acc is None else f" ({acc - base_acc:+.4f})"
+        print(
+            f"{img_size:>4}px  val_acc {acc_text}{delta}  forward {ms:7.2f} ms (x{base_ms / ms:.2f})  "
+            f"predict_batch {fps:7.1f} faces/sec (x{fps / base_fps:.2f})  {size / 1024:5.0f} KiB  {path}"
+        )
+
+
+if __name__ == "__main__":
+    main()
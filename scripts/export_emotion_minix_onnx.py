@@ -1,10 +1,19 @@
 # scripts/export_emotion_minix_onnx.py
+import argparse
+import json
+
 import torch
 from pathlib import Path
 from train_emotion_minix import MiniXEmotion  # или откуда у тебя класс модели
 
 def main():
-    ckpt_path = Path("models") / "emotion_minix.pt"
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ckpt", default=str(Path("models") / "emotion_minix.pt"))
+    ap.add_argument("--out", default=str(Path("models") / "emotion_minix.onnx"))
+    ap.add_argument("--opset", type=int, default=12)
+    args = ap.parse_args()
+
+    ckpt_path = Path(args.ckpt)
     ckpt = torch.load(ckpt_path, map_location="cpu")
     classes = ckpt["classes"]
     img_size = ckpt.get("img_size", 96)
@@ -14,13 +23,23 @@ def main():
     model.eval()
 
     dummy = torch.randn(1, 1, img_size, img_size)
-    onnx_path = Path("models") / "emotion_minix.onnx"
+    onnx_path = Path(args.out)
     torch.onnx.export(
         model, dummy, onnx_path,
         input_names=["input"],
         output_names=["logits"],
-        opset_version=12,
+        # batch dimension is dynamic so the backend can classify all faces of a frame at once
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=args.opset,
     )
+
+    # embed class names / input size so ONNX Runtime inference does not need the torch checkpoint
+    import onnx
+    onnx_model = onnx.load(str(onnx_path))
+    for key, value in (("classes", json.dumps(classes)), ("img_size", str(img_size))):
+        prop = onnx_model.metadata_props.add()
+        prop.key, prop.value = key, value
+    onnx.save(onnx_model, str(onnx_path))
     print("Exported ONNX:", onnx_path)
 
 if __name__ == "__main__":
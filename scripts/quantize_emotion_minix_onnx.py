@@ -0,0 +1,138 @@
+# scripts/quantize_emotion_minix_onnx.py
+"""
+Static INT8 quantization of the exported emotion model (see export_emotion_minix_onnx.py).
+
+Activation ranges are calibrated on face crops from data/train, prepared exactly like the
+backend does it (EmotionClassifier.preprocess_batch: grayscale, resize, CLAHE, [-1, 1]), so
+the ranges match what the quantized graph sees in production. Weights are quantized per
+channel, the graph is written in QDQ format; class names / input size metadata are copied
+from the float model. The backend loads the result with APP_EMOTION_BACKEND=onnx
+APP_EMOTION_PRECISION=int8 (path: APP_EMOTION_ONNX_INT8_PATH).
+
+    python scripts/quantize_emotion_minix_onnx.py --onnx backend/app/ml_models/emotion_minix.onnx \
+        --out backend/app/ml_models/emotion_minix.int8.onnx --per_class 100
+
+Accuracy / speed against the float model: scripts/report_emotion_quantization.py
+"""
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.emotion_classifier import EmotionClassifier  # noqa: E402
+from app.services.inference_engines import create_inference_engine  # noqa: E402
+
+_CALIBRATION_METHODS = ("minmax", "entropy", "percentile")
+
+
+def sample_images(data_dir: Path, per_class: int, seed: int) -> list[Path]:
+    """Поровну случайных картинок из каждого класса (классы в train сильно несбалансированы)."""
+    rng = random.Random(seed)
+    paths: list[Path] = []
+    for class_dir in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        images = sorted(p for p in class_dir.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        rng.shuffle(images)
+        paths.extend(images[:per_class])
+    return paths
+
+
+def calibration_batches(clf: EmotionClassifier, paths: list[Path], batch_size: int) -> list[np.ndarray]:
+    batches = []
+    for start in range(0, len(paths), batch_size):
+        faces = [img for img in (cv2.imread(str(p), cv2.IMREAD_COLOR) for p in paths[start:start + batch_size])
+                 if img is not None]
+        if faces:
+            # preprocess_batch отдаёт буфер потока — копируем
+            batches.append(clf.preprocess_batch(faces).copy())
+    return batches
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--onnx", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.onnx"))
+    ap.add_argument("--out", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.int8.onnx"))
+    ap.add_argument("--data", default=str(ROOT / "data" / "train"))
+    ap.add_argument("--per_class", type=int, default=100)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--method", default="minmax", choices=_CALIBRATION_METHODS)
+    ap.add_argument("--per_tensor", action="store_true", help="per-tensor weight scales (default: per channel)")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    float_clf = EmotionClassifier(engine=create_inference_engine("onnx", args.onnx))
+    input_name = float_clf.engine.session.get_inputs()[0].name
+
+    paths = sample_images(Path(args.data), args.per_class, args.seed)
+    batches = calibration_batches(float_clf, paths, args.batch)
+    if not batches:
+        print("No readable calibration images under", args.data)
+        sys.exit(1)
+    print(f"Calibration: {sum(len(b) for b in batches)} faces from {args.data} ({args.method})")
+
+    class Reader(CalibrationDataReader):
+        def __init__(self) -> None:
+            self._batches = iter(batches)
+
+        def get_next(self):
+            batch = next(self._batches, None)
+            return None if batch is None else {input_name: batch}
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        # shape inference + fusion BatchNorm в свёртки до квантизации (рекомендация ONNX Runtime)
+        prepared = Path(tmp) / "prepared.onnx"
+        quant_pre_process(args.onnx, str(prepared))
+        quantize_static(
+            str(prepared),
+            str(out_path),
+            Reader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=not args.per_tensor,
+            calibrate_method={
+                "minmax": CalibrationMethod.MinMax,
+                "entropy": CalibrationMethod.Entropy,
+                "percentile": CalibrationMethod.Percentile,
+            }[args.method],
+        )
+
+    # метаданные (classes / img_size) нужны OnnxInferenceEngine без чекпоинта torch
+    source = onnx.load(args.onnx)
+    quantized = onnx.load(str(out_path))
+    existing = {prop.key for prop in quantized.metadata_props}
+    for prop in source.metadata_props:
+        if prop.key not in existing:
+            quantized.metadata_props.add(key=prop.key, value=prop.value)
+    quantized.metadata_props.add(key="precision", value="int8")
+    onnx.save(quantized, str(out_path))
+
+    size_float = Path(args.onnx).stat().st_size + _external_size(Path(args.onnx))
+    print(f"Quantized ONNX: {out_path} ({out_path.stat().st_size / 1024:.0f} KiB, float {size_float / 1024:.0f} KiB)")
+
+
+def _external_size(model_path: Path) -> int:
+    data = model_path.with_name(model_path.name + ".data")
+    return data.stat().st_size if data.exists() else 0
+
+
+if __name__ == "__main__":
+    main()
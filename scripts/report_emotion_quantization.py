@@ -0,0 +1,136 @@
+# scripts/report_emotion_quantization.py
+"""
+Accuracy and speed of the INT8 emotion model (quantize_emotion_minix_onnx.py) against the
+float model on this machine.
+
+Accuracy: both models on the validation split with the training eval transform (the same
+protocol that produced reports/val_metrics.json, which is shown as the baseline), plus top-1
+agreement between them. Speed: faces/sec of EmotionClassifier.predict_batch (backend
+preprocessing included) on synthetic crops for several batch sizes.
+
+Writes the report as JSON and fails if INT8 accuracy drops by more than --max_drop.
+
+    python scripts/report_emotion_quantization.py --float backend/app/ml_models/emotion_minix.pt \
+        --int8 backend/app/ml_models/emotion_minix.int8.onnx --data data/val
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "backend"))
+
+from app.services.emotion_classifier import EmotionClassifier  # noqa: E402
+from app.services.inference_engines import create_inference_engine  # noqa: E402
+
+
+def load_classifier(path: str, threads: int) -> EmotionClassifier:
+    backend = "torch" if Path(path).suffix == ".pt" else "onnx"
+    return EmotionClassifier(engine=create_inference_engine(backend, path, intra_op_threads=threads))
+
+
+def evaluate(clf: EmotionClassifier, data_dir: Path, batch: int) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """(y_true, y_pred, classes) на ImageFolder(data_dir) с eval-трансформом обучения."""
+    from torch.utils.data import DataLoader
+    from torchvision.datasets import ImageFolder
+    from train_emotion_minix import make_transforms
+
+    _, eval_tf = make_transforms(clf.img_size)
+    dataset = ImageFolder(data_dir, transform=eval_tf)
+    if dataset.classes != clf.class_names:
+        raise ValueError(f"Class order mismatch: {dataset.classes} vs {clf.class_names}")
+    y_true, y_pred = [], []
+    for x, y in DataLoader(dataset, batch_size=batch, shuffle=False):
+        logits = clf.engine.run(np.ascontiguousarray(x.numpy(), dtype=np.float32))
+        y_pred.append(logits.argmax(axis=1))
+        y_true.append(y.numpy())
+    return np.concatenate(y_true), np.concatenate(y_pred), dataset.classes
+
+
+def faces_per_sec(clf: EmotionClassifier, faces: list[np.ndarray], batch_size: int, repeats: int) -> float:
+    clf.predict_batch(faces[:batch_size])  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(faces), batch_size):
+            clf.predict_batch(faces[i:i + batch_size])
+    return len(faces) * repeats / (time.perf_counter() - started)
+
+
+def model_size(path: str) -> int:
+    model_path = Path(path)
+    data = model_path.with_name(model_path.name + ".data")
+    return model_path.stat().st_size + (data.stat().st_size if data.exists() else 0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--float", dest="float_model", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.pt"))
+    ap.add_argument("--int8", default=str(ROOT / "backend" / "app" / "ml_models" / "emotion_minix.int8.onnx"))
+    ap.add_argument("--data", default=str(ROOT / "data" / "val"))
+    ap.add_argument("--baseline", default=str(ROOT / "reports" / "val_metrics.json"))
+    ap.add_argument("--out", default=str(ROOT / "reports" / "quantization_report.json"))
+    ap.add_argument("--batch_sizes", default="1,16,64")
+    ap.add_argument("--faces", type=int, default=256)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=0)
+    ap.add_argument("--max_drop", type=float, default=0.02, help="max allowed val accuracy drop of INT8")
+    args = ap.parse_args()
+
+    from sklearn.metrics import classification_report
+
+    data_dir = Path(args.data)
+    if not data_dir.is_dir():
+        print(f"Validation split not found: {data_dir} (see scripts/make_val_split.py)")
+        sys.exit(1)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if Path(args.baseline).exists() else {}
+
+    rng = np.random.default_rng(0)
+    faces = [rng.integers(0, 255, size=(s, s, 3), dtype=np.uint8) for s in rng.integers(40, 160, size=args.faces)]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    report: dict = {"data": str(data_dir), "baseline_val_acc": baseline.get("val_acc"), "models": {}}
+    predictions = {}
+    for name, path in (("float", args.float_model), ("int8", args.int8)):
+        clf = load_classifier(path, args.threads)
+        y_true, y_pred, classes = evaluate(clf, data_dir, batch=128)
+        predictions[name] = y_pred
+        metrics = classification_report(y_true, y_pred, target_names=classes, output_dict=True, zero_division=0)
+        report["models"][name] = {
+            "path": path,
+            "size_bytes": model_size(path),
+            "val_acc": float(metrics["accuracy"]),
+            "macro_f1": float(metrics["macro avg"]["f1-score"]),
+            "f1": {label: float(metrics[label]["f1-score"]) for label in classes},
+            "faces_per_sec": {str(b): round(faces_per_sec(clf, faces, b, args.repeats), 1) for b in batch_sizes},
+        }
+    report["top1_agreement"] = float(np.mean(predictions["float"] == predictions["int8"]))
+
+    float_m, int8_m = report["models"]["float"], report["models"]["int8"]
+    if report["baseline_val_acc"] is not None:
+        print(f"{'baseline':>8}: val_acc {report['baseline_val_acc']:.4f}  ({args.baseline})")
+    for name, m in report["models"].items():
+        speed = "  ".join(f"b{b}: {fps:7.1f}" for b, fps in m["faces_per_sec"].items())
+        print(
+            f"{name:>8}: val_acc {m['val_acc']:.4f}  macro_f1 {m['macro_f1']:.4f}  "
+            f"size {m['size_bytes'] / 1024:6.0f} KiB  faces/sec {speed}"
+        )
+    for b in map(str, batch_sizes):
+        print(f"  batch {b:>3}: int8 x{int8_m['faces_per_sec'][b] / float_m['faces_per_sec'][b]:.2f}")
+    print(f"top-1 agreement float/int8: {report['top1_agreement']:.4f}")
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Report:", args.out)
+
+    drop = float_m["val_acc"] - int8_m["val_acc"]
+    if drop > args.max_drop:
+        print(f"FAILED: INT8 val accuracy dropped by {drop:.4f} (> {args.max_drop})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
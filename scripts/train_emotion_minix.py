@@ -95,8 +95,9 @@ def make_transforms(img_size=96):
     ])
     return train_tf, eval_tf
 
-def build_loaders(data_root, batch=128, num_workers=0):
-    train_tf, eval_tf = make_transforms()
+def build_loaders(data_root, batch=128, num_workers=0, img_size=96):
+    # FER-картинки 48x48: при img_size=48 Resize ничего не делает, при 96 — апскейл
+    train_tf, eval_tf = make_transforms(img_size)
     train_ds = ImageFolder(Path(data_root)/"train", transform=train_tf)
     val_ds   = ImageFolder(Path(data_root)/"val",   transform=eval_tf)
     test_ds  = ImageFolder(Path(data_root)/"test",  transform=eval_tf)
@@ -179,6 +180,7 @@ def main():
     ap.add_argument("--lr", type=float, default=3e-4)
     ap.add_argument("--img_size", type=int, default=96)
     ap.add_argument("--outdir", default="models")
+    ap.add_argument("--reportdir", default="reports")
     ap.add_argument("--seed", type=int, default=42)
     args = ap.parse_args()
 
@@ -186,7 +188,7 @@ def main():
     dev = device_auto()
     print("Device:", dev)
 
-    train_loader, val_loader, test_loader, classes = build_loaders(args.data, batch=args.batch)
+    train_loader, val_loader, test_loader, classes = build_loaders(args.data, batch=args.batch, img_size=args.img_size)
     n_classes = len(classes)
     print(f"Datasets | train: {len(train_loader.dataset)}  val: {len(val_loader.dataset)}  test: {len(test_loader.dataset)}")
     print(f"Steps/epoch | train: {len(train_loader)}  val: {len(val_loader)}")
@@ -198,8 +200,8 @@ def main():
 
     best_val = -1.0
     best_path = Path(args.outdir)/"emotion_minix.pt"
-    metrics_path = Path("reports")/"val_metrics.json"
-    cm_png = Path("reports")/"confusion_matrix_val.png"
+    metrics_path = Path(args.reportdir)/"val_metrics.json"
+    cm_png = Path(args.reportdir)/"confusion_matrix_val.png"
     Path(args.outdir).mkdir(parents=True, exist_ok=True)
 
     patience, bad = 7, 0